@@ -0,0 +1,138 @@
+"""
+Benchmark de la selección de pedidos de la sincronización de estados.
+
+Carga N pedidos históricos sintéticos (por defecto 500.000, repartidos en tres
+años) en una BD SQLite en memoria con las migraciones del proyecto: casi todos
+completados o cancelados y unos pocos miles vivos en las últimas semanas.
+Compara la consulta anterior (OrderMapping excluyendo COMPLETED) con
+live_orders() (estados terminales + horizonte de días), con y sin los índices
+de Order, y muestra el plan de SQLite de cada una. SQLite solo aprovecha el
+índice parcial si los valores van como literales en el SQL (así los envía
+psycopg2 a PostgreSQL), por eso la consulta nueva se mide de las dos formas.
+
+Uso:
+    python benchmarks/order_status_horizon.py --orders 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "conector_shopify.settings_test")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from shopify_app.models import Order, OrderMapping, Shop  # noqa: E402
+from shopify_app.order_status_sync import live_orders  # noqa: E402
+
+HORIZON_INDEXES = ("order_status", "order_created", "order_live_created")
+BATCH = 10000
+
+
+def synthetic_order(rng, shop_id, n, now):
+    age_days = rng.uniform(0, 3 * 365)
+    if age_days < 21:
+        status = rng.choice(["SENT", "SENT", "IN_PROGRESS", "COMPLETED"])
+    else:
+        # Histórico: completados, algún cancelado y algún pedido "atascado" sin completar
+        status = rng.choices(["COMPLETED", "SENT"], weights=[99, 1])[0]
+    financial = rng.choices(["paid", "refunded", "voided"], weights=[96, 3, 1])[0]
+    created = now - timedelta(days=age_days)
+    return Order(
+        shop_id=shop_id, shopify_id=10 ** 9 + n, name=f"#{n}", total_price=Decimal("25.00"),
+        financial_status=financial, created_at=created, received_at=created,
+        status=status, sent_to_verial=True,
+    )
+
+
+def seed(total, seed=42):
+    rng = random.Random(seed)
+    now = timezone.now()
+    shop = Shop.objects.create(shop="bench.myshopify.com", access_token="x")
+    for start in range(0, total, BATCH):
+        orders = Order.objects.bulk_create(
+            [synthetic_order(rng, shop.pk, n, now) for n in range(start, min(start + BATCH, total))]
+        )
+        OrderMapping.objects.bulk_create(
+            [OrderMapping(order_id=o.pk, verial_id=o.shopify_id, verial_referencia=o.name) for o in orders]
+        )
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def legacy_queryset():
+    return (
+        OrderMapping.objects.select_related("order")
+        .filter(order__sent_to_verial=True)
+        .exclude(order__status="COMPLETED")
+    )
+
+
+def inline_params(sql, params):
+    """SQL con los parámetros como literales, que es como le llega a PostgreSQL vía psycopg2."""
+    for param in params:
+        literal = str(int(param)) if isinstance(param, bool) else "'" + str(param).replace("'", "''") + "'"
+        sql = sql.replace("%s", literal, 1)
+    return sql, ()
+
+
+def measure(name, sql, params, repeat=5):
+    """Ejecuta la consulta en crudo (sin coste del ORM) y muestra filas, mejor tiempo y plan."""
+    params = params or None
+    with connection.cursor() as cursor:
+        plan = " | ".join(row[-1] for row in cursor.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall())
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(cursor.execute(sql, params).fetchall())
+            best = min(best, time.perf_counter() - started)
+    print(f"  {name:<22} {rows:>8} filas {best * 1000:>9.1f} ms   {plan}")
+
+
+def measure_all():
+    legacy = legacy_queryset().query.sql_with_params()
+    horizon = live_orders().query.sql_with_params()
+    measure("anterior", *legacy)
+    measure("horizonte", *horizon)
+    measure("horizonte (literales)", *inline_params(*horizon))
+
+
+def drop_indexes():
+    with connection.schema_editor() as editor:
+        for index in Order._meta.indexes:
+            if index.name in HORIZON_INDEXES:
+                editor.remove_index(Order, index)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500000)
+    args = parser.parse_args()
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    seed(args.orders)
+    print(f"{args.orders} pedidos cargados en {time.perf_counter() - started:.1f}s")
+
+    print("Con índices de horizonte:")
+    measure_all()
+
+    drop_indexes()
+    print("Sin índices en Order:")
+    measure_all()
+
+
+if __name__ == "__main__":
+    main()
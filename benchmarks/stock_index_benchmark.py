@@ -0,0 +1,90 @@
+"""
+Benchmark del cruce de stock: dicts de Python frente a índices compactos.
+
+Para N artículos sintéticos construye el índice código de barras -> ID y la
+tabla ID -> stock por los dos caminos y cruza con ellos N inventory items de
+Shopify (el 90 % con barcode conocido). Mide la memoria retenida por los
+índices (tracemalloc) y el tiempo de construcción y de cruce.
+
+Uso:
+    python benchmarks/stock_index_benchmark.py --sizes 10000 50000 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from erp_connector.compact_index import BarcodeIndex, StockTable, match_inventory  # noqa: E402
+
+
+def synthetic(size, seed=42):
+    """Catálogo y stock como generadores (llegan en streaming); inventario de Shopify en lista."""
+    rng = random.Random(seed)
+    stock_values = [rng.randint(0, 500) for _ in range(size)]
+
+    def catalog():
+        return ((f"84{i:011d}", 100000 + i) for i in range(size))
+
+    def stock():
+        return ((100000 + i, stock_values[i]) for i in range(size))
+
+    inventory = [
+        (f"gid://shopify/InventoryItem/{i}", f"SKU-{i}", f"84{i:011d}" if rng.random() < 0.9 else f"99{i:011d}")
+        for i in range(size)
+    ]
+    return catalog, stock, inventory
+
+
+def build_dicts(catalog, stock):
+    return dict(catalog), dict(stock)
+
+
+def join_dicts(inventory, barcodes, stocks):
+    quantities = []
+    for inventory_item_id, sku, barcode in inventory:
+        verial_id = barcodes.get(barcode or sku)
+        if verial_id is not None:
+            quantities.append((inventory_item_id, stocks.get(verial_id, 0)))
+    return quantities
+
+
+def build_compact(catalog, stock):
+    return BarcodeIndex(catalog), StockTable(stock)
+
+
+def join_compact(inventory, barcodes, stocks):
+    inventory_ids, verial_ids = match_inventory(inventory, barcodes)
+    return [(inventory_ids[i], stocks.get(verial_id, 0)) for i, verial_id in enumerate(verial_ids)]
+
+
+def measure(build, join, catalog, stock, inventory):
+    tracemalloc.start()
+    started = time.perf_counter()
+    barcodes, stocks = build(catalog(), stock())
+    built = time.perf_counter()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    matched = join(inventory, barcodes, stocks)
+    joined = time.perf_counter()
+    return retained, built - started, joined - built, len(matched)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    args = parser.parse_args()
+
+    print(f"{'artículos':>10} {'camino':<9} {'índices MB':>11} {'construir s':>12} {'cruzar s':>9} {'cruzados':>9}")
+    for size in args.sizes:
+        catalog, stock, inventory = synthetic(size)
+        for name, build, join in (("dicts", build_dicts, join_dicts), ("compacto", build_compact, join_compact)):
+            retained, build_s, join_s, matched = measure(build, join, catalog, stock, inventory)
+            print(f"{size:>10} {name:<9} {retained / 1024 / 1024:>11.2f} {build_s:>12.3f} {join_s:>9.3f} {matched:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark de memoria: catálogo de Verial con response.json() frente a streaming.
+
+Simula la respuesta de GetArticulosWS como una secuencia de trozos de 64 KB
+(lo que entrega la red) y construye el índice código de barras -> artículo
+por los dos caminos, midiendo el pico de memoria con tracemalloc:
+
+- completo: se junta el cuerpo (response.content), se parsea entero
+  (response.json()) y se deriva el índice.
+- streaming: json_stream.iter_array_items recorre los trozos y el índice se
+  construye artículo a artículo.
+
+Uso:
+    python benchmarks/verial_stream_memory.py --articles 50000 --description 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from erp_connector.json_stream import iter_array_items  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def article(i, description):
+    return {
+        "Id": i,
+        "ReferenciaBarras": f"84{i:011d}",
+        "Nombre": f"Artículo {i}",
+        "Descripcion": description,
+        "PVP": 10 + i % 90,
+        "Activo": True,
+    }
+
+
+def response_chunks(articles, description):
+    """Genera el documento en trozos de CHUNK_SIZE sin tenerlo nunca entero en memoria."""
+    pending = bytearray(b'{"InfoError": {"Codigo": 0, "Descripcion": null}, "Articulos": [')
+    for i in range(articles):
+        if i:
+            pending += b", "
+        pending += json.dumps(article(i, description), ensure_ascii=False).encode("utf-8")
+        while len(pending) >= CHUNK_SIZE:
+            yield bytes(pending[:CHUNK_SIZE])
+            del pending[:CHUNK_SIZE]
+    pending += b"]}"
+    yield bytes(pending)
+
+
+def full_path(chunks):
+    body = b"".join(chunks)
+    data = json.loads(body)
+    return {a["ReferenciaBarras"]: {"id": a["Id"], "nombre": a["Nombre"]} for a in data["Articulos"]}
+
+
+def streaming_path(chunks):
+    return {
+        a["ReferenciaBarras"]: {"id": a["Id"], "nombre": a["Nombre"]}
+        for a in iter_array_items(chunks, "Articulos")
+    }
+
+
+def measure(fn, articles, description):
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = fn(response_chunks(articles, description))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(index), peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=50000)
+    parser.add_argument("--description", type=int, default=2000, help="Caracteres de descripción por artículo")
+    args = parser.parse_args()
+
+    description = "x" * args.description
+    print(f"{args.articles} artículos, {args.description} caracteres de descripción")
+    print(f"{'camino':<10} {'índice':>8} {'pico MB':>10} {'segundos':>9}")
+    for name, fn in (("completo", full_path), ("streaming", streaming_path)):
+        size, peak, elapsed = measure(fn, args.articles, description)
+        print(f"{name:<10} {size:>8} {peak / 1024 / 1024:>10.1f} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -158,6 +158,94 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SHOPIFY_API_SECRET = os.getenv("SHOPIFY_API_SECRET", "")
 
 
+# Transporte HTTP (pool keep-alive por host hacia Verial y Shopify)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+
+
+# Tamaño de chunk (filas por transacción) en los upserts masivos
+BULK_UPSERT_CHUNK_SIZE = int(os.getenv("BULK_UPSERT_CHUNK_SIZE", "500"))
+
+# Mapeo por barcode: no se borran mapeos si el catálogo de Verial llega vacío o
+# si el borrado supera esta fracción de los mapeos existentes (catálogo truncado).
+# Por debajo de PRODUCT_MAPPING_DELETE_MIN borrados no se aplica la fracción.
+PRODUCT_MAPPING_MAX_DELETE_RATIO = float(os.getenv("PRODUCT_MAPPING_MAX_DELETE_RATIO", "0.5"))
+PRODUCT_MAPPING_DELETE_MIN = int(os.getenv("PRODUCT_MAPPING_DELETE_MIN", "10"))
+
+
+# Shopify Bulk Operations (backfills de catálogo y pedidos)
+SHOPIFY_BULK_POLL_INTERVAL = float(os.getenv("SHOPIFY_BULK_POLL_INTERVAL", "5"))
+SHOPIFY_BULK_TIMEOUT = float(os.getenv("SHOPIFY_BULK_TIMEOUT", "3600"))
+
+
+# Bandeja de webhooks (procesado asíncrono)
+WEBHOOK_INBOX_BATCH_SIZE = int(os.getenv("WEBHOOK_INBOX_BATCH_SIZE", "100"))
+WEBHOOK_INBOX_WORKERS = int(os.getenv("WEBHOOK_INBOX_WORKERS", "2"))
+WEBHOOK_INBOX_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_INBOX_MAX_ATTEMPTS", "5"))
+WEBHOOK_INBOX_CLAIM_TIMEOUT = int(os.getenv("WEBHOOK_INBOX_CLAIM_TIMEOUT", "300"))
+# Idempotencia: ventana en la que un webhook repetido se descarta (y tras la que se purga)
+WEBHOOK_DEDUPE_TTL_HOURS = int(os.getenv("WEBHOOK_DEDUPE_TTL_HOURS", "48"))
+WEBHOOK_DEDUPE_MAX_ENTRIES = int(os.getenv("WEBHOOK_DEDUPE_MAX_ENTRIES", "200000"))
+
+
+# Stock: envío concurrente respetando el throttling de GraphQL
+SHOPIFY_STOCK_PUSH_WORKERS = int(os.getenv("SHOPIFY_STOCK_PUSH_WORKERS", "4"))
+SHOPIFY_STOCK_CHUNK_COST = int(os.getenv("SHOPIFY_STOCK_CHUNK_COST", "10"))
+SHOPIFY_THROTTLE_MAX_RETRIES = int(os.getenv("SHOPIFY_THROTTLE_MAX_RETRIES", "5"))
+# Segundos que se reutilizan los IDs de location de Shopify antes de volver a consultarlos
+SHOPIFY_LOCATIONS_TTL = int(os.getenv("SHOPIFY_LOCATIONS_TTL", "86400"))
+
+
+# Pedidos enviados según Verial (estado 4): se crea el fulfillment en Shopify con
+# mutaciones agrupadas (SHOPIFY_FULFILLMENT_BATCH_SIZE por petición) en paralelo.
+# Desactivado por defecto; solo se tratan pedidos dentro de ORDER_STATUS_SYNC_HORIZON_DAYS
+# y un pedido deja de reintentarse tras SHOPIFY_FULFILLMENT_MAX_ATTEMPTS fallos
+SHOPIFY_PUSH_FULFILLMENTS = os.getenv("SHOPIFY_PUSH_FULFILLMENTS", "false").lower() == "true"
+SHOPIFY_FULFILLMENT_MAX_ATTEMPTS = int(os.getenv("SHOPIFY_FULFILLMENT_MAX_ATTEMPTS", "5"))
+SHOPIFY_FULFILLMENT_BATCH_SIZE = int(os.getenv("SHOPIFY_FULFILLMENT_BATCH_SIZE", "10"))
+SHOPIFY_FULFILLMENT_WORKERS = int(os.getenv("SHOPIFY_FULFILLMENT_WORKERS", "4"))
+SHOPIFY_FULFILLMENT_NOTIFY_CUSTOMER = os.getenv("SHOPIFY_FULFILLMENT_NOTIFY_CUSTOMER", "false").lower() == "true"
+
+
+# Stock: cada cuántas horas se reenvía todo el stock aunque no haya cambiado
+STOCK_FULL_RECONCILE_HOURS = int(os.getenv("STOCK_FULL_RECONCILE_HOURS", "24"))
+# Índice de inventario: cada cuántas horas se reconstruye entero (borrados y barcodes editados)
+INVENTORY_INDEX_FULL_HOURS = int(os.getenv("INVENTORY_INDEX_FULL_HOURS", "24"))
+
+
+# Stock: planificador de sync_runner. "fixed" ejecuta el cruce cada STOCK_INTERVAL_BUSY
+# segundos; "adaptive" lanza antes una sonda barata (huella del stock de Verial y
+# del índice de inventario) y solo cruza y envía si cambió algo. El intervalo se
+# acorta en horas punta (STOCK_BUSY_HOURS, "inicio-fin" en hora local) y se
+# duplica con cada sondeo sin cambios hasta STOCK_INTERVAL_MAX.
+STOCK_SCHEDULER_MODE = os.getenv("STOCK_SCHEDULER_MODE", "fixed").lower()
+STOCK_BUSY_HOURS = os.getenv("STOCK_BUSY_HOURS", "8-22")
+STOCK_INTERVAL_BUSY = int(os.getenv("STOCK_INTERVAL_BUSY", "120"))
+STOCK_INTERVAL_IDLE = int(os.getenv("STOCK_INTERVAL_IDLE", "600"))
+STOCK_INTERVAL_MAX = int(os.getenv("STOCK_INTERVAL_MAX", "1800"))
+
+
+# sync_runner con varias réplicas: lease en BD por job (segundos). El nodo que lo
+# tiene renueva cada JOB_LEASE_HEARTBEAT; si deja de hacerlo, otro lo toma al caducar.
+JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", "90"))
+JOB_LEASE_HEARTBEAT = int(os.getenv("JOB_LEASE_HEARTBEAT", "30"))
+# Margen al comprobar si otro nodo ya ejecutó el job en este intervalo
+JOB_LEASE_SLACK = int(os.getenv("JOB_LEASE_SLACK", "10"))
+
+
+# Métricas de sync_runner: puerto HTTP propio con /metrics (0 = desactivado).
+# El /metrics/ de Django solo ve las métricas del worker web que responde.
+# Solo escucha en local por defecto: exponerlo en red es una decisión explícita.
+SYNC_RUNNER_METRICS_PORT = int(os.getenv("SYNC_RUNNER_METRICS_PORT", "9108"))
+SYNC_RUNNER_METRICS_ADDR = os.getenv("SYNC_RUNNER_METRICS_ADDR", "127.0.0.1")
+# /metrics/ y /erp/transport-stats/ exigen usuario staff o esta cabecera:
+# "Authorization: Bearer <METRICS_TOKEN>" (vacío = solo staff)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
 # Verial Configuration
 VERIAL_SERVER = os.getenv("VERIAL_SERVER", "")
 VERIAL_SESSION = int(os.getenv("VERIAL_SESSION", "0"))
@@ -179,6 +267,34 @@ VERIAL_CREATE_CLIENT_URL = f"{VERIAL_BASE_URL}/NuevoClienteWS" if VERIAL_BASE_UR
 # Pedidos
 VERIAL_CREATE_ORDER_URL = f"{VERIAL_BASE_URL}/NuevoDocClienteWS" if VERIAL_BASE_URL else ""
 
+# Catálogo de artículos: segundos que se reutiliza antes de volver a descargarlo
+VERIAL_CATALOG_TTL = int(os.getenv("VERIAL_CATALOG_TTL", "3600"))
+
+# Stock incremental: pedir a GetStockArticulosWS solo los artículos con movimientos
+# desde la última consulta (parámetro fecha). Si el servidor no lo soporta se deja
+# en false y los cambios se detectan comparando el hash de cada fila.
+VERIAL_STOCK_DATE_FILTER = os.getenv("VERIAL_STOCK_DATE_FILTER", "false").lower() == "true"
+
+# Envío concurrente de pedidos: workers y máximo de peticiones/s hacia Verial (0 = sin límite)
+VERIAL_DISPATCH_WORKERS = int(os.getenv("VERIAL_DISPATCH_WORKERS", "4"))
+VERIAL_MAX_RPS = float(os.getenv("VERIAL_MAX_RPS", "5"))
+# Un pedido que falla se reintenta con espera creciente (RETRY_BASE * 2^n, hasta
+# RETRY_MAX segundos) y solo pasa a ERROR tras MAX_ATTEMPTS intentos. CLAIM_TIMEOUT:
+# segundos que un pedido reclamado queda reservado a su worker mientras se envía.
+VERIAL_DISPATCH_MAX_ATTEMPTS = int(os.getenv("VERIAL_DISPATCH_MAX_ATTEMPTS", "8"))
+VERIAL_DISPATCH_RETRY_BASE = int(os.getenv("VERIAL_DISPATCH_RETRY_BASE", "60"))
+VERIAL_DISPATCH_RETRY_MAX = int(os.getenv("VERIAL_DISPATCH_RETRY_MAX", "3600"))
+VERIAL_DISPATCH_CLAIM_TIMEOUT = int(os.getenv("VERIAL_DISPATCH_CLAIM_TIMEOUT", "300"))
+HTTP_RATE_LIMITS = {f"http://{VERIAL_SERVER}": VERIAL_MAX_RPS} if VERIAL_SERVER and VERIAL_MAX_RPS else {}
+
+# Consulta de estados (EstadoPedidosWS): lotes de 25 pedidos, varios lotes en paralelo
+VERIAL_STATUS_WORKERS = int(os.getenv("VERIAL_STATUS_WORKERS", "4"))
+# Horizonte: pasados estos días desde su creación un pedido deja de consultarse
+ORDER_STATUS_SYNC_HORIZON_DAYS = int(os.getenv("ORDER_STATUS_SYNC_HORIZON_DAYS", "90"))
+# sync_orders: los pedidos nuevos más antiguos que esto (o cancelados) entran como
+# IMPORTED y no se envían a Verial
+ORDER_SYNC_ENQUEUE_DAYS = int(os.getenv("ORDER_SYNC_ENQUEUE_DAYS", "7"))
+
 
 # Logging Configuration
 LOGGING = {
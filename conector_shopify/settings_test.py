@@ -73,5 +73,10 @@ VERIAL_SEARCH_CLIENT_URL = f"{VERIAL_BASE_URL}/BuscarClienteWS"
 VERIAL_CREATE_CLIENT_URL = f"{VERIAL_BASE_URL}/NuevoClienteWS"
 VERIAL_CREATE_ORDER_URL = f"{VERIAL_BASE_URL}/NuevoDocClienteWS"
 
+# Sin límite de peticiones/s en tests (los tests del limitador lo activan)
+HTTP_RATE_LIMITS = {}
+
 # No enviar a Verial en tests (a menos que se especifique)
-SEND_TO_VERIAL = os.getenv("TEST_SEND_TO_VERIAL", "false").lower() == "true"
\ No newline at end of file
+SEND_TO_VERIAL = os.getenv("TEST_SEND_TO_VERIAL", "false").lower() == "true"
+# Sin fulfillments hacia Shopify en tests (los tests del pipeline lo activan)
+SHOPIFY_PUSH_FULFILLMENTS = False
@@ -1,9 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
 from shopify_app import views
+from erp_connector.views import metrics_view
 
 urlpatterns = [
     path("health/", views.health_check),
+    path("metrics/", metrics_view),
     path("admin/", admin.site.urls),
     path("shopify/", include("shopify_app.urls")),
     path("erp/", include("erp_connector.urls")),
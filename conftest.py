@@ -24,6 +24,42 @@ def enable_db_access_for_all_tests(db):
     pass
 
 
+@pytest.fixture(autouse=True)
+def reset_webhook_dedupe():
+    """El almacén de idempotencia vive en memoria del proceso: se vacía entre tests"""
+    from shopify_app.services import webhook_dedupe
+    webhook_dedupe.reset()
+    yield
+    webhook_dedupe.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_verial_catalog_cache():
+    """La copia en memoria del catálogo de Verial no debe pasar de un test a otro"""
+    from erp_connector import catalog_cache
+    catalog_cache.reset()
+    yield
+    catalog_cache.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_verial_stock_poller():
+    """La tabla de stock visto (y su marca de tiempo) vive en memoria del proceso"""
+    from erp_connector import stock_poller
+    stock_poller.reset()
+    yield
+    stock_poller.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_shopify_locations_cache():
+    """Las locations de Shopify se cachean por proceso: cada test consulta las suyas"""
+    from shopify_app import stock_sync
+    stock_sync.reset_locations_cache()
+    yield
+    stock_sync.reset_locations_cache()
+
+
 # =============================================================================
 # FIXTURES DE TIENDA (SHOP)
 # =============================================================================
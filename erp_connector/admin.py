@@ -1,7 +1,17 @@
 from django.contrib import admin
-from .models import ERPSyncLog
+from .models import ERPSyncLog, VerialArticle, VerialStockState
 
 @admin.register(ERPSyncLog)
 class ERPSyncLogAdmin(admin.ModelAdmin):
     list_display = ("action", "shopify_id", "success", "created_at")
-    list_filter = ("action", "success")
\ No newline at end of file
+    list_filter = ("action", "success")
+
+@admin.register(VerialArticle)
+class VerialArticleAdmin(admin.ModelAdmin):
+    list_display = ("verial_id", "barcode", "nombre", "fetched_at")
+    search_fields = ("barcode", "nombre")
+
+@admin.register(VerialStockState)
+class VerialStockStateAdmin(admin.ModelAdmin):
+    list_display = ("verial_id", "stock", "updated_at")
+    search_fields = ("verial_id",)
@@ -0,0 +1,190 @@
+"""
+Caché compartida del catálogo de Verial (código de barras -> artículo).
+
+Dos niveles: memoria del proceso y tabla VerialArticle. GetArticulosWS solo
+se descarga cuando ambos han caducado (VERIAL_CATALOG_TTL), tras invalidate()
+o, como mucho una vez por ventana de TTL, al buscar un código que no está.
+Las descargas concurrentes se agrupan (single-flight): un hilo descarga y el
+resto reutiliza su resultado.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import metrics
+from .compact_index import BarcodeIndex
+from .models import VerialArticle
+from .verial_client import VerialClient
+
+logger = logging.getLogger('erp_connector')
+
+LOOKUPS = metrics.counter("verial_catalog_cache_total", "Accesos al catálogo de Verial por origen del dato")
+
+EXPIRED = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+_state = {"index": None, "loaded_at": 0.0, "miss_refresh_at": 0.0, "compact": None}
+_lock = threading.Lock()
+
+
+def _build_index(rows):
+    """rows: (barcode, verial_id, nombre) -> {barcode: {"id", "nombre", "barcode"}}"""
+    return {
+        barcode: {"id": int(verial_id), "nombre": nombre, "barcode": barcode}
+        for barcode, verial_id, nombre in rows
+        if barcode
+    }
+
+
+def _is_fresh():
+    return _state["index"] is not None and time.time() - _state["loaded_at"] < settings.VERIAL_CATALOG_TTL
+
+
+def _store(index, loaded_at):
+    _state["index"] = index
+    _state["loaded_at"] = loaded_at
+
+
+def _load_from_db():
+    refreshed = VerialArticle.objects.aggregate(last=Max("fetched_at"))["last"]
+    if refreshed is None or time.time() - refreshed.timestamp() >= settings.VERIAL_CATALOG_TTL:
+        return False
+    rows = VerialArticle.objects.exclude(barcode="").order_by("pk").values_list("barcode", "verial_id", "nombre")
+    _store(_build_index(rows), refreshed.timestamp())
+    LOOKUPS.inc(origen="bd")
+    return True
+
+
+def _download():
+    """Descarga el catálogo y lo vuelca en VerialArticle. Devuelve (success, index | error)."""
+    client = VerialClient()
+    if not client.is_configured():
+        return False, "Verial no configurado"
+
+    # En streaming: de cada artículo solo se conservan Id, código de barras y nombre
+    success, result = client.iter_articles()
+    if not success:
+        return False, result
+
+    fetched_at = timezone.now()
+    articles = {}
+    try:
+        for art in result:
+            if art.get("Id") is None:
+                continue
+            articles[int(art["Id"])] = VerialArticle(
+                verial_id=int(art["Id"]),
+                barcode=str(art.get("ReferenciaBarras") or "").strip(),
+                nombre=(art.get("Nombre") or "")[:255],
+                fetched_at=fetched_at,
+            )
+    except (ValueError, requests.exceptions.RequestException) as e:
+        return False, f"Error leyendo el catálogo de Verial: {e}"
+
+    with transaction.atomic():
+        VerialArticle.objects.bulk_create(
+            list(articles.values()),
+            update_conflicts=True,
+            unique_fields=["verial_id"],
+            update_fields=["barcode", "nombre", "fetched_at"],
+            batch_size=settings.BULK_UPSERT_CHUNK_SIZE,
+        )
+        VerialArticle.objects.filter(fetched_at__lt=fetched_at).delete()
+
+    index = _build_index((a.barcode, a.verial_id, a.nombre) for a in articles.values())
+    logger.info(f"Catálogo Verial descargado: {len(articles)} artículos, {len(index)} con código de barras")
+    return True, index
+
+
+def _refresh_locked():
+    """Descarga con el lock tomado. Si falla y hay una copia anterior, se sigue usando."""
+    success, result = _download()
+    if success:
+        _store(result, time.time())
+        LOOKUPS.inc(origen="descarga")
+        return True, result
+    LOOKUPS.inc(origen="error")
+    if _state["index"] is not None:
+        logger.warning(f"No se pudo refrescar el catálogo Verial, se usa la copia anterior: {result}")
+        return True, _state["index"]
+    return False, result
+
+
+def get_catalog(force=False):
+    """Devuelve (success, {barcode: {"id", "nombre", "barcode"}} | error)."""
+    if not force and _is_fresh():
+        LOOKUPS.inc(origen="memoria")
+        return True, _state["index"]
+
+    loaded_at = _state["loaded_at"]
+    with _lock:
+        # Otro hilo pudo cargarlo mientras esperábamos: reutilizamos su resultado
+        if _state["loaded_at"] != loaded_at and _is_fresh():
+            LOOKUPS.inc(origen="memoria")
+            return True, _state["index"]
+        if not force and _load_from_db():
+            return True, _state["index"]
+        return _refresh_locked()
+
+
+def get_barcode_index():
+    """Devuelve (success, {barcode: verial_id} | error)."""
+    success, catalog = get_catalog()
+    if not success:
+        return False, catalog
+    return True, {barcode: art["id"] for barcode, art in catalog.items()}
+
+
+def get_compact_index():
+    """
+    Devuelve (success, BarcodeIndex | error): el mismo índice que get_barcode_index
+    pero en arrays compactos. Se construye una vez por cada carga del catálogo.
+    """
+    success, catalog = get_catalog()
+    if not success:
+        return False, catalog
+    compact = _state["compact"]
+    if compact is None or compact[0] is not catalog:
+        compact = (catalog, BarcodeIndex((barcode, art["id"]) for barcode, art in catalog.items()))
+        _state["compact"] = compact
+    return True, compact[1]
+
+
+def lookup(barcode):
+    """
+    Busca un artículo por código de barras. Devuelve (success, artículo | None).
+    Un fallo de búsqueda refresca el catálogo como mucho una vez por ventana de TTL.
+    """
+    barcode = str(barcode or "").strip()
+    success, catalog = get_catalog()
+    if not success or not barcode or barcode in catalog:
+        return success, catalog.get(barcode) if success else catalog
+
+    loaded_at = _state["loaded_at"]
+    with _lock:
+        if _state["loaded_at"] == loaded_at and time.time() - _state["miss_refresh_at"] >= settings.VERIAL_CATALOG_TTL:
+            _state["miss_refresh_at"] = time.time()
+            success, catalog = _refresh_locked()
+            if not success:
+                return False, catalog
+        catalog = _state["index"] or {}
+    return True, catalog.get(barcode)
+
+
+def invalidate():
+    """Caduca ambos niveles: la siguiente consulta vuelve a descargar el catálogo."""
+    with _lock:
+        reset()
+        VerialArticle.objects.update(fetched_at=EXPIRED)
+    logger.info("Catálogo Verial invalidado")
+
+
+def reset():
+    """Vacía solo la copia en memoria del proceso."""
+    _state.update({"index": None, "loaded_at": 0.0, "miss_refresh_at": 0.0, "compact": None})
@@ -0,0 +1,146 @@
+"""
+Índices compactos para el cruce de stock (código de barras -> artículo -> stock).
+
+Con decenas de miles de artículos, un dict {str: int} o {int: int} gasta casi
+toda su memoria en objetos Python (cada clave y cada valor es un objeto con
+cabecera propia). Aquí los códigos de barras se guardan como un único bloque
+de bytes de ancho fijo ordenado, y los IDs y stocks en array('q') / array('l'):
+la búsqueda es binaria y la memoria es la de los datos en bruto.
+
+Ambos índices exponen get() como un dict, de modo que el código que los
+consume también acepta un dict normal.
+"""
+from array import array
+from bisect import bisect_left
+
+
+class BarcodeIndex:
+    """Código de barras -> ID de artículo Verial sobre un bloque de bytes ordenado."""
+
+    def __init__(self, pairs=()):
+        encoded = sorted(
+            ((str(barcode).encode("utf-8"), int(verial_id)) for barcode, verial_id in pairs if barcode),
+            key=lambda pair: pair[0],
+        )
+        # Con códigos repetidos gana el último, como al construir un dict
+        keys, ids = [], array("q")
+        for key, verial_id in encoded:
+            if keys and keys[-1] == key:
+                ids[-1] = verial_id
+            else:
+                keys.append(key)
+                ids.append(verial_id)
+
+        self.width = max((len(key) for key in keys), default=0)
+        self._keys = b"".join(key.ljust(self.width, b"\0") for key in keys)
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, barcode):
+        return self._find(barcode) >= 0
+
+    def _key(self, position):
+        return self._keys[position * self.width:(position + 1) * self.width]
+
+    def _find(self, barcode):
+        if not barcode:
+            return -1
+        key = str(barcode).encode("utf-8")
+        if len(key) > self.width:
+            return -1
+        key = key.ljust(self.width, b"\0")
+        lo, hi = 0, len(self.ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.ids) and self._key(lo) == key else -1
+
+    def get(self, barcode, default=None):
+        position = self._find(barcode)
+        return self.ids[position] if position >= 0 else default
+
+    def get_many(self, barcodes, default=-1):
+        """
+        Busca muchos códigos a la vez con un merge join: se ordenan las claves
+        buscadas y se recorren en paralelo con el bloque ordenado, en vez de
+        hacer una búsqueda binaria por código. Devuelve array('q') alineado con
+        `barcodes` (default donde no hay coincidencia).
+        """
+        keys = []
+        for barcode in barcodes:
+            key = str(barcode).encode("utf-8") if barcode else b""
+            keys.append(key.ljust(self.width, b"\0") if key and len(key) <= self.width else None)
+        found = array("q", [default]) * len(keys)
+        position, size = 0, len(self.ids)
+        for i in sorted((i for i, key in enumerate(keys) if key is not None), key=keys.__getitem__):
+            key = keys[i]
+            while position < size and self._key(position) < key:
+                position += 1
+            if position == size:
+                break
+            if self._key(position) == key:
+                found[i] = self.ids[position]
+        return found
+
+    def nbytes(self):
+        return len(self._keys) + self.ids.itemsize * len(self.ids)
+
+
+class StockTable:
+    """ID de artículo -> stock sobre dos arrays paralelos ordenados por ID."""
+
+    def __init__(self, pairs=()):
+        # Un ID repetido suma (varios almacenes que van a la misma location)
+        self.ids = array("q")
+        self.stocks = array("l")
+        for verial_id, stock in sorted((int(v), int(s)) for v, s in pairs):
+            if self.ids and self.ids[-1] == verial_id:
+                self.stocks[-1] += stock
+            else:
+                self.ids.append(verial_id)
+                self.stocks.append(stock)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, verial_id):
+        position = bisect_left(self.ids, verial_id)
+        return position < len(self.ids) and self.ids[position] == verial_id
+
+    def get(self, verial_id, default=0):
+        position = bisect_left(self.ids, verial_id)
+        if position < len(self.ids) and self.ids[position] == verial_id:
+            return self.stocks[position]
+        return default
+
+    def items(self):
+        return zip(self.ids, self.stocks)
+
+    def nbytes(self):
+        return self.ids.itemsize * len(self.ids) + self.stocks.itemsize * len(self.stocks)
+
+
+def match_inventory(inventory_items, barcode_index):
+    """
+    Cruza los inventory items de Shopify [(inventory_item_id, sku, barcode)] con
+    el catálogo (por barcode o, si no hay, por SKU). Devuelve dos secuencias
+    paralelas: [inventory_item_id] y array('q') con el ID Verial de cada uno.
+    Acepta también un dict {barcode: id} como índice.
+    """
+    codes = [barcode or sku for _, sku, barcode in inventory_items]
+    if isinstance(barcode_index, BarcodeIndex):
+        found = barcode_index.get_many(codes, default=-1)
+    else:
+        found = [barcode_index.get(code, -1) if code else -1 for code in codes]
+
+    inventory_ids, verial_ids = [], array("q")
+    for item, verial_id in zip(inventory_items, found):
+        if verial_id != -1:
+            inventory_ids.append(item[0])
+            verial_ids.append(verial_id)
+    return inventory_ids, verial_ids
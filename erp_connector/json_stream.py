@@ -0,0 +1,112 @@
+"""
+Lectura incremental de respuestas JSON grandes de Verial.
+
+Las respuestas de GetArticulosWS / GetStockArticulosWS son un objeto de primer
+nivel con una lista enorme ("Articulos", "StockArticulos") y algunos campos
+pequeños ("InfoError"). iter_array_items recorre el documento trozo a trozo
+y devuelve los elementos de la lista uno a uno, de modo que nunca están en
+memoria a la vez el cuerpo crudo, el documento parseado y el índice derivado.
+Solo usa la biblioteca estándar (json.JSONDecoder.raw_decode).
+"""
+import codecs
+import json
+
+WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Buffer de texto sobre un iterable de trozos de bytes (o str)."""
+
+    def __init__(self, chunks, encoding):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder(encoding)(errors="strict").decode
+        self._eof = False
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        """Añade el siguiente trozo descartando lo ya consumido. False al final del documento."""
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._decode(b"", final=True)
+        else:
+            text = chunk if isinstance(chunk, str) else self._decode(chunk)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Siguiente carácter significativo (sin consumirlo) o None al final."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' y llegó {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decodifica el siguiente valor completo, leyendo más trozos si está partido."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Un número al final del buffer puede estar cortado ("12" de "125")
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_array_items(chunks, key, meta=None, encoding="utf-8"):
+    """
+    Recorre el objeto JSON de primer nivel servido en `chunks` y devuelve uno a
+    uno los elementos de la lista `key`. El resto de campos de primer nivel se
+    guardan en `meta` (si se pasa un dict) a medida que aparecen.
+    """
+    reader = _Reader(chunks, encoding)
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.pos += 1
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"JSON inválido en la lista {key}: {separator!r}")
+        else:
+            value = reader.value()
+            if meta is not None:
+                meta[name] = value
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"JSON inválido: {separator!r} tras el campo {name}")
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_connector', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerialArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verial_id', models.BigIntegerField(unique=True, verbose_name='ID Verial')),
+                ('barcode', models.CharField(blank=True, db_index=True, max_length=100, verbose_name='Código de barras')),
+                ('nombre', models.CharField(blank=True, max_length=255, verbose_name='Nombre')),
+                ('fetched_at', models.DateTimeField(verbose_name='Descargado')),
+            ],
+            options={
+                'verbose_name': 'Artículo Verial',
+                'verbose_name_plural': 'Catálogo Verial',
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('erp_connector', '0002_verialarticle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerialStockState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verial_id', models.BigIntegerField(unique=True, verbose_name='ID Verial')),
+                ('stock', models.IntegerField(verbose_name='Stock')),
+                ('hash', models.CharField(max_length=64, verbose_name='Hash de la fila')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Último cambio')),
+            ],
+            options={
+                'verbose_name': 'Stock Verial',
+                'verbose_name_plural': 'Stock Verial',
+            },
+        ),
+    ]
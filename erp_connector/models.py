@@ -15,4 +15,33 @@ class ERPSyncLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.action} - {self.shopify_id} - {'OK' if self.success else 'ERROR'}"
\ No newline at end of file
+        return f"{self.action} - {self.shopify_id} - {'OK' if self.success else 'ERROR'}"
+
+class VerialArticle(models.Model):
+    """Copia local del catálogo de Verial (índice código de barras -> artículo)."""
+    verial_id = models.BigIntegerField(unique=True, verbose_name="ID Verial")
+    barcode = models.CharField(max_length=100, blank=True, db_index=True, verbose_name="Código de barras")
+    nombre = models.CharField(max_length=255, blank=True, verbose_name="Nombre")
+    fetched_at = models.DateTimeField(verbose_name="Descargado")
+
+    class Meta:
+        verbose_name = "Artículo Verial"
+        verbose_name_plural = "Catálogo Verial"
+
+    def __str__(self):
+        return f"{self.verial_id} - {self.nombre}"
+
+
+class VerialStockState(models.Model):
+    """Último stock visto por artículo en Verial y hash de su fila (detección de cambios)."""
+    verial_id = models.BigIntegerField(unique=True, verbose_name="ID Verial")
+    stock = models.IntegerField(verbose_name="Stock")
+    hash = models.CharField(max_length=64, verbose_name="Hash de la fila")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Último cambio")
+
+    class Meta:
+        verbose_name = "Stock Verial"
+        verbose_name_plural = "Stock Verial"
+
+    def __str__(self):
+        return f"{self.verial_id}: {self.stock}"
@@ -0,0 +1,137 @@
+"""
+Sondeo incremental del stock de Verial.
+
+Mantiene en memoria y en VerialStockState la tabla {IdArticulo: (stock, hash)}
+con el último estado visto. Cada sondeo devuelve solo las filas de
+GetStockArticulosWS cuyo hash difiere del guardado. Con VERIAL_STOCK_DATE_FILTER
+se pide a Verial únicamente lo movido desde el último sondeo; si no, se
+descarga todo y se compara localmente.
+
+Los cambios no se dan por vistos hasta commit(): quien los consume confirma
+los que ha propagado y el resto vuelve a salir en el siguiente sondeo.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import VerialStockState
+from .verial_client import VerialClient
+
+logger = logging.getLogger('erp_connector')
+
+POLLS = metrics.counter("verial_stock_poll_total", "Sondeos de stock de Verial por modo")
+CHANGED = metrics.gauge("verial_stock_changed_articles", "Artículos con stock cambiado en el último sondeo")
+
+_state = {"table": None, "polled_at": None}
+_lock = threading.Lock()
+
+
+class StockChanges:
+    """Resultado de un sondeo: filas cambiadas y el estado a guardar al confirmarlas."""
+
+    def __init__(self, modo, started_at):
+        self.modo = modo
+        self.started_at = started_at
+        self.rows = {}      # IdArticulo -> fila de StockArticulos
+        self.states = {}    # IdArticulo -> (stock, hash)
+        self.recibidos = 0
+
+
+def row_hash(row):
+    return hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _table():
+    if _state["table"] is None:
+        _state["table"] = {
+            verial_id: (stock, digest)
+            for verial_id, stock, digest in VerialStockState.objects.values_list("verial_id", "stock", "hash")
+        }
+    return _state["table"]
+
+
+def poll(full=False, include=()):
+    """
+    Devuelve (success, StockChanges | error) con las filas que cambiaron.
+    Con full=True se descarga todo y se devuelven todas las filas (reconciliación).
+    `include` añade los IdArticulo indicados aunque no hayan cambiado (p.ej. los
+    de items recién mapeados); si los hay no se filtra por fecha.
+    """
+    include = set(include)
+    with _lock:
+        table = _table()
+        client = VerialClient()
+        if not client.is_configured():
+            return False, "Verial no configurado"
+
+        since = _state["polled_at"]
+        by_date = settings.VERIAL_STOCK_DATE_FILTER and since is not None and not full and not include
+        modo = "completo" if full else ("fecha" if by_date else "hash")
+        started_at = timezone.now()
+        # Un día de margen: el filtro de Verial es por fecha, no por hora
+        fecha = (since - timedelta(days=1)).date().isoformat() if by_date else None
+        success, result = client.iter_stock(id_articulo=0, fecha=fecha)
+        if not success:
+            return False, result
+
+        # Las filas llegan en streaming: solo se retienen las que cambiaron
+        changes = StockChanges(modo, started_at)
+        seen = set()
+        try:
+            for row in result:
+                if row.get("IdArticulo") is None:
+                    continue
+                verial_id = int(row["IdArticulo"])
+                seen.add(verial_id)
+                state = (int(float(row.get("Stock") or 0)), row_hash(row))
+                if full or verial_id in include or table.get(verial_id) != state:
+                    changes.rows[verial_id] = row
+                    changes.states[verial_id] = state
+        except (ValueError, requests.exceptions.RequestException) as e:
+            return False, f"Error leyendo el stock de Verial: {e}"
+        changes.recibidos = len(seen)
+
+        if not by_date:
+            # En una descarga completa, un artículo que ya no aparece pasa a stock 0
+            for verial_id in table.keys() - seen:
+                if table[verial_id][0] != 0 or full:
+                    changes.rows[verial_id] = {"IdArticulo": verial_id, "Stock": 0, "StockAlmacenes": []}
+                    changes.states[verial_id] = (0, "")
+
+        POLLS.inc(modo=modo)
+        CHANGED.set(len(changes.rows))
+        logger.info(f"Stock Verial [{modo}]: {changes.recibidos} filas recibidas, {len(changes.rows)} cambiadas")
+        return True, changes
+
+
+def commit(changes, exclude=()):
+    """Da por propagados los cambios (salvo los IdArticulo de exclude) en memoria y en BD."""
+    exclude = set(exclude)
+    with _lock:
+        table = _table()
+        states = {vid: state for vid, state in changes.states.items() if vid not in exclude}
+        with transaction.atomic():
+            VerialStockState.objects.bulk_create(
+                [VerialStockState(verial_id=vid, stock=stock, hash=digest) for vid, (stock, digest) in states.items()],
+                update_conflicts=True,
+                unique_fields=["verial_id"],
+                update_fields=["stock", "hash", "updated_at"],
+                batch_size=settings.BULK_UPSERT_CHUNK_SIZE,
+            )
+        table.update(states)
+        if not exclude:
+            _state["polled_at"] = changes.started_at
+    return len(states)
+
+
+def reset():
+    """Vacía solo la copia en memoria (se recarga desde BD en el siguiente sondeo)."""
+    _state.update({"table": None, "polled_at": None})
@@ -0,0 +1,191 @@
+"""
+Tests para la caché compartida del catálogo de Verial
+"""
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+import responses
+
+
+def _articles_url():
+    from erp_connector.verial_client import VerialClient
+    return f'{VerialClient().base_url}/GetArticulosWS'
+
+
+def _register_catalog(articles=None):
+    responses.add(
+        responses.GET, _articles_url(),
+        json={
+            'InfoError': {'Codigo': 0, 'Descripcion': None},
+            'Articulos': articles if articles is not None else [
+                {'Id': 1001, 'ReferenciaBarras': '8412345678901', 'Nombre': 'Producto 1'},
+                {'Id': 1002, 'ReferenciaBarras': ' 8412345678902 ', 'Nombre': 'Producto 2'},
+                {'Id': 1003, 'ReferenciaBarras': '', 'Nombre': 'Sin barras'},
+            ],
+        },
+    )
+
+
+def _downloads():
+    return sum(1 for call in responses.calls if 'GetArticulosWS' in call.request.url)
+
+
+@pytest.mark.integration
+class TestCatalogCache:
+    """Tests de los niveles memoria / BD / descarga"""
+
+    @responses.activate
+    def test_repeated_reads_download_once(self):
+        """Dos lecturas dentro del TTL comparten una descarga"""
+        from erp_connector import catalog_cache
+
+        _register_catalog()
+        ok, first = catalog_cache.get_catalog()
+        ok2, second = catalog_cache.get_catalog()
+
+        assert ok and ok2
+        assert first['8412345678902']['id'] == 1002
+        assert '' not in first
+        assert _downloads() == 1
+
+    @responses.activate
+    def test_new_process_reads_from_db(self):
+        """Sin copia en memoria se carga desde VerialArticle sin descargar"""
+        from erp_connector import catalog_cache
+        from erp_connector.models import VerialArticle
+
+        _register_catalog()
+        catalog_cache.get_catalog()
+        catalog_cache.reset()
+
+        ok, index = catalog_cache.get_barcode_index()
+
+        assert index == {'8412345678901': 1001, '8412345678902': 1002}
+        assert VerialArticle.objects.count() == 3
+        assert _downloads() == 1
+
+    @responses.activate
+    def test_compact_index_is_built_once_per_load(self):
+        """El índice compacto se reutiliza mientras no cambie el catálogo"""
+        from erp_connector import catalog_cache
+
+        _register_catalog()
+        ok, first = catalog_cache.get_compact_index()
+        ok2, second = catalog_cache.get_compact_index()
+
+        assert ok and ok2
+        assert first is second
+        assert first.get('8412345678902') == 1002
+        assert first.get('8412345678903') is None
+
+    @responses.activate
+    def test_expired_ttl_downloads_again_and_prunes(self, settings):
+        """Pasado el TTL se vuelve a descargar y se borran artículos retirados"""
+        from erp_connector import catalog_cache
+        from erp_connector.models import VerialArticle
+
+        _register_catalog()
+        catalog_cache.get_catalog()
+        settings.VERIAL_CATALOG_TTL = 0
+        responses.replace(responses.GET, _articles_url(), json={
+            'InfoError': {'Codigo': 0}, 'Articulos': [{'Id': 1001, 'ReferenciaBarras': '8412345678901'}],
+        })
+
+        catalog_cache.get_catalog()
+
+        assert _downloads() == 2
+        assert list(VerialArticle.objects.values_list('verial_id', flat=True)) == [1001]
+
+    @responses.activate
+    def test_invalidate_forces_download(self):
+        """invalidate() caduca memoria y BD"""
+        from erp_connector import catalog_cache
+
+        _register_catalog()
+        catalog_cache.get_catalog()
+        catalog_cache.invalidate()
+        catalog_cache.get_catalog()
+
+        assert _downloads() == 2
+
+    @responses.activate
+    def test_miss_refreshes_at_most_once_per_ttl(self):
+        """Un código desconocido provoca un único refresco por ventana de TTL"""
+        from erp_connector import catalog_cache
+
+        _register_catalog()
+        catalog_cache.get_catalog()
+
+        assert catalog_cache.lookup('0000') == (True, None)
+        assert catalog_cache.lookup('0001') == (True, None)
+        assert catalog_cache.lookup('8412345678901')[1]['id'] == 1001
+        assert _downloads() == 2
+
+    def test_concurrent_misses_share_one_download(self):
+        """Varios hilos sin caché esperan a una única descarga (single-flight)"""
+        from erp_connector import catalog_cache
+
+        calls = []
+
+        def slow_download():
+            calls.append(1)
+            time.sleep(0.05)
+            return True, {'1': {'id': 1, 'nombre': '', 'barcode': '1'}}
+
+        results = []
+        with patch.object(catalog_cache, '_download', side_effect=slow_download), \
+                patch.object(catalog_cache, '_load_from_db', return_value=False):
+            threads = [
+                threading.Thread(target=lambda: results.append(catalog_cache.get_catalog()))
+                for _ in range(5)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        assert len(calls) == 1
+        assert all(ok and index['1']['id'] == 1 for ok, index in results)
+
+    @responses.activate
+    def test_download_error_keeps_previous_copy(self, settings):
+        """Si Verial falla se sigue sirviendo la copia anterior"""
+        from erp_connector import catalog_cache
+
+        _register_catalog()
+        catalog_cache.get_catalog()
+        settings.VERIAL_CATALOG_TTL = 0
+        responses.replace(responses.GET, _articles_url(), status=500, body='error')
+
+        ok, index = catalog_cache.get_catalog()
+
+        assert ok is True
+        assert '8412345678901' in index
+
+
+@pytest.mark.integration
+class TestCatalogCallers:
+    """Los consumidores del catálogo comparten la caché"""
+
+    @responses.activate
+    def test_unmapped_lines_trigger_one_download(self, product):
+        """Varias variantes sin mapear solo descargan el catálogo una vez"""
+        from shopify_app.models import ProductVariant
+        from shopify_app.product_mapping import ensure_product_mapping
+
+        _register_catalog()
+        variants = [
+            ProductVariant.objects.create(
+                product=product, shopify_id=800 + i, title=f'V{i}', sku=f'C-{i}',
+                barcode=barcode, price=Decimal('1.00'),
+            )
+            for i, barcode in enumerate(['8412345678901', '8412345678902', '8412345678901'])
+        ]
+
+        mappings = [ensure_product_mapping(v) for v in variants]
+
+        assert [m.verial_id for m in mappings] == [1001, 1002, 1001]
+        assert _downloads() == 1
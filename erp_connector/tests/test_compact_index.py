@@ -0,0 +1,70 @@
+"""
+Tests para los índices compactos de código de barras y stock
+"""
+import pytest
+
+
+@pytest.mark.unit
+class TestBarcodeIndex:
+    """Tests del índice código de barras -> ID Verial"""
+
+    def test_lookup_matches_a_dict(self):
+        """Cada código se encuentra y los ausentes devuelven el valor por defecto"""
+        from erp_connector.compact_index import BarcodeIndex
+
+        pairs = [('8410000000003', 3), ('123', 1), ('8410000000001', 2), ('ABC-ñ', 4)]
+        index = BarcodeIndex(pairs)
+
+        assert len(index) == 4
+        for barcode, verial_id in pairs:
+            assert index.get(barcode) == verial_id
+        assert index.get('12') is None
+        assert index.get('1234') is None
+        assert index.get('84100000000010000') is None
+        assert index.get('', -1) == -1
+        assert '123' in index
+
+    def test_repeated_barcode_keeps_last(self):
+        """Con códigos repetidos gana el último, como en un dict"""
+        from erp_connector.compact_index import BarcodeIndex
+
+        index = BarcodeIndex([('841', 1), ('842', 2), ('841', 3), ('', 9)])
+
+        assert len(index) == 2
+        assert index.get('841') == 3
+
+    def test_storage_is_compact(self):
+        """Los códigos ocupan un bloque de ancho fijo y los IDs 8 bytes"""
+        from erp_connector.compact_index import BarcodeIndex
+
+        index = BarcodeIndex((f'84{i:011d}', i) for i in range(1000))
+
+        assert index.width == 13
+        assert index.nbytes() == 1000 * (13 + 8)
+
+
+@pytest.mark.unit
+class TestStockTable:
+    """Tests de la tabla ID -> stock"""
+
+    def test_get_and_sum_of_repeated_ids(self):
+        """Los IDs repetidos suman y los ausentes devuelven 0"""
+        from erp_connector.compact_index import StockTable
+
+        table = StockTable([(1002, 4), (1000, 5), (1002, 3)])
+
+        assert dict(table.items()) == {1000: 5, 1002: 7}
+        assert table.get(1001) == 0
+        assert 1000 in table
+
+    def test_match_inventory(self):
+        """El cruce usa el barcode o, si falta, el SKU"""
+        from erp_connector.compact_index import BarcodeIndex, match_inventory
+
+        index = BarcodeIndex([('841', 1), ('SKU-2', 2)])
+        items = [('inv-1', 'SKU-1', '841'), ('inv-2', 'SKU-2', ''), ('inv-3', 'SKU-3', '999'), ('inv-4', '', '')]
+
+        inventory_ids, verial_ids = match_inventory(items, index)
+
+        assert inventory_ids == ['inv-1', 'inv-2']
+        assert list(verial_ids) == [1, 2]
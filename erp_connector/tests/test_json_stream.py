@@ -0,0 +1,99 @@
+"""
+Tests para la lectura en streaming de respuestas JSON de Verial
+"""
+import json
+
+import pytest
+import responses
+
+
+def _chunks(document, size):
+    raw = json.dumps(document, ensure_ascii=False).encode('utf-8')
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+ARTICULOS = [
+    {'Id': i, 'ReferenciaBarras': f'84{i:011d}', 'Nombre': f'Proteína ñ {i}', 'Precio': 12.5 + i, 'Activo': True}
+    for i in range(25)
+]
+
+
+@pytest.mark.unit
+class TestIterArrayItems:
+    """Tests del parser incremental"""
+
+    @pytest.mark.parametrize('size', [1, 3, 7, 64, 100000])
+    def test_items_survive_any_chunk_boundary(self, size):
+        """Los elementos salen iguales aunque los trozos corten números, strings o caracteres UTF-8"""
+        from erp_connector.json_stream import iter_array_items
+
+        document = {'InfoError': {'Codigo': 0, 'Descripcion': None}, 'Articulos': ARTICULOS, 'Total': 12345}
+        meta = {}
+
+        items = list(iter_array_items(_chunks(document, size), 'Articulos', meta))
+
+        assert items == ARTICULOS
+        assert meta == {'InfoError': {'Codigo': 0, 'Descripcion': None}, 'Total': 12345}
+
+    def test_empty_list_and_missing_key(self):
+        """Una lista vacía o ausente no devuelve elementos"""
+        from erp_connector.json_stream import iter_array_items
+
+        assert list(iter_array_items(_chunks({'Articulos': []}, 4), 'Articulos')) == []
+        assert list(iter_array_items(_chunks({'Otra': [1, 2]}, 4), 'Articulos')) == []
+
+    def test_truncated_document_raises(self):
+        """Un documento cortado a mitad se detecta"""
+        from erp_connector.json_stream import iter_array_items
+
+        raw = json.dumps({'Articulos': ARTICULOS}).encode('utf-8')[:-40]
+
+        with pytest.raises(ValueError):
+            list(iter_array_items([raw], 'Articulos'))
+
+
+@pytest.mark.integration
+class TestVerialClientStreaming:
+    """Tests de iter_articles / iter_stock contra Verial simulado"""
+
+    @responses.activate
+    def test_iter_articles_yields_items(self):
+        """iter_articles devuelve los artículos uno a uno"""
+        from erp_connector.verial_client import VerialClient
+
+        client = VerialClient()
+        responses.add(responses.GET, f'{client.base_url}/GetArticulosWS',
+                      json={'InfoError': {'Codigo': 0, 'Descripcion': None}, 'Articulos': ARTICULOS})
+
+        success, items = client.iter_articles()
+
+        assert success is True
+        assert [a['Id'] for a in items] == list(range(25))
+
+    @responses.activate
+    def test_iter_stock_reports_info_error(self):
+        """Un InfoError con código distinto de 0 se notifica al iterar"""
+        from erp_connector.verial_client import VerialClient
+
+        client = VerialClient()
+        responses.add(responses.GET, f'{client.base_url}/GetStockArticulosWS',
+                      json={'InfoError': {'Codigo': 3, 'Descripcion': 'Sesión caducada'}, 'StockArticulos': []})
+
+        success, items = client.iter_stock()
+
+        assert success is True
+        with pytest.raises(ValueError, match='Sesión caducada'):
+            list(items)
+
+    @responses.activate
+    def test_http_error_fails_before_iterating(self):
+        """Un HTTP distinto de 200 se devuelve como error directamente"""
+        from erp_connector.verial_client import VerialClient
+
+        client = VerialClient()
+        responses.add(responses.GET, f'{client.base_url}/GetStockArticulosWS', status=404)
+
+        success, error = client.iter_stock()
+
+        assert success is False
+        assert '404' in error
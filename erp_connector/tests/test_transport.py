@@ -0,0 +1,193 @@
+"""
+Tests para el transporte HTTP compartido (pool keep-alive y métricas)
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import responses
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"InfoError": {"Codigo": 0}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    """Servidor HTTP/1.1 local con keep-alive"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def clean_sessions():
+    from erp_connector import transport
+    transport.close_sessions()
+    yield
+    transport.close_sessions()
+
+
+@pytest.mark.unit
+class TestTransportSessions:
+    """Tests para la gestión de sesiones por host"""
+
+    def test_same_host_shares_session(self):
+        """Dos URLs del mismo host usan la misma sesión"""
+        from erp_connector import transport
+
+        a = transport.get_session('http://verial.local:8080/WcfServiceLibraryVerial/GetArticulosWS')
+        b = transport.get_session('http://verial.local:8080/WcfServiceLibraryVerial/GetStockArticulosWS')
+        c = transport.get_session('https://test-shop.myshopify.com/admin/api/2024-01/graphql.json')
+
+        assert a is b
+        assert a is not c
+
+    def test_numeric_timeout_is_read_timeout(self, settings):
+        """Un timeout numérico se combina con el timeout de conexión configurado"""
+        from erp_connector.transport import _timeout
+
+        settings.HTTP_CONNECT_TIMEOUT = 3
+        settings.HTTP_READ_TIMEOUT = 25
+
+        assert _timeout(None) == (3, 25)
+        assert _timeout(10) == (3, 10)
+        assert _timeout((1, 2)) == (1, 2)
+
+    def test_post_is_not_retried(self):
+        """Los POST no se reintentan a nivel de transporte"""
+        from erp_connector import transport
+
+        session = transport.get_session('http://verial.local:8080/')
+        retry = session.get_adapter('http://verial.local:8080/').max_retries
+
+        assert 'GET' in retry.allowed_methods
+        assert 'POST' not in retry.allowed_methods
+
+
+@pytest.mark.integration
+class TestTransportMetrics:
+    """Tests para las métricas del transporte"""
+
+    def test_connections_are_reused(self, local_server):
+        """Varias peticiones al mismo host abren una sola conexión"""
+        from erp_connector import transport
+
+        before_opened = transport.CONNECTIONS_OPENED.value(host=local_server)
+        before_reused = transport.CONNECTIONS_REUSED.value(host=local_server)
+
+        for _ in range(5):
+            response = transport.get(f"{local_server}/GetArticulosWS")
+            assert response.status_code == 200
+
+        assert transport.CONNECTIONS_OPENED.value(host=local_server) - before_opened == 1
+        assert transport.CONNECTIONS_REUSED.value(host=local_server) - before_reused == 4
+        stats = transport.get_transport_stats()[local_server]
+        assert stats['peticiones'] >= 5
+
+    @responses.activate
+    def test_requests_are_counted_per_status(self):
+        """Cada petición se cuenta por host, método y estado"""
+        from erp_connector import transport
+
+        host = 'http://verial.local:8080'
+        responses.add(responses.GET, f'{host}/GetArticulosWS', json={}, status=200)
+        before = transport.REQUESTS.value(host=host, method='GET', status=200)
+
+        transport.get(f'{host}/GetArticulosWS')
+
+        assert transport.REQUESTS.value(host=host, method='GET', status=200) == before + 1
+
+    def test_metrics_endpoint_renders_prometheus(self, api_client, settings):
+        """El endpoint /metrics/ expone las métricas en formato Prometheus"""
+        settings.METRICS_TOKEN = 'secreto'
+        response = api_client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secreto')
+
+        assert response.status_code == 200
+        body = response.content.decode()
+        assert '# TYPE http_client_request_duration_seconds histogram' in body
+        assert '# TYPE http_client_connections_opened_total counter' in body
+
+    @pytest.mark.parametrize('url', ['/metrics/', '/erp/transport-stats/'])
+    def test_metrics_endpoints_require_staff_or_token(self, api_client, settings, url):
+        """Sin usuario staff ni token válido las métricas no se sirven"""
+        settings.METRICS_TOKEN = 'secreto'
+
+        assert api_client.get(url).status_code == 403
+        assert api_client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code == 403
+        assert api_client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code == 200
+
+    def test_metrics_endpoint_allows_staff(self, api_client, settings):
+        """Un usuario staff accede sin token; sin token configurado solo staff"""
+        from django.contrib.auth import get_user_model
+
+        settings.METRICS_TOKEN = ''
+        assert api_client.get('/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code == 403
+
+        user = get_user_model().objects.create_user('ops', password='x', is_staff=True)
+        api_client.force_login(user)
+
+        assert api_client.get('/metrics/').status_code == 200
+
+    def test_runner_metrics_server_exposes_process_registry(self):
+        """start_http_server publica el registro del proceso (sync_runner) en /metrics"""
+        from urllib.request import urlopen
+        from erp_connector import metrics
+
+        metrics.counter('runner_probe_test_total', 'Contador de prueba').inc(3)
+        server = metrics.start_http_server(0, '127.0.0.1')
+        try:
+            with urlopen(f'http://127.0.0.1:{server.server_port}/metrics', timeout=5) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert 'runner_probe_test_total 3' in body
+
+
+@pytest.mark.unit
+class TestRateLimit:
+    """Tests para el límite de peticiones por host"""
+
+    def test_limiter_spaces_requests(self):
+        """Las peticiones por encima del ritmo esperan su hueco"""
+        from unittest.mock import patch
+        from erp_connector.transport import RateLimiter
+
+        limiter = RateLimiter(rate=10)
+        with patch('erp_connector.transport.time.sleep') as sleep:
+            waits = [limiter.acquire() for _ in range(3)]
+
+        assert waits[0] == 0
+        assert waits[1] > 0 and waits[2] > waits[1]
+        assert sleep.call_count == 2
+
+    @responses.activate
+    def test_only_configured_host_is_limited(self, settings):
+        """Solo los hosts de HTTP_RATE_LIMITS pasan por el limitador"""
+        from erp_connector import transport
+
+        settings.HTTP_RATE_LIMITS = {'http://verial.local': 1000}
+        responses.add(responses.GET, 'http://verial.local/a', json={})
+        responses.add(responses.GET, 'http://other.local/a', json={})
+
+        transport.get('http://verial.local/a')
+        transport.get('http://other.local/a')
+
+        assert transport.get_rate_limiter('http://verial.local/x').rate == 1000
+        assert transport.get_rate_limiter('http://other.local/x') is None
@@ -0,0 +1,201 @@
+"""
+Transporte HTTP compartido: una requests.Session con pool keep-alive por host,
+timeouts de conexión/lectura explícitos, reintentos con backoff a nivel de
+transporte y métricas por host (conexiones abiertas/reutilizadas, latencia).
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+logger = logging.getLogger("erp_connector")
+
+REQUESTS = metrics.counter("http_client_requests_total", "Peticiones HTTP salientes por host, método y estado")
+ERRORS = metrics.counter("http_client_errors_total", "Errores de red en peticiones HTTP salientes")
+RETRIES = metrics.counter("http_client_retries_total", "Reintentos realizados por el transporte")
+CONNECTIONS_OPENED = metrics.counter("http_client_connections_opened_total", "Conexiones TCP abiertas por host")
+CONNECTIONS_REUSED = metrics.counter("http_client_connections_reused_total", "Peticiones servidas con una conexión reutilizada")
+LATENCY = metrics.histogram("http_client_request_duration_seconds", "Latencia de peticiones HTTP salientes por host")
+THROTTLED = metrics.counter("http_client_rate_limited_total", "Peticiones retenidas por el límite de peticiones por host")
+
+_sessions = {}
+_pool_counts = {}
+_limiters = {}
+_lock = threading.Lock()
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _build_retry():
+    return Retry(
+        total=settings.HTTP_MAX_RETRIES,
+        connect=settings.HTTP_MAX_RETRIES,
+        read=settings.HTTP_MAX_RETRIES,
+        status=settings.HTTP_MAX_RETRIES,
+        backoff_factor=settings.HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 502, 503, 504),
+        # POST no es idempotente (NuevoDocClienteWS crearía pedidos duplicados)
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def get_session(url):
+    """Devuelve la sesión (pool keep-alive) del host de la URL, creándola una vez por proceso."""
+    host = _host_key(url)
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=settings.HTTP_POOL_SIZE,
+                max_retries=_build_retry(),
+            )
+            session.mount(host, adapter)
+            _sessions[host] = session
+            _pool_counts[host] = (0, 0)
+    return session
+
+
+def _record_connections(host, session):
+    """Actualiza los contadores de conexiones a partir de los pools de urllib3."""
+    adapter = session.get_adapter(host)
+    pools = adapter.poolmanager.pools
+    opened = 0
+    served = 0
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is not None:
+            opened += pool.num_connections
+            served += pool.num_requests
+    with _lock:
+        last_opened, last_served = _pool_counts.get(host, (0, 0))
+        _pool_counts[host] = (opened, served)
+    new_connections = max(opened - last_opened, 0)
+    new_requests = max(served - last_served, 0)
+    if new_connections:
+        CONNECTIONS_OPENED.inc(new_connections, host=host)
+    if new_requests > new_connections:
+        CONNECTIONS_REUSED.inc(new_requests - new_connections, host=host)
+
+
+class RateLimiter:
+    """Reparte las salidas hacia un host a un máximo de `rate` peticiones por segundo."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta el siguiente hueco libre. Devuelve los segundos esperados."""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+
+def get_rate_limiter(url):
+    """Limitador del host según settings.HTTP_RATE_LIMITS ({"http://host:puerto": peticiones/s})."""
+    host = _host_key(url)
+    rate = settings.HTTP_RATE_LIMITS.get(host)
+    if not rate:
+        return None
+    limiter = _limiters.get(host)
+    if limiter is None or limiter.rate != rate:
+        with _lock:
+            limiter = _limiters.get(host)
+            if limiter is None or limiter.rate != rate:
+                limiter = _limiters[host] = RateLimiter(rate)
+    return limiter
+
+
+def _timeout(timeout):
+    if timeout is None:
+        return (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+    if isinstance(timeout, (int, float)):
+        return (settings.HTTP_CONNECT_TIMEOUT, timeout)
+    return timeout
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Equivalente a requests.request pero a través del pool del host.
+    Un timeout numérico se interpreta como timeout de lectura.
+    """
+    host = _host_key(url)
+    session = get_session(url)
+    limiter = get_rate_limiter(url)
+    if limiter is not None and limiter.acquire():
+        THROTTLED.inc(host=host)
+    started = time.monotonic()
+    try:
+        response = session.request(method, url, timeout=_timeout(timeout), **kwargs)
+    except requests.exceptions.RequestException as e:
+        ERRORS.inc(host=host, error=type(e).__name__)
+        raise
+    finally:
+        LATENCY.observe(time.monotonic() - started, host=host)
+        _record_connections(host, session)
+
+    REQUESTS.inc(host=host, method=method.upper(), status=response.status_code)
+    retries = getattr(getattr(response.raw, "retries", None), "history", None)
+    if retries:
+        RETRIES.inc(len(retries), host=host)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get_transport_stats():
+    """Resumen por host: peticiones, conexiones abiertas/reutilizadas y latencia."""
+    stats = {}
+    latency = LATENCY.snapshot()
+    for host in list(_sessions):
+        host_latency = latency.get(f'{{host="{host}"}}', {})
+        stats[host] = {
+            "peticiones": sum(
+                value for name, key, value in REQUESTS.samples() if ("host", host) in key
+            ),
+            "conexiones_abiertas": CONNECTIONS_OPENED.value(host=host),
+            "conexiones_reutilizadas": CONNECTIONS_REUSED.value(host=host),
+            "reintentos": RETRIES.value(host=host),
+            "latencia_media_s": host_latency.get("avg", 0),
+        }
+    return stats
+
+
+def close_sessions():
+    """Cierra todos los pools (útil en tests o al terminar un proceso)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _pool_counts.clear()
+        _limiters.clear()
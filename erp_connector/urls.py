@@ -5,4 +5,5 @@ urlpatterns = [
     path("test-connection/", views.test_erp_connection),
     path("products/", views.get_verial_products),
     path("stock/", views.get_verial_stock),
+    path("transport-stats/", views.transport_stats),
 ]
\ No newline at end of file
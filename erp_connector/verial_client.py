@@ -1,10 +1,14 @@
+import hashlib
 import requests
 import json
 import logging
 from django.conf import settings
+from . import json_stream, transport
 
 logger = logging.getLogger("verial")
 
+STREAM_CHUNK_SIZE = 64 * 1024
+
 class VerialClient:
     def __init__(self):
         self.server = settings.VERIAL_SERVER
@@ -30,7 +34,7 @@ class VerialClient:
                 'top': 1  # Solo 1 artículo para probar
             }
             
-            response = requests.get(
+            response = transport.get(
                 url,
                 params=params,
                 timeout=10
@@ -70,7 +74,7 @@ class VerialClient:
         payload["sesionwcf"] = self.online_session if use_online_session else self.session
 
         try:
-            response = requests.post(
+            response = transport.post(
                 url,
                 headers=self.headers,
                 data=json.dumps(payload),
@@ -99,7 +103,7 @@ class VerialClient:
         """Busca cliente por NIF usando GET."""
         url = f"{self.base_url}/GetClientesWS?x={self.session}&nif={nif}"
         try:
-            response = requests.get(url, timeout=20)
+            response = transport.get(url, timeout=20)
             ok, data = self._handle_response(response)
             if ok:
                 clientes = data.get("Clientes", [])
@@ -129,22 +133,104 @@ class VerialClient:
             return False, response
         return self._handle_response(response)
 
+    def get_orders_status(self, verial_ids):
+        """
+        Estado de varios pedidos en Verial (EstadoPedidosWS). Devuelve
+        (success, [{"Id", "Estado", ...}] | error).
+        """
+        success, response = self._post("EstadoPedidosWS", {"Pedidos": [{"Id": int(i)} for i in verial_ids]})
+        if not success:
+            return False, response
+        ok, data = self._handle_response(response)
+        if not ok:
+            return False, data
+        return True, data.get("Pedidos") or []
+
     # --- ARTÍCULOS Y STOCK ---
 
     def get_articles(self):
         """Obtiene catálogo completo."""
         url = f"{self.base_url}/GetArticulosWS?x={self.session}"
         try:
-            response = requests.get(url, timeout=30)
+            response = transport.get(url, timeout=30)
             return self._handle_response(response)
         except Exception as e:
             return False, str(e)
 
-    def get_stock(self, id_articulo: int = 0):
-        """Obtiene stock filtrado o total."""
-        url = f"{self.base_url}/GetStockArticulosWS?x={self.session}&id_articulo={id_articulo}"
+    def get_stock(self, id_articulo: int = 0, fecha: str = None):
+        """Obtiene stock filtrado o total. Con fecha (AAAA-MM-DD), solo artículos con movimientos desde ese día."""
         try:
-            response = requests.get(url, timeout=30)
+            response = transport.get(self._stock_url(id_articulo, fecha), timeout=30)
             return self._handle_response(response)
         except Exception as e:
-            return False, str(e)
\ No newline at end of file
+            return False, str(e)
+
+    def _stock_url(self, id_articulo, fecha):
+        url = f"{self.base_url}/GetStockArticulosWS?x={self.session}&id_articulo={id_articulo}"
+        if fecha:
+            url += f"&fecha={fecha}"
+        return url
+
+    # --- LECTURA EN STREAMING (catálogo y stock completos) ---
+
+    def iter_articles(self):
+        """Como get_articles, pero devuelve (success, iterador de Articulos | error) sin cargar el documento entero."""
+        return self._stream_items(f"{self.base_url}/GetArticulosWS?x={self.session}", "Articulos")
+
+    def iter_stock(self, id_articulo: int = 0, fecha: str = None):
+        """Como get_stock, pero devuelve (success, iterador de StockArticulos | error)."""
+        return self._stream_items(self._stock_url(id_articulo, fecha), "StockArticulos")
+
+    def stock_fingerprint(self, id_articulo: int = 0, fecha: str = None):
+        """
+        Huella (sha256) del cuerpo de GetStockArticulosWS tal como llega, sin
+        parsear el JSON. Sirve de sonda barata para saber si el stock cambió.
+        Devuelve (success, hexdigest | error).
+        """
+        try:
+            response = transport.get(self._stock_url(id_articulo, fecha), timeout=30, stream=True)
+        except Exception as e:
+            return False, str(e)
+        try:
+            if response.status_code != 200:
+                return False, f"Error servidor Verial (HTTP {response.status_code})"
+            digest = hashlib.sha256()
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                digest.update(chunk)
+            return True, digest.hexdigest()
+        except Exception as e:
+            return False, str(e)
+        finally:
+            response.close()
+
+    def _stream_items(self, url, key):
+        try:
+            response = transport.get(url, timeout=30, stream=True)
+        except Exception as e:
+            return False, str(e)
+        if response.status_code != 200:
+            response.close()
+            return False, f"Error servidor Verial (HTTP {response.status_code})"
+        return True, self._iter_response(response, key)
+
+    def _iter_response(self, response, key):
+        """
+        Elementos de la lista `key` según llegan. Un InfoError con Codigo != 0 o un
+        documento cortado se notifican con ValueError al iterar.
+        """
+        meta = {}
+        chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+        try:
+            for item in json_stream.iter_array_items(chunks, key, meta, encoding=response.encoding or "utf-8"):
+                if "InfoError" in meta:
+                    self._check_info_error(meta)
+                yield item
+            self._check_info_error(meta)
+        finally:
+            response.close()
+
+    @staticmethod
+    def _check_info_error(meta):
+        info = meta.get("InfoError") or {}
+        if info.get("Codigo") != 0:
+            raise ValueError(info.get("Descripcion") or "Error desconocido")
\ No newline at end of file
@@ -1,5 +1,11 @@
-from django.http import JsonResponse
+import hmac
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from . import metrics
 from .models import ERPSyncLog
+from .transport import get_transport_stats
 from .verial_client import VerialClient
 
 
@@ -21,6 +27,39 @@ def test_erp_connection(request):
     })
 
 
+def metrics_access_required(view):
+    """
+    Las métricas revelan hosts internos, latencias y contadores de los jobs:
+    solo para usuarios staff o con "Authorization: Bearer <METRICS_TOKEN>".
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated and user.is_staff:
+            return view(request, *args, **kwargs)
+        token = settings.METRICS_TOKEN
+        auth = request.headers.get("Authorization", "")
+        if token and hmac.compare_digest(auth, f"Bearer {token}"):
+            return view(request, *args, **kwargs)
+        return HttpResponseForbidden("Acceso restringido")
+    return wrapped
+
+
+@metrics_access_required
+def metrics_view(request):
+    """Métricas del proceso en formato de texto Prometheus."""
+    return HttpResponse(
+        metrics.REGISTRY.render_prometheus(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@metrics_access_required
+def transport_stats(request):
+    """Resumen por host del transporte HTTP (conexiones y latencia)."""
+    return JsonResponse({"hosts": get_transport_stats()})
+
+
 def get_verial_products(request):
     """Obtener productos de Verial."""
     client = VerialClient()
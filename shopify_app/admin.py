@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.shortcuts import redirect
 from django.urls import path
-from .models import Shop, Order, OrderLine, Product, ProductVariant, Customer, ProductMapping, CustomerMapping, OrderMapping
+from .models import Shop, Order, OrderLine, Product, ProductVariant, Customer, ProductMapping, CustomerMapping, OrderMapping, StockSnapshot, StockLocationMapping, ShopifyInventoryItem, WebhookInbox, JobLease
 from .views import sync_orders, sync_products, sync_customers
 
 admin.site.site_header = "Nutricione"
@@ -153,4 +153,34 @@ class CustomerMappingAdmin(admin.ModelAdmin):
 class OrderMappingAdmin(admin.ModelAdmin):
     list_display = ['order', 'verial_id', 'verial_numero', 'verial_referencia', 'last_sync']
     search_fields = ['order__name', 'verial_referencia', 'verial_numero']
-    readonly_fields = ['created_at', 'last_sync']
\ No newline at end of file
+    readonly_fields = ['created_at', 'last_sync']
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['inventory_item_id', 'location_id', 'quantity', 'pushed_at']
+    search_fields = ['inventory_item_id']
+    readonly_fields = ['pushed_at']
+
+@admin.register(StockLocationMapping)
+class StockLocationMappingAdmin(admin.ModelAdmin):
+    list_display = ['verial_almacen_id', 'location_name', 'shopify_location_id', 'active', 'updated_at']
+    list_filter = ['active']
+    search_fields = ['location_name', 'shopify_location_id']
+
+@admin.register(ShopifyInventoryItem)
+class ShopifyInventoryItemAdmin(admin.ModelAdmin):
+    list_display = ['inventory_item_id', 'sku', 'barcode', 'updated_at', 'indexed_at']
+    search_fields = ['inventory_item_id', 'sku', 'barcode']
+    readonly_fields = ['indexed_at']
+
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ['webhook_id', 'topic', 'shop_domain', 'status', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'topic']
+    search_fields = ['webhook_id']
+    readonly_fields = ['received_at', 'processed_at', 'claimed_at', 'claim_token']
+
+@admin.register(JobLease)
+class JobLeaseAdmin(admin.ModelAdmin):
+    list_display = ['name', 'owner', 'acquired_at', 'heartbeat_at', 'expires_at', 'last_finished_at', 'runs']
+    readonly_fields = ['acquired_at', 'heartbeat_at', 'expires_at', 'last_finished_at', 'runs']
@@ -0,0 +1,123 @@
+import logging
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ShopifyInventoryItem, SyncWatermark
+from .stock_sync import graphql_request
+
+logger = logging.getLogger('stock')
+
+WATERMARK_RESOURCE = "inventory_items"
+
+INVENTORY_ITEMS_QUERY = """
+query InventoryItems($cursor: String, $query: String) {
+    inventoryItems(first: 250, after: $cursor, query: $query) {
+        nodes {
+            id
+            sku
+            updatedAt
+            variant { legacyResourceId barcode }
+        }
+        pageInfo { hasNextPage endCursor }
+    }
+}
+"""
+
+
+def fetch_inventory_item_pages(shop, updated_since=None):
+    """
+    Genera páginas de inventoryItems desde Shopify.
+    Con updated_since solo pide los items modificados desde esa fecha.
+    """
+    variables = {"cursor": None, "query": None}
+    if updated_since:
+        variables["query"] = f"updated_at:>='{updated_since.isoformat()}'"
+
+    while True:
+        data = graphql_request(shop, INVENTORY_ITEMS_QUERY, variables)
+        inv_data = ((data or {}).get("data") or {}).get("inventoryItems")
+        if not inv_data:
+            if data is None or data.get("errors"):
+                raise RuntimeError(f"Error leyendo inventoryItems: {(data or {}).get('errors')}")
+            return
+        yield inv_data["nodes"]
+        if not inv_data["pageInfo"]["hasNextPage"]:
+            return
+        variables["cursor"] = inv_data["pageInfo"]["endCursor"]
+
+
+def _to_index_row(shop, node):
+    variant = node.get("variant") or {}
+    legacy_id = variant.get("legacyResourceId")
+    return ShopifyInventoryItem(
+        shop=shop,
+        inventory_item_id=node["id"],
+        variant_shopify_id=int(legacy_id) if legacy_id else None,
+        sku=str(node.get("sku") or "").strip(),
+        barcode=str(variant.get("barcode") or "").strip(),
+        updated_at=parse_datetime(node["updatedAt"]) if node.get("updatedAt") else None,
+    )
+
+
+def refresh_inventory_index(shop, full=False):
+    """
+    Actualiza el índice local de inventoryItems.
+    Incremental por defecto (desde la marca de agua); full=True reconstruye
+    el índice completo y elimina los items que ya no existen en Shopify. El
+    incremental no ve los borrados ni todos los cambios de barcode (editar la
+    variante no siempre mueve el updatedAt del inventoryItem), por eso
+    sync_runner programa además una reconstrucción completa periódica.
+    """
+    watermark = None if full else SyncWatermark.get_value(shop, WATERMARK_RESOURCE)
+    started_at = timezone.now()
+    new_watermark = watermark
+    upserted = 0
+
+    try:
+        for page in fetch_inventory_item_pages(shop, updated_since=watermark):
+            rows = [_to_index_row(shop, node) for node in page]
+            with transaction.atomic():
+                ShopifyInventoryItem.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["inventory_item_id"],
+                    update_fields=["shop", "variant_shopify_id", "sku", "barcode", "updated_at", "indexed_at"],
+                )
+            upserted += len(rows)
+            for row in rows:
+                if row.updated_at and (new_watermark is None or row.updated_at > new_watermark):
+                    new_watermark = row.updated_at
+    except RuntimeError as e:
+        logger.error(f"Error refrescando índice de inventario: {e}")
+        return False, {"error": str(e)}
+
+    deleted = 0
+    if full:
+        # Lo que no se ha vuelto a indexar en esta pasada ya no existe en Shopify
+        deleted, _ = ShopifyInventoryItem.objects.filter(
+            shop=shop, indexed_at__lt=started_at
+        ).delete()
+        new_watermark = new_watermark or started_at
+
+    if new_watermark:
+        SyncWatermark.set_value(shop, WATERMARK_RESOURCE, new_watermark)
+
+    logger.info(
+        f"Índice de inventario ({'completo' if full else 'incremental'}): "
+        f"{upserted} actualizados, {deleted} eliminados"
+    )
+    return True, {"actualizados": upserted, "eliminados": deleted, "completo": full}
+
+
+def get_indexed_inventory_items(shop):
+    """
+    Devuelve [(inventory_item_id, sku, barcode), ...] desde el índice local.
+    Si el índice está vacío se construye una vez desde Shopify.
+    """
+    items = ShopifyInventoryItem.objects.filter(shop=shop).values_list("inventory_item_id", "sku", "barcode")
+    result = list(items)
+    if not result:
+        refresh_inventory_index(shop, full=True)
+        result = list(items.all())
+    return result
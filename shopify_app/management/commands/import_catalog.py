@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from shopify_app.models import Shop
+from shopify_app.services.bulk_operations import import_products_bulk
+from shopify_app.services.shopify_ingest import ShopifyFetchError, fetch_pages, ingest_products
+
+
+class Command(BaseCommand):
+    help = 'Importa el catálogo completo de Shopify (productos y variantes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Usa Shopify Bulk Operations en lugar de la paginación REST',
+        )
+
+    def handle(self, *args, **options):
+        shop = Shop.objects.first()
+        if not shop:
+            self.stdout.write(self.style.ERROR("Tienda no configurada"))
+            return
+
+        if options['bulk']:
+            self.stdout.write('Lanzando operación masiva de productos en Shopify...')
+            success, result = import_products_bulk(shop)
+        else:
+            self.stdout.write('Importando productos vía REST...')
+            url = f"https://{shop.shop}/admin/api/2024-01/products.json?limit=250"
+            headers = {"X-Shopify-Access-Token": shop.access_token}
+            try:
+                success, result = True, ingest_products(shop, fetch_pages(url, headers, "products"))
+            except ShopifyFetchError as e:
+                success, result = False, {"error": str(e)}
+
+        if success:
+            detalle = result['detalle']
+            self.stdout.write(self.style.SUCCESS(
+                f"Catálogo importado: {result['products']} productos, {result['variants']} variantes "
+                f"(nuevos: {detalle['productos']['insertados']}, actualizados: {detalle['productos']['actualizados']})"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"Error: {result.get('error', 'Desconocido')}"))
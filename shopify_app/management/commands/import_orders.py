@@ -0,0 +1,49 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from shopify_app.models import Shop
+from shopify_app.services.bulk_operations import import_orders_bulk
+
+
+def _parse_since(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Fecha no válida: {value} (usa YYYY-MM-DD o ISO 8601)")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Backfill de pedidos de Shopify mediante Bulk Operations (los nuevos entran como IMPORTED, no se envían a Verial)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Solo pedidos actualizados desde esta fecha (YYYY-MM-DD o ISO 8601)',
+        )
+
+    def handle(self, *args, **options):
+        shop = Shop.objects.first()
+        if not shop:
+            self.stdout.write(self.style.ERROR("Tienda no configurada"))
+            return
+
+        since = _parse_since(options['since']) if options['since'] else None
+        self.stdout.write('Lanzando operación masiva de pedidos en Shopify...')
+
+        success, result = import_orders_bulk(shop, since=since)
+
+        if success:
+            detalle = result['detalle']['pedidos']
+            self.stdout.write(self.style.SUCCESS(
+                f"Pedidos importados: {result['count']} ({result['lines']} líneas) - "
+                f"nuevos: {detalle['insertados']}, actualizados: {detalle['actualizados']}"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"Error: {result.get('error', 'Desconocido')}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from shopify_app.product_mapping import auto_map_products_by_barcode
+
+
+class Command(BaseCommand):
+    help = 'Mapea variantes de Shopify con artículos de Verial por código de barras'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra los cambios sin escribirlos',
+        )
+
+    def handle(self, *args, **options):
+        success, result = auto_map_products_by_barcode(dry_run=options['dry_run'])
+
+        if not success:
+            self.stdout.write(self.style.ERROR(f"Error: {result.get('error')}"))
+            return
+
+        if options['dry_run']:
+            diff = result['diff']
+            for item in diff['nuevos']:
+                self.stdout.write(f"  + {item['sku']} ({item['barcode']}) -> {item['verial_id']}")
+            for item in diff['actualizados']:
+                self.stdout.write(
+                    f"  ~ {item['sku']} ({item['barcode']}) {item['anterior']['verial_id']} -> {item['verial_id']}"
+                )
+            for item in diff['eliminados']:
+                self.stdout.write(f"  - {item['sku']} ({item['barcode']}) -> {item['verial_id']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry-run] ' if options['dry_run'] else ''}Nuevos: {result['nuevos']} | "
+            f"Actualizados: {result['actualizados']} | Eliminados: {result['eliminados']} | "
+            f"Sin cambios: {result['sin_cambios']} | Sin match: {len(result['sin_match'])}"
+        ))
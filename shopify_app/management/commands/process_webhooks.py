@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from shopify_app.services.webhook_inbox import purge_processed, run_workers
+
+
+class Command(BaseCommand):
+    help = 'Procesa la bandeja de webhooks de Shopify en lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.WEBHOOK_INBOX_WORKERS,
+                            help='Número de workers en paralelo')
+        parser.add_argument('--batch-size', type=int, default=settings.WEBHOOK_INBOX_BATCH_SIZE,
+                            help='Webhooks reclamados por lote')
+        parser.add_argument('--loop', action='store_true',
+                            help='Sigue escuchando la bandeja en lugar de salir al vaciarla')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Segundos de espera con la bandeja vacía (solo con --loop)')
+
+    def handle(self, *args, **options):
+        purged = purge_processed()
+        if purged:
+            self.stdout.write(f"Purgados {purged} webhooks procesados fuera de la ventana de idempotencia")
+
+        while True:
+            stats = run_workers(options['workers'], options['batch_size'])
+            if stats['lotes'] or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Webhooks procesados: {stats['procesados']} | errores: {stats['errores']} | lotes: {stats['lotes']}"
+                ))
+            if not options['loop']:
+                break
+            if not stats['lotes']:
+                time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from shopify_app.models import Shop
+from shopify_app.inventory_index import refresh_inventory_index
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el índice local de inventory items de Shopify'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Reconstruye el índice completo en lugar de pedir solo los cambios',
+        )
+
+    def handle(self, *args, **options):
+        shop = Shop.objects.first()
+        if not shop:
+            self.stdout.write(self.style.ERROR("Tienda no configurada"))
+            return
+
+        success, result = refresh_inventory_index(shop, full=options['full'])
+
+        if success:
+            self.stdout.write(self.style.SUCCESS(
+                f"Índice actualizado: {result['actualizados']} items, {result['eliminados']} eliminados"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"Error: {result.get('error', 'Desconocido')}"))
@@ -1,32 +1,38 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from shopify_app.models import Order
-from shopify_app.order_to_verial import send_order_to_verial
+from shopify_app.services.order_dispatcher import dispatch_pending_orders, pending_orders
 
 class Command(BaseCommand):
     help = "Envía pedidos pendientes de Shopify a Verial"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.VERIAL_DISPATCH_WORKERS,
+                            help='Pedidos enviados en paralelo')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Máximo de pedidos a procesar en esta ejecución')
+
     def handle(self, *args, **options):
-        orders = Order.objects.filter(
-            status="RECEIVED",
-            sent_to_verial=False
-        )
+        pending = pending_orders().count()
 
-        if not orders.exists():
+        if not pending:
             self.stdout.write(self.style.SUCCESS("✨ No hay pedidos pendientes de envío."))
             return
 
-        self.stdout.write(f"📦 Se han encontrado {orders.count()} pedidos para procesar.")
+        self.stdout.write(f"📦 Se han encontrado {pending} pedidos para procesar ({options['workers']} workers).")
 
-        for order in orders:
-            self.stdout.write(f"🚀 Procesando pedido {order.name}...")
-            
-            success, message = send_order_to_verial(order)
+        summary = dispatch_pending_orders(workers=options['workers'], limit=options['limit'])
 
-            if success:
+        for result in summary['resultados']:
+            if result['ok']:
                 self.stdout.write(self.style.SUCCESS(
-                    f"  ✔ Pedido {order.name} inyectado correctamente en Verial."
+                    f"  ✔ Pedido {result['pedido']} inyectado correctamente en Verial ({result['segundos']}s)."
                 ))
             else:
                 self.stdout.write(self.style.ERROR(
-                    f"  ✖ Error en pedido {order.name}: {message}"
-                ))
\ No newline at end of file
+                    f"  ✖ Error en pedido {result['pedido']}: {result['mensaje']}"
+                ))
+
+        self.stdout.write(
+            f"📊 {summary['enviados']} enviados, {summary['errores']} con error en {summary['segundos']}s "
+            f"({summary['pedidos_por_segundo']} pedidos/s)"
+        )
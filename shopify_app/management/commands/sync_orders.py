@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from shopify_app.models import Shop
+from shopify_app.services.order_sync import sync_orders_incremental
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza pedidos de Shopify modificados desde la última ejecución'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignora la marca de agua y recorre todos los pedidos (el histórico entra como IMPORTED)',
+        )
+
+    def handle(self, *args, **options):
+        shop = Shop.objects.first()
+        if not shop:
+            self.stdout.write(self.style.ERROR("Tienda no configurada"))
+            return
+
+        success, result = sync_orders_incremental(shop, full=options['full'])
+
+        if success:
+            detalle = result['detalle']['pedidos']
+            self.stdout.write(self.style.SUCCESS(
+                f"Pedidos sincronizados: {result['count']} (nuevos: {detalle['insertados']}, "
+                f"actualizados: {detalle['actualizados']}, sin cambios: {detalle['sin_cambios']})"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"Error: {result.get('error', 'Desconocido')} (HTTP {result.get('status')})"
+            ))
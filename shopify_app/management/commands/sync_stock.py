@@ -5,20 +5,37 @@ from shopify_app.stock_sync import sync_stock_verial_to_shopify
 class Command(BaseCommand):
     help = 'Sincroniza stock de Verial a Shopify'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Reconciliación completa: reenvía todo el stock aunque no haya cambiado',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Iniciando sincronización de stock...')
-        
-        success, result = sync_stock_verial_to_shopify()
-        
+
+        success, result = sync_stock_verial_to_shopify(full_reconcile=options['full'])
+
         if success:
             self.stdout.write(self.style.SUCCESS(
-                f"Stock sincronizado: {result['actualizados']} productos actualizados"
+                f"Stock sincronizado ({result['modo']}): {result['actualizados']} productos actualizados, "
+                f"{result['omitidos']} sin cambios"
             ))
+            graphql = result.get('graphql')
+            if graphql:
+                self.stdout.write(
+                    f"GraphQL: {graphql['consultas']} consultas, coste {graphql['coste_real']:.0f}/"
+                    f"{graphql['coste_solicitado']:.0f}, {graphql['reintentos']} reintentos por throttling, "
+                    f"mínimo disponible {graphql['disponible_min']}"
+                )
             if result['errores'] > 0:
                 self.stdout.write(self.style.WARNING(
                     f"Errores: {result['errores']}"
                 ))
+                for error in result.get('errores_detalle', [])[:20]:
+                    self.stdout.write(f"  ✖ {error['inventoryItemId']}: {error['mensaje']}")
         else:
             self.stdout.write(self.style.ERROR(
                 f"Error: {result.get('error', 'Desconocido')}"
-            ))
\ No newline at end of file
+            ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0014_orderline_discount_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inventory_item_id', models.CharField(max_length=100, verbose_name='Inventory Item ID')),
+                ('location_id', models.CharField(max_length=100, verbose_name='Location ID')),
+                ('quantity', models.IntegerField(verbose_name='Cantidad enviada')),
+                ('pushed_at', models.DateTimeField(auto_now=True, verbose_name='Último envío')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de stock',
+                'verbose_name_plural': 'Snapshots de stock',
+                'constraints': [models.UniqueConstraint(fields=('inventory_item_id', 'location_id'), name='unique_stock_snapshot_item_location')],
+            },
+        ),
+    ]
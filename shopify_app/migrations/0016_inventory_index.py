@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0015_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopifyInventoryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inventory_item_id', models.CharField(max_length=100, unique=True, verbose_name='Inventory Item ID')),
+                ('variant_shopify_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID variante Shopify')),
+                ('sku', models.CharField(blank=True, max_length=100, verbose_name='SKU')),
+                ('barcode', models.CharField(blank=True, max_length=100, verbose_name='Código de barras')),
+                ('updated_at', models.DateTimeField(blank=True, null=True, verbose_name='Actualizado en Shopify')),
+                ('indexed_at', models.DateTimeField(auto_now=True, verbose_name='Indexado')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shopify_app.shop')),
+            ],
+            options={
+                'verbose_name': 'Inventory item',
+                'verbose_name_plural': 'Inventory items',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50, verbose_name='Recurso')),
+                ('value', models.DateTimeField(verbose_name='Marca de agua')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='shopify_app.shop')),
+            ],
+            options={
+                'verbose_name': 'Marca de agua',
+                'verbose_name_plural': 'Marcas de agua',
+                'constraints': [models.UniqueConstraint(fields=('shop', 'resource'), name='unique_sync_watermark_shop_resource')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:09
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_lines(apps, schema_editor):
+    """Deja una sola línea por (pedido, shopify_id) antes de crear la restricción."""
+    OrderLine = apps.get_model('shopify_app', 'OrderLine')
+    duplicates = (
+        OrderLine.objects.values('order_id', 'shopify_id')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for dup in duplicates:
+        OrderLine.objects.filter(
+            order_id=dup['order_id'], shopify_id=dup['shopify_id']
+        ).exclude(id=dup['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0016_inventory_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderline',
+            constraint=models.UniqueConstraint(fields=('order', 'shopify_id'), name='unique_orderline_order_shopify_id'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0017_orderline_unique_order_shopify_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('webhook_id', models.CharField(max_length=100, unique=True, verbose_name='Webhook ID')),
+                ('topic', models.CharField(max_length=100, verbose_name='Topic')),
+                ('shop_domain', models.CharField(blank=True, max_length=255, verbose_name='Tienda')),
+                ('body', models.TextField(verbose_name='Cuerpo')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('PROCESSING', 'Procesando'), ('DONE', 'Procesado'), ('ERROR', 'Error')], default='PENDING', max_length=20)),
+                ('attempts', models.IntegerField(default=0, verbose_name='Intentos')),
+                ('claim_token', models.CharField(blank=True, max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Recibido')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Procesado')),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Webhook recibido',
+                'verbose_name_plural': 'Bandeja de webhooks',
+                'indexes': [models.Index(fields=['status', 'received_at'], name='webhookinbox_status_received')],
+            },
+        ),
+    ]
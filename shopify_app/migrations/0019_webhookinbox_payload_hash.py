@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0018_webhookinbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookinbox',
+            name='payload_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Hash del cuerpo'),
+        ),
+    ]
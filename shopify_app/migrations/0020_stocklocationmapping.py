@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0019_webhookinbox_payload_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLocationMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verial_almacen_id', models.IntegerField(unique=True, verbose_name='ID almacén Verial')),
+                ('location_name', models.CharField(blank=True, max_length=255, verbose_name='Location Shopify (nombre)')),
+                ('shopify_location_id', models.CharField(blank=True, max_length=100, verbose_name='Location ID')),
+                ('active', models.BooleanField(default=True, verbose_name='Activo')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+            ],
+            options={
+                'verbose_name': 'Mapeo de almacén',
+                'verbose_name_plural': 'Mapeos de almacenes',
+            },
+        ),
+    ]
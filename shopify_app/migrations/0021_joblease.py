@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0020_stocklocationmapping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Job')),
+                ('owner', models.CharField(blank=True, max_length=150, verbose_name='Nodo')),
+                ('acquired_at', models.DateTimeField(blank=True, null=True, verbose_name='Adquirido')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último latido')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Caduca')),
+                ('last_finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Última ejecución terminada')),
+                ('runs', models.IntegerField(default=0, verbose_name='Ejecuciones')),
+            ],
+            options={
+                'verbose_name': 'Lease de job',
+                'verbose_name_plural': 'Leases de jobs',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0021_joblease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='status',
+            field=models.CharField(choices=[('RECEIVED', 'Received'), ('READY', 'Ready'), ('SENT', 'Sent'), ('IN_PROGRESS', 'In progress'), ('COMPLETED', 'Completed'), ('ERROR', 'Error')], default='RECEIVED', max_length=20),
+        ),
+    ]
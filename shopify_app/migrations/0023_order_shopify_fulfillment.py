@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0022_order_status_in_progress_completed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shopify_fulfilled_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fulfillment en Shopify'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='shopify_fulfillment_id',
+            field=models.CharField(blank=True, max_length=100, verbose_name='ID fulfillment Shopify'),
+        ),
+    ]
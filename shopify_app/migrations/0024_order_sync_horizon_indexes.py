@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0023_order_shopify_fulfillment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status'], name='order_status'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('sent_to_verial', True), models.Q(('status__in', ('COMPLETED',)), _negated=True), models.Q(('financial_status__in', ('refunded', 'voided')), _negated=True)), fields=['created_at'], name='order_live_created'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-17 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0024_order_sync_horizon_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['shop', 'email'], name='customer_shop_email'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('sent_to_verial', False)), fields=['status', 'received_at'], name='order_send_queue'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['sku'], name='variant_sku'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['barcode', 'sku'], name='variant_barcode'),
+        ),
+    ]
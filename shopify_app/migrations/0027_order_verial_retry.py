@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0026_order_status_imported'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='verial_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Intentos de envío'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='verial_retry_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Próximo intento'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0027_order_verial_retry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stocksnapshot',
+            name='quantity',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Cantidad enviada'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopify_app', '0028_stocksnapshot_quantity_nullable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='shopify_fulfillment_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Intentos de fulfillment'),
+        ),
+    ]
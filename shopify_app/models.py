@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 
 
@@ -14,11 +15,27 @@ class Shop(models.Model):
         return self.shop
 
 
+# Pedidos cuyo estado en Verial ya no va a cambiar: completados, o cancelados /
+# reembolsados en Shopify. El resto de los enviados son los "vivos" que consulta
+# la sincronización de estados (junto con el horizonte de días en settings).
+ORDER_TERMINAL_STATUSES = ("COMPLETED",)
+ORDER_CANCELLED_FINANCIAL_STATUSES = ("refunded", "voided")
+LIVE_ORDERS = (
+    Q(sent_to_verial=True)
+    & ~Q(status__in=ORDER_TERMINAL_STATUSES)
+    & ~Q(financial_status__in=ORDER_CANCELLED_FINANCIAL_STATUSES)
+)
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("RECEIVED", "Received"),
+        # Histórico importado por backfill: no se envía a Verial
+        ("IMPORTED", "Imported"),
         ("READY", "Ready"),
         ("SENT", "Sent"),
+        ("IN_PROGRESS", "In progress"),
+        ("COMPLETED", "Completed"),
         ("ERROR", "Error"),
     ]
 
@@ -41,10 +58,27 @@ class Order(models.Model):
     sent_to_verial = models.BooleanField(default=False)
     sent_to_verial_at = models.DateTimeField(null=True, blank=True)
     verial_error = models.TextField(blank=True)
+    # Reintentos del envío: nº de intentos y cuándo puede volver a reclamarse
+    verial_attempts = models.PositiveIntegerField(default=0, verbose_name="Intentos de envío")
+    verial_retry_at = models.DateTimeField(null=True, blank=True, verbose_name="Próximo intento")
+    # Marca de idempotencia: con fecha, el fulfillment ya está creado en Shopify
+    shopify_fulfilled_at = models.DateTimeField(null=True, blank=True, verbose_name="Fulfillment en Shopify")
+    shopify_fulfillment_id = models.CharField(max_length=100, blank=True, verbose_name="ID fulfillment Shopify")
+    shopify_fulfillment_attempts = models.PositiveIntegerField(default=0, verbose_name="Intentos de fulfillment")
 
     class Meta:
         verbose_name = "Pedido"
         verbose_name_plural = "Pedidos"
+        indexes = [
+            models.Index(fields=["status"], name="order_status"),
+            models.Index(fields=["created_at"], name="order_created"),
+            # Cola de envío a Verial por orden de llegada. Parcial sobre sent_to_verial:
+            # el ORM filtra el booleano como "NOT sent_to_verial", que no es una igualdad
+            # que un índice compuesto pueda usar, pero sí casa con la condición.
+            models.Index(fields=["status", "received_at"], condition=Q(sent_to_verial=False), name="order_send_queue"),
+            # Índice parcial: solo los pedidos vivos, así que no crece con el histórico
+            models.Index(fields=["created_at"], condition=LIVE_ORDERS, name="order_live_created"),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,6 +102,9 @@ class OrderLine(models.Model):
     class Meta:
         verbose_name = "Línea de pedido"
         verbose_name_plural = "Líneas de pedido"
+        constraints = [
+            models.UniqueConstraint(fields=["order", "shopify_id"], name="unique_orderline_order_shopify_id"),
+        ]
 
     def __str__(self):
         return f"{self.quantity}x {self.product_title}"
@@ -107,10 +144,33 @@ class ProductVariant(models.Model):
     class Meta:
         verbose_name = "Variante"
         verbose_name_plural = "Variantes"
+        indexes = [
+            models.Index(fields=["sku"], name="variant_sku"),
+            # Con sku incluido cubre el recorrido del mapeo por barcode sin leer la tabla
+            models.Index(fields=["barcode", "sku"], name="variant_barcode"),
+        ]
     
     def __str__(self):
         return f"{self.product.title} - {self.title}"
     
+class ShopifyInventoryItem(models.Model):
+    """Índice local de inventoryItems de Shopify para resolver barcode/SKU -> inventoryItemId."""
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
+    inventory_item_id = models.CharField(max_length=100, unique=True, verbose_name="Inventory Item ID")
+    variant_shopify_id = models.BigIntegerField(null=True, blank=True, verbose_name="ID variante Shopify")
+    sku = models.CharField(max_length=100, blank=True, verbose_name="SKU")
+    barcode = models.CharField(max_length=100, blank=True, verbose_name="Código de barras")
+    updated_at = models.DateTimeField(null=True, blank=True, verbose_name="Actualizado en Shopify")
+    indexed_at = models.DateTimeField(auto_now=True, verbose_name="Indexado")
+
+    class Meta:
+        verbose_name = "Inventory item"
+        verbose_name_plural = "Inventory items"
+
+    def __str__(self):
+        return f"{self.inventory_item_id} ({self.barcode or self.sku})"
+
+
 class ProductMapping(models.Model):
     variant = models.OneToOneField(ProductVariant, on_delete=models.CASCADE, related_name='verial_mapping')
     verial_id = models.BigIntegerField(verbose_name="ID Verial")
@@ -138,6 +198,9 @@ class Customer(models.Model):
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
+        indexes = [
+            models.Index(fields=["shop", "email"], name="customer_shop_email"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
@@ -179,4 +242,120 @@ class OrderMapping(models.Model):
         verbose_name_plural = "Mapeos de pedidos"
     
     def __str__(self):
-        return f"{self.order.name} → Verial ID: {self.verial_id}"
\ No newline at end of file
+        return f"{self.order.name} → Verial ID: {self.verial_id}"
+
+class StockSnapshot(models.Model):
+    """Última cantidad enviada a Shopify por inventory item y location."""
+    inventory_item_id = models.CharField(max_length=100, verbose_name="Inventory Item ID")
+    location_id = models.CharField(max_length=100, verbose_name="Location ID")
+    # NULL: Shopify rechazó el item o Verial no dio stock para esa location. El
+    # item cuenta como visto (no fuerza un sondeo completo) y se reintenta
+    # cuando su artículo cambia o en la reconciliación completa.
+    quantity = models.IntegerField(null=True, blank=True, verbose_name="Cantidad enviada")
+    pushed_at = models.DateTimeField(auto_now=True, verbose_name="Último envío")
+
+    class Meta:
+        verbose_name = "Snapshot de stock"
+        verbose_name_plural = "Snapshots de stock"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["inventory_item_id", "location_id"],
+                name="unique_stock_snapshot_item_location",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_item_id} @ {self.location_id}: {self.quantity}"
+
+
+class StockLocationMapping(models.Model):
+    """Almacén de Verial -> location de Shopify a la que se envía su stock."""
+    verial_almacen_id = models.IntegerField(unique=True, verbose_name="ID almacén Verial")
+    location_name = models.CharField(max_length=255, blank=True, verbose_name="Location Shopify (nombre)")
+    shopify_location_id = models.CharField(max_length=100, blank=True, verbose_name="Location ID")
+    active = models.BooleanField(default=True, verbose_name="Activo")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+
+    class Meta:
+        verbose_name = "Mapeo de almacén"
+        verbose_name_plural = "Mapeos de almacenes"
+
+    def __str__(self):
+        return f"Almacén {self.verial_almacen_id} → {self.location_name or self.shopify_location_id}"
+
+
+class SyncWatermark(models.Model):
+    """Marca de agua (último updated_at procesado) por tienda y recurso."""
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE)
+    resource = models.CharField(max_length=50, verbose_name="Recurso")
+    value = models.DateTimeField(verbose_name="Marca de agua")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
+
+    class Meta:
+        verbose_name = "Marca de agua"
+        verbose_name_plural = "Marcas de agua"
+        constraints = [
+            models.UniqueConstraint(fields=["shop", "resource"], name="unique_sync_watermark_shop_resource"),
+        ]
+
+    def __str__(self):
+        return f"{self.shop} / {self.resource}: {self.value}"
+
+    @classmethod
+    def get_value(cls, shop, resource):
+        return cls.objects.filter(shop=shop, resource=resource).values_list("value", flat=True).first()
+
+    @classmethod
+    def set_value(cls, shop, resource, value):
+        cls.objects.update_or_create(shop=shop, resource=resource, defaults={"value": value})
+
+
+class WebhookInbox(models.Model):
+    """Bandeja de entrada de webhooks: el cuerpo crudo se procesa después en un worker."""
+    STATUS_CHOICES = [
+        ("PENDING", "Pendiente"),
+        ("PROCESSING", "Procesando"),
+        ("DONE", "Procesado"),
+        ("ERROR", "Error"),
+    ]
+
+    webhook_id = models.CharField(max_length=100, unique=True, verbose_name="Webhook ID")
+    topic = models.CharField(max_length=100, verbose_name="Topic")
+    shop_domain = models.CharField(max_length=255, blank=True, verbose_name="Tienda")
+    payload_hash = models.CharField(max_length=64, blank=True, verbose_name="Hash del cuerpo")
+    body = models.TextField(verbose_name="Cuerpo")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    attempts = models.IntegerField(default=0, verbose_name="Intentos")
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(default=timezone.now, verbose_name="Recibido")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Procesado")
+    error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Webhook recibido"
+        verbose_name_plural = "Bandeja de webhooks"
+        indexes = [
+            models.Index(fields=["status", "received_at"], name="webhookinbox_status_received"),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} {self.webhook_id} ({self.status})"
+
+
+class JobLease(models.Model):
+    """Lease de un job programado: solo el nodo que lo tiene puede ejecutarlo."""
+    name = models.CharField(max_length=100, unique=True, verbose_name="Job")
+    owner = models.CharField(max_length=150, blank=True, verbose_name="Nodo")
+    acquired_at = models.DateTimeField(null=True, blank=True, verbose_name="Adquirido")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Último latido")
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Caduca")
+    last_finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Última ejecución terminada")
+    runs = models.IntegerField(default=0, verbose_name="Ejecuciones")
+
+    class Meta:
+        verbose_name = "Lease de job"
+        verbose_name_plural = "Leases de jobs"
+
+    def __str__(self):
+        return f"{self.name} ({self.owner or 'libre'})"
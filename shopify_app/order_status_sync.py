@@ -1,6 +1,23 @@
+"""
+Sincronización de estados de pedido Verial -> Django.
+
+Los pedidos enviados a Verial (con OrderMapping) que siguen vivos se
+consultan en EstadoPedidosWS en lotes de 25 IDs Verial, con varios lotes en
+paralelo. Las consultas HTTP corren en hilos; los cambios se aplican en el
+hilo principal con un bulk_update por lote. Los pedidos que pasan a COMPLETED
+se marcan después como preparados en Shopify (services.fulfillment_pusher).
+"""
 import logging
-from shopify_app.models import Order, OrderMapping
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from erp_connector import metrics
 from erp_connector.verial_client import VerialClient
+from shopify_app.models import LIVE_ORDERS, Order, OrderMapping
 
 logger = logging.getLogger('verial')
 
@@ -12,83 +29,164 @@ ESTADO_MAP = {
     4: "enviado"
 }
 
-def sync_order_status():
+# Máximo de pedidos por llamada a EstadoPedidosWS
+BATCH_SIZE = 25
+
+STATUS_FIELDS = ['verial_status', 'status', 'fulfillment_status']
+
+BATCHES = metrics.counter("order_status_batches_total", "Lotes consultados en EstadoPedidosWS por resultado")
+CHANGES = metrics.counter("order_status_changes_total", "Pedidos cuyo estado cambió por estado nuevo")
+BATCH_LATENCY = metrics.histogram("order_status_batch_seconds", "Latencia de cada consulta a EstadoPedidosWS")
+
+
+def apply_verial_status(order, verial_estado):
+    """Aplica el estado Verial al pedido (sin guardar). Devuelve True si cambió algo."""
+    before = [getattr(order, field) for field in STATUS_FIELDS]
+
+    order.verial_status = str(verial_estado)
+    if verial_estado == 4:
+        order.status = "COMPLETED"
+        order.fulfillment_status = "fulfilled"
+    elif verial_estado in (2, 3):
+        order.status = "IN_PROGRESS"
+        order.fulfillment_status = "partial"
+
+    return [getattr(order, field) for field in STATUS_FIELDS] != before
+
+
+def live_orders(now=None):
     """
-    Sincroniza los estados de los pedidos desde Verial hacia Django/Shopify.
-    Este proceso lo corre el sync_runner cada 5 minutos.
+    Pedidos enviados a Verial cuyo estado todavía puede cambiar: ni terminales
+    (LIVE_ORDERS) ni más antiguos que ORDER_STATUS_SYNC_HORIZON_DAYS. El filtro
+    coincide con el índice parcial order_live_created, así que la consulta no
+    recorre el histórico.
     """
-    mappings = OrderMapping.objects.select_related('order').exclude(
-        order__status='COMPLETED'
+    horizon = (now or timezone.now()) - timedelta(days=settings.ORDER_STATUS_SYNC_HORIZON_DAYS)
+    return (
+        Order.objects.filter(LIVE_ORDERS, created_at__gte=horizon, verial_mapping__isnull=False)
+        .select_related('verial_mapping')
+        .only('name', *STATUS_FIELDS, 'verial_mapping__verial_id')
+        .order_by('created_at')
     )
-    
-    if not mappings.exists():
-        return True, {"actualizados": 0, "message": "No hay pedidos pendientes"}
 
-    client = VerialClient()
-    mappings_list = list(mappings)
-    total_actualizados = 0
-    
-    batch_size = 25
-    for i in range(0, len(mappings_list), batch_size):
-        lote = mappings_list[i:i+batch_size]
-        pedidos_consulta = [{"Id": m.verial_id} for m in lote]
-        
-        success, result = client.get_orders_status(pedidos_consulta)
-        if not success:
-            logger.error(f"Error consultando estados: {result}")
+
+def _query_batch(client, verial_ids):
+    started = time.monotonic()
+    try:
+        success, result = client.get_orders_status(verial_ids)
+    except Exception as e:
+        success, result = False, str(e)
+    return success, result, time.monotonic() - started
+
+
+def _apply_batch(orders_by_verial_id, estados):
+    """Aplica los estados de un lote y los guarda con un único bulk_update."""
+    changed = []
+    for estado_data in estados:
+        order = orders_by_verial_id.get(estado_data.get("Id"))
+        if order is None:
             continue
+        verial_estado = estado_data.get("Estado", 0)
+        if apply_verial_status(order, verial_estado):
+            changed.append(order)
+            CHANGES.inc(status=order.status)
+            logger.info(f"ORDEN {order.name}: Estado Verial actualizado a {ESTADO_MAP.get(verial_estado)}")
+    if changed:
+        Order.objects.bulk_update(changed, STATUS_FIELDS)
+    return changed
+
 
-        estados_verial = result.get("Pedidos", [])
-        mapping_dict = {m.verial_id: m for m in lote}
-        
-        for estado_data in estados_verial:
-            v_id = estado_data.get("Id")
-            verial_estado = estado_data.get("Estado", 0)
-            
-            mapping = mapping_dict.get(v_id)
-            if not mapping:
+def _push_fulfillments():
+    """Lleva a Shopify los pedidos completados (los de esta ejecución y los que quedaron pendientes)."""
+    if not settings.SHOPIFY_PUSH_FULFILLMENTS:
+        return None
+    from shopify_app.services.fulfillment_pusher import push_fulfillments
+    try:
+        return push_fulfillments()
+    except Exception as e:
+        logger.error(f"Error creando fulfillments en Shopify: {e}")
+        return {"error": str(e)}
+
+
+def sync_order_status(workers=None):
+    """
+    Sincroniza los estados de los pedidos desde Verial hacia Django/Shopify.
+    Este proceso lo corre el sync_runner cada 5 minutos. Devuelve un resumen
+    con los pedidos consultados, los cambiados y la latencia de la ejecución.
+    """
+    started = time.monotonic()
+    orders = list(live_orders())
+    if not orders:
+        summary = {"consultados": 0, "actualizados": 0, "message": "No hay pedidos pendientes"}
+        fulfillments = _push_fulfillments()
+        if fulfillments is not None:
+            summary["fulfillments"] = fulfillments
+        return True, summary
+
+    batches = [orders[i:i + BATCH_SIZE] for i in range(0, len(orders), BATCH_SIZE)]
+    workers = max(1, min(workers or settings.VERIAL_STATUS_WORKERS, len(batches)))
+    client = VerialClient()
+
+    actualizados = completados = fallidos = 0
+    errores = []
+    latencia_max = 0.0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verial-status") as executor:
+        futures = {
+            executor.submit(_query_batch, client, [o.verial_mapping.verial_id for o in batch]): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            success, result, elapsed = future.result()
+            BATCH_LATENCY.observe(elapsed)
+            latencia_max = max(latencia_max, elapsed)
+            if not success:
+                fallidos += 1
+                errores.append(result)
+                BATCHES.inc(result="error")
+                logger.error(f"Error consultando estados: {result}")
                 continue
-                
-            order = mapping.order
-            new_status_str = str(verial_estado)
-            
-            if order.verial_status != new_status_str:
-                order.verial_status = new_status_str
-                
-                if verial_estado == 4: 
-                    order.status = "COMPLETED"
-                    order.fulfillment_status = "fulfilled"
-                elif verial_estado in [2, 3]:
-                    order.status = "IN_PROGRESS"
-                    order.fulfillment_status = "partial"
-                
-                order.save(update_fields=['verial_status', 'status', 'fulfillment_status'])
-                total_actualizados += 1
-                
-                logger.info(f"ORDEN {order.name}: Estado Verial actualizado a {ESTADO_MAP.get(verial_estado)}")
-
-    return True, {"actualizados": total_actualizados}
+
+            BATCHES.inc(result="ok")
+            changed = _apply_batch({o.verial_mapping.verial_id: o for o in batch}, result)
+            actualizados += len(changed)
+            completados += sum(1 for order in changed if order.status == "COMPLETED")
+
+    fulfillments = _push_fulfillments()
+
+    summary = {
+        "consultados": len(orders),
+        "lotes": len(batches),
+        "lotes_fallidos": fallidos,
+        "actualizados": actualizados,
+        "completados": completados,
+        "errores": errores,
+        "workers": workers,
+        "segundos": round(time.monotonic() - started, 3),
+        "latencia_lote_max_s": round(latencia_max, 3),
+    }
+    if fulfillments is not None:
+        summary["fulfillments"] = fulfillments
+    logger.info(
+        f"Estados Verial: {actualizados} cambiados ({completados} completados) de {len(orders)} "
+        f"pedidos en {summary['segundos']}s, {len(batches)} lotes ({fallidos} fallidos)"
+    )
+    if fallidos == len(batches):
+        return False, {**summary, "error": errores[0]}
+    return True, summary
+
 
 def sync_single_order(order: Order):
     """Permite forzar la actualización de un solo pedido (ej. desde un botón en Admin)"""
     mapping = OrderMapping.objects.filter(order=order).first()
     if not mapping:
         return False, "Pedido no vinculado a Verial"
-    
-    client = VerialClient()
-    success, result = client.get_orders_status([{"Id": mapping.verial_id}])
-    
-    if success and result.get("Pedidos"):
-        verial_estado = result["Pedidos"][0].get("Estado", 0)
-        order.verial_status = str(verial_estado)
-        
-        if verial_estado == 4:
-            order.status = "COMPLETED"
-            order.fulfillment_status = "fulfilled"
-        elif verial_estado in [2, 3]:
-            order.fulfillment_status = "partial"
-            
-        order.save()
+
+    success, estados = VerialClient().get_orders_status([mapping.verial_id])
+    if success and estados:
+        verial_estado = estados[0].get("Estado", 0)
+        if apply_verial_status(order, verial_estado):
+            order.save(update_fields=STATUS_FIELDS)
         return True, ESTADO_MAP.get(verial_estado, "desconocido")
-    
-    return False, "No se pudo obtener respuesta del ERP"
\ No newline at end of file
+
+    return False, "No se pudo obtener respuesta del ERP"
@@ -5,7 +5,7 @@ from datetime import datetime
 from django.conf import settings
 from django.utils import timezone
 
-from .models import Order, OrderMapping, OrderLine, ProductVariant
+from .models import Order, OrderMapping, OrderLine, ProductMapping, ProductVariant
 from .services.customer_sync import ensure_customer_in_verial
 from .product_mapping import ensure_product_mapping
 from erp_connector.verial_client import VerialClient
@@ -15,31 +15,76 @@ logger = logging.getLogger("verial")
 class OrderToVerialError(Exception):
     pass
 
+def _first_by(variants, key):
+    """Indexa variantes por `key` quedándose con la primera (mismo criterio que .first())."""
+    index = {}
+    for variant in variants:
+        index.setdefault(key(variant), variant)
+    return index
+
+
+def _variant_mapping(variant, cache):
+    if variant.pk not in cache:
+        try:
+            cache[variant.pk] = variant.verial_mapping
+        except ProductMapping.DoesNotExist:
+            cache[variant.pk] = ensure_product_mapping(variant)
+    return cache[variant.pk]
+
+
+def resolve_line_mappings(lines):
+    """
+    Resuelve el ProductMapping de un conjunto de líneas (de uno o varios pedidos)
+    con una consulta por SKU y, solo si hace falta, otra por título de producto
+    y variante. Devuelve {line.pk: ProductMapping | None}.
+    """
+    lines = list(lines)
+    variants = ProductVariant.objects.select_related("verial_mapping").order_by("pk")
+
+    skus = {line.sku for line in lines if line.sku}
+    by_sku = _first_by(variants.filter(sku__in=skus), lambda v: v.sku) if skus else {}
+
+    pending = [line for line in lines if line.sku not in by_sku]
+    by_title = {}
+    if pending:
+        by_title = _first_by(
+            variants.filter(
+                product__title__in={line.product_title for line in pending},
+                title__in={line.variant_title for line in pending},
+            ).select_related("product"),
+            lambda v: (v.product.title, v.title),
+        )
+
+    cache = {}
+    result = {}
+    for line in lines:
+        variant = by_sku.get(line.sku) if line.sku else None
+        variant = variant or by_title.get((line.product_title, line.variant_title))
+        result[line.pk] = _variant_mapping(variant, cache) if variant else None
+    return result
+
+
 def get_line_mapping(line: OrderLine):
-    variant = None
-    if line.sku:
-        variant = ProductVariant.objects.filter(sku=line.sku).first()
-    if not variant:
-        variant = ProductVariant.objects.filter(
-            product__title=line.product_title, 
-            title=line.variant_title
-        ).first()
-    if variant:
-        return ensure_product_mapping(variant)
-    return None
-
-def build_order_payload(order: Order, id_cliente: int) -> dict:
+    return resolve_line_mappings([line])[line.pk]
+
+
+def build_order_payload(order: Order, id_cliente: int, mappings=None) -> dict:
     """
     Construye el payload con la estructura validada para NuevoDocClienteWS (Tipo 5),
     imitando al máximo la forma del middleware viejo.
+    `mappings` ({line.pk: ProductMapping}) permite resolver varios pedidos de una vez.
     """
     iva_porcentaje = float(getattr(settings, "VERIAL_DEFAULT_VAT", 21.0))
 
     lineas_verial = []
     base_imponible = 0.0
 
-    for line in order.lines.all():
-        mapping = get_line_mapping(line)
+    lines = list(order.lines.all())
+    if mappings is None:
+        mappings = resolve_line_mappings(lines)
+
+    for line in lines:
+        mapping = mappings.get(line.pk)
         if not mapping:
             raise OrderToVerialError(f"Producto sin mapear en Shopify: {line.product_title}")
 
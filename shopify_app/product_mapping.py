@@ -1,34 +1,18 @@
 import logging
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 from .models import ProductVariant, ProductMapping
-from erp_connector.verial_client import VerialClient
+from erp_connector import catalog_cache
 
 logger = logging.getLogger('verial')
 
 def get_verial_products_by_barcode():
     """
-    Obtiene el catálogo completo de Verial indexado por código de barras.
+    Obtiene el catálogo completo de Verial indexado por código de barras
+    (desde la caché compartida; solo se descarga si ha caducado).
     """
-    client = VerialClient()
-    if not client.is_configured():
-        return False, "Verial no configurado en settings"
-    
-    success, result = client.get_articles() 
-    
-    if not success:
-        return False, result
-    
-    productos_indexados = {}
-    for art in result.get("Articulos", []):
-        barcode = str(art.get("ReferenciaBarras") or "").strip()
-        if barcode:
-            productos_indexados[barcode] = {
-                "id": art.get("Id"),
-                "nombre": art.get("Nombre", ""),
-                "barcode": barcode,
-            }
-    
-    return True, productos_indexados
+    return catalog_cache.get_catalog()
 
 def ensure_product_mapping(variant: ProductVariant):
     """
@@ -47,10 +31,9 @@ def ensure_product_mapping(variant: ProductVariant):
 
     logger.info(f"Buscando mapeo en Verial para Barcode: {barcode_limpio}...")
     
-    success, verial_products = get_verial_products_by_barcode()
+    success, verial_art = catalog_cache.lookup(barcode_limpio)
     
-    if success and isinstance(verial_products, dict):
-        verial_art = verial_products.get(barcode_limpio)
+    if success:
         if verial_art:
             with transaction.atomic():
                 mapping, created = ProductMapping.objects.update_or_create(
@@ -66,37 +49,126 @@ def ensure_product_mapping(variant: ProductVariant):
     logger.error(f"❌ No se encontró el barcode {barcode_limpio} en el catálogo de Verial.")
     return None
 
-def auto_map_products_by_barcode():
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def auto_map_products_by_barcode(dry_run=False):
     """
-    Sincronización masiva de catálogo.
+    Sincronización incremental de mapeos contra el catálogo de Verial.
+
+    Carga los mapeos existentes en una consulta, calcula la diferencia y
+    solo escribe lo que cambia: inserta pares nuevos, actualiza los que han
+    cambiado de verial_id o barcode y borra los de variantes cuyo barcode ya
+    no existe en Verial (los mapeos de variantes sin barcode, hechos a mano,
+    no se tocan). Con dry_run=True no escribe y devuelve el diff.
+
+    Un catálogo vacío o truncado borraría todos los mapeos y pararía el stock:
+    si llega vacío no se hace nada, y si los borrados superan
+    PRODUCT_MAPPING_MAX_DELETE_RATIO de los mapeos existentes se aplican altas
+    y cambios pero no los borrados, y se devuelve error.
     """
     success, verial_products = get_verial_products_by_barcode()
     if not success:
         return False, {"error": verial_products}
-    
-    stats = {"nuevos": 0, "actualizados": 0, "sin_match": []}
-    
-    variants = ProductVariant.objects.exclude(barcode="").exclude(barcode__isnull=True)
-    
-    for variant in variants:
-        barcode = str(variant.barcode).strip()
+    if not verial_products:
+        logger.error("Mapeo por barcode: catálogo de Verial vacío, no se toca ningún mapeo")
+        return False, {"error": "Catálogo de Verial vacío"}
+
+    existing = {
+        variant_id: (pk, verial_id, verial_barcode)
+        for pk, variant_id, verial_id, verial_barcode in ProductMapping.objects.values_list(
+            "pk", "variant_id", "verial_id", "verial_barcode"
+        )
+    }
+    variants = ProductVariant.objects.exclude(barcode="").exclude(barcode__isnull=True).values_list("pk", "sku", "barcode")
+
+    to_create, to_update, to_delete = [], [], []
+    unchanged = 0
+    sin_match = []
+    for variant_id, sku, barcode in variants:
+        barcode = str(barcode).strip()
         verial_art = verial_products.get(barcode)
-        
-        if verial_art:
-            mapping, created = ProductMapping.objects.update_or_create(
-                variant=variant,
-                defaults={
-                    "verial_id": verial_art["id"],
-                    "verial_barcode": verial_art["barcode"],
-                }
-            )
-            if created:
-                stats["nuevos"] += 1
-            else: 
-                stats["actualizados"] += 1
+        current = existing.get(variant_id)
+        entry = {"variant_id": variant_id, "sku": sku, "barcode": barcode}
+
+        if not verial_art:
+            sin_match.append(barcode)
+            if current:
+                to_delete.append({**entry, "pk": current[0], "verial_id": current[1]})
+            continue
+
+        target = (int(verial_art["id"]), verial_art["barcode"])
+        if current is None:
+            to_create.append({**entry, "verial_id": target[0], "verial_barcode": target[1]})
+        elif (current[1], current[2]) != target:
+            to_update.append({
+                **entry, "pk": current[0], "verial_id": target[0], "verial_barcode": target[1],
+                "anterior": {"verial_id": current[1], "verial_barcode": current[2]},
+            })
         else:
-            stats["sin_match"].append(barcode)
-            
+            unchanged += 1
+
+    stats = {
+        "nuevos": len(to_create),
+        "actualizados": len(to_update),
+        "eliminados": len(to_delete),
+        "sin_cambios": unchanged,
+        "sin_match": sin_match,
+        "dry_run": dry_run,
+    }
+
+    blocked = None
+    if len(to_delete) > max(settings.PRODUCT_MAPPING_DELETE_MIN,
+                            settings.PRODUCT_MAPPING_MAX_DELETE_RATIO * len(existing)):
+        blocked = (
+            f"Borrado de {len(to_delete)} de {len(existing)} mapeos bloqueado: "
+            f"el catálogo de Verial ({len(verial_products)} artículos) parece incompleto"
+        )
+        stats["borrados_bloqueados"] = len(to_delete)
+
+    if dry_run:
+        stats["diff"] = {"nuevos": to_create, "actualizados": to_update, "eliminados": to_delete}
+        if blocked:
+            stats["aviso"] = blocked
+        return True, stats
+
+    if blocked:
+        logger.error(f"Mapeo por barcode: {blocked}")
+        to_delete = []
+        stats["eliminados"] = 0
+
+    now = timezone.now()
+    chunk_size = settings.BULK_UPSERT_CHUNK_SIZE
+    with transaction.atomic():
+        if to_create:
+            ProductMapping.objects.bulk_create(
+                [
+                    ProductMapping(variant_id=c["variant_id"], verial_id=c["verial_id"], verial_barcode=c["verial_barcode"])
+                    for c in to_create
+                ],
+                batch_size=chunk_size,
+            )
+        if to_update:
+            # bulk_update no aplica auto_now: last_sync se fija aquí
+            ProductMapping.objects.bulk_update(
+                [
+                    ProductMapping(pk=u["pk"], verial_id=u["verial_id"], verial_barcode=u["verial_barcode"], last_sync=now)
+                    for u in to_update
+                ],
+                ["verial_id", "verial_barcode", "last_sync"],
+                batch_size=chunk_size,
+            )
+        for chunk in _chunks([d["pk"] for d in to_delete], chunk_size):
+            ProductMapping.objects.filter(pk__in=chunk).delete()
+
+    logger.info(
+        f"Mapeo por barcode: {stats['nuevos']} nuevos, {stats['actualizados']} actualizados, "
+        f"{stats['eliminados']} eliminados, {stats['sin_cambios']} sin cambios"
+    )
+    if blocked:
+        return False, {**stats, "error": blocked}
     return True, stats
 
 def get_mapping_stats():
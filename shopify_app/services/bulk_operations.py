@@ -0,0 +1,285 @@
+"""
+Importador basado en Shopify Bulk Operations (bulkOperationRunQuery).
+
+Lanza la consulta masiva, espera a que Shopify termine, descarga el JSONL
+resultante en streaming y lo vuelca por chunks en el motor de upsert masivo.
+Pensado para backfills completos de catálogo y pedidos.
+"""
+import json
+import logging
+import time
+
+import requests
+from django.conf import settings
+
+from erp_connector import transport
+from shopify_app.stock_sync import graphql_request
+from .shopify_ingest import empty_stats, merge_stats, upsert_orders, upsert_products
+
+logger = logging.getLogger('shopify_app')
+
+FINISHED_STATUSES = {"COMPLETED", "FAILED", "CANCELED", "EXPIRED"}
+
+RUN_MUTATION = """
+mutation RunBulk($query: String!) {
+    bulkOperationRunQuery(query: $query) {
+        bulkOperation { id status }
+        userErrors { field message }
+    }
+}
+"""
+
+STATUS_QUERY = """
+query BulkStatus($id: ID!) {
+    node(id: $id) {
+        ... on BulkOperation { id status errorCode objectCount url partialDataUrl }
+    }
+}
+"""
+
+PRODUCTS_BULK_QUERY = """
+{
+    products {
+        edges { node {
+            id title vendor productType status createdAt
+            variants { edges { node { id title sku barcode price inventoryQuantity } } }
+        } }
+    }
+}
+"""
+
+ORDERS_BULK_QUERY = """
+{
+    orders%s {
+        edges { node {
+            id name email createdAt displayFinancialStatus displayFulfillmentStatus
+            totalPriceSet { shopMoney { amount } }
+            lineItems { edges { node {
+                id title variantTitle sku quantity
+                originalUnitPriceSet { shopMoney { amount } }
+                totalDiscountSet { shopMoney { amount } }
+            } } }
+        } }
+    }
+}
+"""
+
+FULFILLMENT_STATUS_MAP = {
+    "FULFILLED": "fulfilled",
+    "PARTIALLY_FULFILLED": "partial",
+    "UNFULFILLED": "",
+}
+
+
+class BulkOperationError(Exception):
+    pass
+
+
+def gid_to_int(gid):
+    """'gid://shopify/Product/123' -> 123"""
+    return int(str(gid).rsplit("/", 1)[-1])
+
+
+def _money(money_set):
+    return ((money_set or {}).get("shopMoney") or {}).get("amount") or 0
+
+
+# --- Ciclo de vida de la operación ---
+
+def start_bulk_query(shop, query):
+    data = graphql_request(shop, RUN_MUTATION, {"query": query})
+    result = ((data or {}).get("data") or {}).get("bulkOperationRunQuery") or {}
+    errors = result.get("userErrors") or (data or {}).get("errors")
+    if errors or not result.get("bulkOperation"):
+        raise BulkOperationError(f"No se pudo iniciar la operación masiva: {errors or 'sin respuesta'}")
+    return result["bulkOperation"]["id"]
+
+
+def wait_for_bulk_operation(shop, operation_id, poll_interval=None, timeout=None):
+    """Consulta el estado hasta que la operación termina. Devuelve el nodo final."""
+    poll_interval = settings.SHOPIFY_BULK_POLL_INTERVAL if poll_interval is None else poll_interval
+    timeout = settings.SHOPIFY_BULK_TIMEOUT if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+
+    while True:
+        data = graphql_request(shop, STATUS_QUERY, {"id": operation_id})
+        node = ((data or {}).get("data") or {}).get("node") or {}
+        status = node.get("status")
+        if status in FINISHED_STATUSES:
+            if status != "COMPLETED":
+                raise BulkOperationError(f"Operación masiva {status}: {node.get('errorCode')}")
+            return node
+        if time.monotonic() >= deadline:
+            raise BulkOperationError(f"Timeout esperando la operación masiva {operation_id}")
+        time.sleep(poll_interval)
+
+
+def iter_jsonl(url):
+    """
+    Descarga el JSONL de resultados línea a línea sin cargarlo entero. Un corte
+    de la descarga o una línea truncada se convierten en BulkOperationError.
+    """
+    try:
+        response = transport.get(url, stream=True, timeout=300)
+    except requests.exceptions.RequestException as e:
+        raise BulkOperationError(f"Error descargando resultados: {e}") from e
+    try:
+        if response.status_code != 200:
+            raise BulkOperationError(f"Error descargando resultados (HTTP {response.status_code})")
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+    except (ValueError, requests.exceptions.RequestException) as e:
+        raise BulkOperationError(f"Descarga de resultados interrumpida: {e}") from e
+    finally:
+        response.close()
+
+
+def group_records(records):
+    """
+    Reconstruye objetos con sus hijos a partir de las líneas del JSONL.
+    Shopify emite cada padre antes que sus hijos (que llevan __parentId),
+    así que basta con mantener el padre en curso.
+    """
+    current = None
+    orphans = 0
+    for record in records:
+        parent_id = record.get("__parentId")
+        if parent_id is None:
+            if current is not None:
+                yield current
+            current = {**record, "__children": []}
+        elif current is not None and parent_id == current["id"]:
+            current["__children"].append(record)
+        else:
+            orphans += 1
+    if current is not None:
+        yield current
+    if orphans:
+        logger.warning(f"Bulk JSONL: {orphans} líneas hijas sin padre en curso ignoradas")
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- Conversión GraphQL -> forma REST (la que esperan los transformadores) ---
+
+def product_from_bulk(record):
+    return {
+        "id": gid_to_int(record["id"]),
+        "title": record.get("title", ""),
+        "vendor": record.get("vendor") or "",
+        "product_type": record.get("productType") or "",
+        "status": (record.get("status") or "").lower(),
+        "created_at": record["createdAt"],
+        "variants": [
+            {
+                "id": gid_to_int(v["id"]),
+                "title": v.get("title") or "Default",
+                "sku": v.get("sku") or "",
+                "barcode": v.get("barcode") or "",
+                "price": v.get("price") or 0,
+                "inventory_quantity": v.get("inventoryQuantity") or 0,
+            }
+            for v in record["__children"]
+        ],
+    }
+
+
+def order_from_bulk(record):
+    return {
+        "id": gid_to_int(record["id"]),
+        "name": record["name"],
+        "email": record.get("email") or "",
+        "total_price": _money(record.get("totalPriceSet")),
+        "financial_status": (record.get("displayFinancialStatus") or "").lower(),
+        "fulfillment_status": FULFILLMENT_STATUS_MAP.get(
+            record.get("displayFulfillmentStatus"), (record.get("displayFulfillmentStatus") or "").lower()
+        ),
+        "created_at": record["createdAt"],
+        "line_items": [
+            {
+                "id": gid_to_int(item["id"]),
+                "title": item.get("title") or "",
+                "variant_title": item.get("variantTitle") or "",
+                "sku": item.get("sku") or "",
+                "quantity": item.get("quantity") or 1,
+                "price": _money(item.get("originalUnitPriceSet")),
+                "total_discount": _money(item.get("totalDiscountSet")),
+            }
+            for item in record["__children"]
+        ],
+    }
+
+
+# --- Importadores ---
+
+def load_products(shop, records, chunk_size=None):
+    """Vuelca registros JSONL de productos en BD. Separado para poder reproducir fixtures."""
+    chunk_size = chunk_size or settings.BULK_UPSERT_CHUNK_SIZE
+    result = {"products": 0, "variants": 0, "detalle": {"productos": empty_stats(), "variantes": empty_stats()}}
+    products = (product_from_bulk(r) for r in group_records(records))
+    for chunk in _chunked(products, chunk_size):
+        stats = upsert_products(shop, chunk)
+        result["products"] += len(chunk)
+        result["variants"] += sum(len(p["variants"]) for p in chunk)
+        merge_stats(result["detalle"]["productos"], stats["productos"])
+        merge_stats(result["detalle"]["variantes"], stats["variantes"])
+    return result
+
+
+def load_orders(shop, records, chunk_size=None, enqueue=False):
+    """
+    Vuelca registros JSONL de pedidos en BD. Un backfill no encola pedidos
+    para Verial: los nuevos entran como IMPORTED salvo con enqueue=True.
+    """
+    chunk_size = chunk_size or settings.BULK_UPSERT_CHUNK_SIZE
+    result = {"count": 0, "lines": 0, "detalle": {"pedidos": empty_stats(), "lineas": empty_stats()}}
+    orders = (order_from_bulk(r) for r in group_records(records))
+    for chunk in _chunked(orders, chunk_size):
+        stats = upsert_orders(shop, chunk, enqueue=enqueue)
+        result["count"] += len(chunk)
+        result["lines"] += sum(len(o["line_items"]) for o in chunk)
+        merge_stats(result["detalle"]["pedidos"], stats["pedidos"])
+        merge_stats(result["detalle"]["lineas"], stats["lineas"])
+    return result
+
+
+def run_bulk_export(shop, query, poll_interval=None, timeout=None):
+    """Ejecuta la consulta masiva y devuelve un iterador de registros JSONL."""
+    operation_id = start_bulk_query(shop, query)
+    logger.info(f"Operación masiva iniciada: {operation_id}")
+    node = wait_for_bulk_operation(shop, operation_id, poll_interval, timeout)
+    logger.info(f"Operación masiva completada: {node.get('objectCount')} objetos")
+    if not node.get("url"):
+        # Sin resultados Shopify no genera fichero
+        return iter(())
+    return iter_jsonl(node["url"])
+
+
+def import_products_bulk(shop, poll_interval=None, timeout=None):
+    try:
+        records = run_bulk_export(shop, PRODUCTS_BULK_QUERY, poll_interval, timeout)
+        return True, load_products(shop, records)
+    except BulkOperationError as e:
+        logger.error(f"Error en importación masiva de productos: {e}")
+        return False, {"error": str(e)}
+
+
+def import_orders_bulk(shop, since=None, poll_interval=None, timeout=None):
+    """Backfill de pedidos. `since` (datetime/date) filtra por updated_at."""
+    query_filter = f'(query: "updated_at:>=\'{since.isoformat()}\'")' if since else ""
+    try:
+        records = run_bulk_export(shop, ORDERS_BULK_QUERY % query_filter, poll_interval, timeout)
+        return True, load_orders(shop, records)
+    except BulkOperationError as e:
+        logger.error(f"Error en importación masiva de pedidos: {e}")
+        return False, {"error": str(e)}
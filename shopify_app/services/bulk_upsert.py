@@ -0,0 +1,85 @@
+"""
+Motor de upsert masivo: compara en memoria contra lo que ya hay en BD y
+escribe solo filas nuevas o modificadas con bulk_create(update_conflicts=True).
+"""
+from django.conf import settings
+from django.db import transaction
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _normalizers(model, field_names):
+    return {name: model._meta.get_field(name).to_python for name in field_names}
+
+
+def get_pk_map(model, keys, field="shopify_id"):
+    """Devuelve {valor_de_field: pk} para las claves indicadas en una sola consulta."""
+    pk_map = {}
+    for chunk in _chunks(keys, settings.BULK_UPSERT_CHUNK_SIZE):
+        pk_map.update(model.objects.filter(**{f"{field}__in": chunk}).values_list(field, "pk"))
+    return pk_map
+
+
+def bulk_upsert(model, rows, update_fields, unique_fields=("shopify_id",), chunk_size=None):
+    """
+    Inserta o actualiza `rows` (dicts campo -> valor; las FK por attname, p.ej. shop_id).
+    Cada fila debe incluir los unique_fields y todos los update_fields.
+
+    Por cada chunk: una consulta para cargar los valores actuales, diff en
+    memoria y un único bulk_create con upsert dentro de su propia transacción.
+    Devuelve {"insertados": n, "actualizados": n, "sin_cambios": n}.
+    """
+    chunk_size = chunk_size or settings.BULK_UPSERT_CHUNK_SIZE
+    unique_fields = tuple(unique_fields)
+    update_fields = tuple(update_fields)
+    normalize = _normalizers(model, unique_fields + update_fields)
+    stats = {"insertados": 0, "actualizados": 0, "sin_cambios": 0}
+
+    for chunk in _chunks(rows, chunk_size):
+        # Normalizamos para comparar con lo que devuelve la BD (Decimal, datetime...)
+        # y deduplicamos por clave: gana la última aparición.
+        by_key = {}
+        for row in chunk:
+            row = {name: normalize[name](value) if name in normalize else value for name, value in row.items()}
+            by_key[tuple(row[f] for f in unique_fields)] = row
+
+        lookup = {
+            f"{field}__in": {key[i] for key in by_key}
+            for i, field in enumerate(unique_fields)
+        }
+        existing = {
+            tuple(values[f] for f in unique_fields): values
+            for values in model.objects.filter(**lookup).values(*unique_fields, *update_fields)
+        }
+
+        to_write = []
+        for key, row in by_key.items():
+            current = existing.get(key)
+            if current is None:
+                stats["insertados"] += 1
+            elif any(current[name] != row[name] for name in update_fields):
+                stats["actualizados"] += 1
+            else:
+                stats["sin_cambios"] += 1
+                continue
+            to_write.append(model(**row))
+
+        if to_write:
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    to_write,
+                    update_conflicts=True,
+                    unique_fields=unique_fields,
+                    update_fields=update_fields,
+                )
+
+    return stats
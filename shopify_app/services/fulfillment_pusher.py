@@ -0,0 +1,257 @@
+"""
+Fulfillments en Shopify para los pedidos que Verial da por enviados.
+
+Los pedidos COMPLETED sin shopify_fulfilled_at se procesan por tienda:
+
+1. Se consultan sus fulfillment orders con una consulta nodes(ids:) por lote.
+2. Por cada fulfillment order abierto se crea un fulfillment; las mutaciones
+   van agrupadas con alias (f0, f1, ...) en una sola petición por lote y los
+   lotes salen en paralelo, cada uno cuando el ThrottleBucket tiene puntos.
+3. El pedido se marca (shopify_fulfilled_at) con un bulk_update por lote en
+   cuanto todos sus fulfillment orders quedan cerrados o cancelados. Si alguno
+   está retenido o programado (ON_HOLD, SCHEDULED, INCOMPLETE...) el pedido
+   sigue pendiente ("en_espera") y se vuelve a mirar en la siguiente ejecución.
+
+La idempotencia es doble: un pedido marcado no se vuelve a consultar, y si una
+ejecución se corta tras crear el fulfillment pero antes de marcar, la siguiente
+ve el fulfillment order cerrado y solo marca el pedido, sin duplicarlo.
+
+Solo se tratan pedidos creados dentro de ORDER_STATUS_SYNC_HORIZON_DAYS (el
+histórico COMPLETED anterior a la función no se recorre) y cada fallo suma un
+intento: con SHOPIFY_FULFILLMENT_MAX_ATTEMPTS el pedido deja de reintentarse.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from erp_connector import metrics
+from shopify_app.models import Order
+from . import shopify_graphql
+from .stock_pusher import ThrottleBucket
+
+logger = logging.getLogger('shopify_app')
+
+FULFILLMENTS = metrics.counter("shopify_fulfillments_total", "Fulfillments hacia Shopify por resultado")
+
+LOOKUP_BATCH_SIZE = 50
+LOOKUP_COST = 30
+MUTATION_COST = 10
+# Solo estos fulfillment orders admiten un fulfillment nuevo
+OPEN_STATUSES = {"OPEN", "IN_PROGRESS"}
+# Con todos sus fulfillment orders en estos estados el pedido está terminado en Shopify
+DONE_STATUSES = {"CLOSED", "CANCELLED"}
+
+FULFILLMENT_ORDERS_QUERY = """
+query FulfillmentOrders($ids: [ID!]!) {
+    nodes(ids: $ids) {
+        ... on Order {
+            id
+            fulfillmentOrders(first: 20) { nodes { id status } }
+        }
+    }
+}
+"""
+
+
+def order_gid(order):
+    return f"gid://shopify/Order/{order.shopify_id}"
+
+
+def fulfillment_mutation(count):
+    """Mutación con `count` fulfillmentCreateV2 con alias f0..f{count-1}."""
+    params = ", ".join(f"$f{i}: FulfillmentV2Input!" for i in range(count))
+    fields = "\n".join(
+        f"    f{i}: fulfillmentCreateV2(fulfillment: $f{i}) {{ fulfillment {{ id }} userErrors {{ field message }} }}"
+        for i in range(count)
+    )
+    return f"mutation FulfillmentCreate({params}) {{\n{fields}\n}}"
+
+
+def pending_fulfillments():
+    """
+    Pedidos enviados según Verial cuyo fulfillment aún no está en Shopify,
+    dentro del horizonte y sin agotar los intentos.
+    """
+    horizon = timezone.now() - timedelta(days=settings.ORDER_STATUS_SYNC_HORIZON_DAYS)
+    return (
+        Order.objects.select_related('shop')
+        .filter(
+            status="COMPLETED", shopify_fulfilled_at__isnull=True, created_at__gte=horizon,
+            shopify_fulfillment_attempts__lt=settings.SHOPIFY_FULFILLMENT_MAX_ATTEMPTS,
+        )
+        .order_by('pk')
+    )
+
+
+def _lookup(shop, orders, bucket):
+    """Fulfillment orders de un lote de pedidos: {shopify_id: [{id, status}]} o None si falla."""
+    bucket.acquire(LOOKUP_COST)
+    data = shopify_graphql.execute(shop, FULFILLMENT_ORDERS_QUERY, {"ids": [order_gid(o) for o in orders]})
+    bucket.observe(shopify_graphql.cost_block(data).get("throttleStatus"))
+    nodes = ((data or {}).get("data") or {}).get("nodes")
+    if nodes is None:
+        return None
+    return {
+        order.shopify_id: ((node or {}).get("fulfillmentOrders") or {}).get("nodes") or []
+        for order, node in zip(orders, nodes)
+        if node is not None
+    }
+
+
+def _create(shop, batch, bucket):
+    """Crea los fulfillments de un lote [(order, fulfillment_order_id)]. Devuelve [(fulfillment_id, error)]."""
+    bucket.acquire(MUTATION_COST * len(batch))
+    variables = {
+        f"f{i}": {
+            "lineItemsByFulfillmentOrder": [{"fulfillmentOrderId": fulfillment_order_id}],
+            "notifyCustomer": settings.SHOPIFY_FULFILLMENT_NOTIFY_CUSTOMER,
+        }
+        for i, (_, fulfillment_order_id) in enumerate(batch)
+    }
+    data = shopify_graphql.execute(shop, fulfillment_mutation(len(batch)), variables)
+    bucket.observe(shopify_graphql.cost_block(data).get("throttleStatus"))
+    payload = (data or {}).get("data")
+    if not payload:
+        error = str((data or {}).get("errors") or "Sin respuesta de Shopify")
+        return [(None, error)] * len(batch)
+
+    results = []
+    for i in range(len(batch)):
+        created = payload.get(f"f{i}") or {}
+        errors = "; ".join(e.get("message", "") for e in created.get("userErrors") or [])
+        fulfillment = created.get("fulfillment") or {}
+        results.append((fulfillment.get("id"), errors or (None if fulfillment.get("id") else "Sin fulfillment")))
+    return results
+
+
+def _mark(orders, fulfillment_ids):
+    now = timezone.now()
+    for order in orders:
+        order.shopify_fulfilled_at = now
+        order.shopify_fulfillment_id = fulfillment_ids.get(order.pk, "")
+    Order.objects.bulk_update(orders, ["shopify_fulfilled_at", "shopify_fulfillment_id"])
+
+
+def _fail(orders, result):
+    """Cuenta el fallo y suma un intento; al llegar al máximo el pedido deja de reintentarse."""
+    result["errores"] += len(orders)
+    FULFILLMENTS.inc(len(orders), result="error")
+    Order.objects.filter(pk__in=[o.pk for o in orders]).update(
+        shopify_fulfillment_attempts=F("shopify_fulfillment_attempts") + 1
+    )
+    for order in orders:
+        attempts = order.shopify_fulfillment_attempts + 1
+        if attempts >= settings.SHOPIFY_FULFILLMENT_MAX_ATTEMPTS:
+            result["agotados"] += 1
+            logger.error(f"Pedido {order.name}: fulfillment sin éxito tras {attempts} intentos, no se reintenta")
+
+
+def _push_shop(shop, orders, workers, result):
+    bucket = ThrottleBucket()
+    batch_size = max(1, settings.SHOPIFY_FULFILLMENT_BATCH_SIZE)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fulfillment") as executor:
+        # 1. Fulfillment orders de cada pedido
+        lookups = [orders[i:i + LOOKUP_BATCH_SIZE] for i in range(0, len(orders), LOOKUP_BATCH_SIZE)]
+        futures = {executor.submit(_lookup, shop, batch, bucket): batch for batch in lookups}
+        pending, waiting = [], set()
+        for future in as_completed(futures):
+            batch = futures[future]
+            found = future.result()
+            if found is None:
+                logger.error(f"Error consultando fulfillment orders de {len(batch)} pedidos")
+                _fail(batch, result)
+                continue
+
+            closed, missing = [], []
+            for order in batch:
+                if order.shopify_id not in found:
+                    logger.error(f"Pedido {order.name} no encontrado en Shopify")
+                    missing.append(order)
+                    continue
+                statuses = [fo.get("status") for fo in found[order.shopify_id]]
+                open_ids = [fo["id"] for fo in found[order.shopify_id] if fo.get("status") in OPEN_STATUSES]
+                if any(status not in OPEN_STATUSES | DONE_STATUSES for status in statuses):
+                    # Retenido o programado en Shopify: no se puede terminar todavía
+                    waiting.add(order.pk)
+                    logger.info(f"Pedido {order.name}: fulfillment orders en espera ({', '.join(statuses)})")
+                if open_ids:
+                    pending.extend((order, fo_id) for fo_id in open_ids)
+                elif order.pk not in waiting:
+                    closed.append(order)
+            if missing:
+                _fail(missing, result)
+            if closed:
+                # Todo cerrado o cancelado: ya se preparó en Shopify (o en una ejecución cortada)
+                _mark(closed, {})
+                result["ya_cerrados"] += len(closed)
+                FULFILLMENTS.inc(len(closed), result="ya_cerrado")
+
+        # 2. Fulfillments agrupados; un pedido se marca cuando todos sus FO salen bien
+        remaining = defaultdict(int)
+        for order, _ in pending:
+            remaining[order.pk] += 1
+        failed, fulfillment_ids = set(), {}
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        futures = {executor.submit(_create, shop, batch, bucket): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            done, failed_orders = [], []
+            for (order, fo_id), (fulfillment_id, error) in zip(batch, future.result()):
+                remaining[order.pk] -= 1
+                if error:
+                    failed.add(order.pk)
+                    result["errores_detalle"].append({"pedido": order.name, "mensaje": error})
+                    logger.error(f"Shopify rechazó el fulfillment de {order.name} ({fo_id}): {error}")
+                else:
+                    fulfillment_ids[order.pk] = fulfillment_id
+                if remaining[order.pk] == 0:
+                    if order.pk in failed:
+                        failed_orders.append(order)
+                    elif order.pk not in waiting:
+                        done.append(order)
+            if failed_orders:
+                _fail(failed_orders, result)
+            if done:
+                _mark(done, fulfillment_ids)
+                result["creados"] += len(done)
+                FULFILLMENTS.inc(len(done), result="creado")
+        result["mutaciones"] += len(batches)
+        result["en_espera"] += len(waiting)
+        if waiting:
+            FULFILLMENTS.inc(len(waiting), result="en_espera")
+
+
+def push_fulfillments(orders=None, workers=None):
+    """
+    Crea en Shopify los fulfillments de los pedidos enviados según Verial
+    (por defecto, todos los pendientes). Devuelve el resumen de la ejecución.
+    """
+    orders = list(pending_fulfillments() if orders is None else orders)
+    workers = workers or settings.SHOPIFY_FULFILLMENT_WORKERS
+    result = {
+        "pedidos": len(orders), "creados": 0, "ya_cerrados": 0, "errores": 0,
+        "agotados": 0, "en_espera": 0, "mutaciones": 0, "errores_detalle": [],
+    }
+    if not orders:
+        return result
+
+    by_shop = defaultdict(list)
+    for order in orders:
+        by_shop[order.shop_id].append(order)
+
+    with shopify_graphql.track_run("fulfillment") as run:
+        for shop_orders in by_shop.values():
+            _push_shop(shop_orders[0].shop, shop_orders, workers, result)
+
+    result["graphql"] = run.summary()
+    logger.info(
+        f"Fulfillments Shopify: {result['creados']} creados, {result['ya_cerrados']} ya cerrados, "
+        f"{result['en_espera']} en espera, {result['errores']} errores de {result['pedidos']} pedidos ({result['mutaciones']} mutaciones)"
+    )
+    return result
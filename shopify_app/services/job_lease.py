@@ -0,0 +1,144 @@
+"""
+Leases en BD para los jobs de sync_runner cuando hay varias réplicas.
+
+Cada job tiene una fila JobLease. Un nodo la toma con un UPDATE condicionado
+(libre, caducada y, si se pide, sin ejecución reciente de otro nodo), así que
+dos nodos nunca ejecutan el mismo job a la vez. Mientras el job corre, un hilo
+renueva el lease cada JOB_LEASE_HEARTBEAT segundos; si el nodo muere, el
+lease caduca a los JOB_LEASE_TTL segundos y otro nodo lo toma.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from erp_connector import metrics
+from shopify_app.models import JobLease
+
+logger = logging.getLogger('sync_runner')
+
+LEASES = metrics.counter("job_lease_total", "Intentos de tomar el lease de un job por resultado")
+
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# Segundos entre intentos cuando se espera a que otro job suelte el lease
+WAIT_POLL = 5
+
+
+class Lease:
+    """Lease de un job para este nodo."""
+
+    def __init__(self, name, owner=None, ttl=None):
+        self.name = name
+        self.owner = owner or NODE_ID
+        self.ttl = ttl or settings.JOB_LEASE_TTL
+        self.lost = False
+
+    def _expiry(self, now):
+        return now + timedelta(seconds=self.ttl)
+
+    def acquire(self, min_interval=0):
+        """
+        Toma el lease si está libre o caducado. Con min_interval (segundos) tampoco
+        se toma si otro nodo lo adquirió hace menos de ese tiempo: el job ya se
+        ejecutó en este intervalo y no se repite.
+        """
+        try:
+            with transaction.atomic():
+                JobLease.objects.get_or_create(name=self.name)
+        except IntegrityError:
+            pass
+
+        now = timezone.now()
+        available = Q(owner="") | Q(expires_at__lt=now)
+        if min_interval:
+            since = now - timedelta(seconds=max(min_interval - settings.JOB_LEASE_SLACK, 0))
+            available &= Q(acquired_at__isnull=True) | Q(acquired_at__lte=since)
+        taken = JobLease.objects.filter(available, name=self.name).update(
+            owner=self.owner, acquired_at=now, heartbeat_at=now, expires_at=self._expiry(now), runs=F("runs") + 1,
+        )
+        LEASES.inc(job=self.name, result="adquirido" if taken else "ocupado")
+        return bool(taken)
+
+    def heartbeat(self):
+        """Renueva el lease. Devuelve False si otro nodo lo tomó entretanto."""
+        now = timezone.now()
+        renewed = JobLease.objects.filter(name=self.name, owner=self.owner).update(
+            heartbeat_at=now, expires_at=self._expiry(now),
+        )
+        if not renewed and not self.lost:
+            self.lost = True
+            LEASES.inc(job=self.name, result="perdido")
+            logger.warning(f"Lease del job {self.name} perdido: otro nodo lo tomó tras caducar")
+        return bool(renewed)
+
+    def release(self):
+        JobLease.objects.filter(name=self.name, owner=self.owner).update(
+            owner="", expires_at=None, last_finished_at=timezone.now(),
+        )
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, lease, interval):
+        super().__init__(name=f"lease-{lease.name}", daemon=True)
+        self.lease = lease
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                if not self.lease.heartbeat():
+                    return
+        finally:
+            connection.close()
+
+
+@contextmanager
+def hold(name, min_interval=0, ttl=None, heartbeat=None, wait=0):
+    """
+    Intenta tomar el lease de `name` y lo mantiene vivo mientras dura el bloque.
+    Con wait (segundos) reintenta cada WAIT_POLL mientras esté ocupado.
+    Devuelve el Lease o None si otro nodo lo tiene (o ya ejecutó el job en el intervalo).
+    """
+    lease = Lease(name, ttl=ttl)
+    deadline = time.monotonic() + wait
+    while not lease.acquire(min_interval):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield None
+            return
+        time.sleep(min(WAIT_POLL, remaining))
+
+    interval = settings.JOB_LEASE_HEARTBEAT if heartbeat is None else heartbeat
+    beater = _Heartbeat(lease, interval) if interval else None
+    if beater:
+        beater.start()
+    try:
+        yield lease
+    finally:
+        if beater:
+            beater.stopped.set()
+            beater.join()
+        lease.release()
+
+
+def run_exclusive(name, fn, min_interval=0, wait=0):
+    """
+    Ejecuta fn() solo si este nodo consigue el lease (esperando hasta `wait`
+    segundos a que se libere). Devuelve True si se ejecutó.
+    """
+    with hold(name, min_interval=min_interval, wait=wait) as lease:
+        if lease is None:
+            logger.info(f"Job {name} omitido: lo está ejecutando o acaba de ejecutarlo otro nodo")
+            return False
+        fn()
+        return True
@@ -0,0 +1,160 @@
+"""
+Envío concurrente de pedidos pendientes a Verial.
+
+Cada worker reclama un pedido con select_for_update(skip_locked=True) y,
+en esa misma transacción corta, lo reserva (verial_retry_at) para que otro
+proceso no lo tome; el envío HTTP va después, fuera de la transacción. Varios
+procesos (o hilos) comparten así la cola sin pisarse. Un fallo no es
+definitivo: el pedido sigue en RECEIVED y se reintenta con espera creciente
+hasta VERIAL_DISPATCH_MAX_ATTEMPTS. El ritmo hacia Verial lo limita el
+transporte HTTP (settings.HTTP_RATE_LIMITS).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from shopify_app.models import Order
+from .verial_sender import send_order
+
+logger = logging.getLogger('shopify_app')
+
+
+def pending_orders():
+    return Order.objects.filter(status="RECEIVED", sent_to_verial=False).order_by("received_at", "pk")
+
+
+class _Queue:
+    """Estado compartido entre workers: límite de pedidos y pedidos ya intentados."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.attempted = set()
+        self.results = []
+        self._lock = threading.Lock()
+
+    def exhausted(self):
+        with self._lock:
+            return self.limit is not None and len(self.attempted) >= self.limit
+
+    def mark(self, pk):
+        with self._lock:
+            self.attempted.add(pk)
+
+    def excluded(self):
+        with self._lock:
+            return list(self.attempted)
+
+    def add_result(self, result):
+        with self._lock:
+            self.results.append(result)
+
+
+def retry_delay(attempts):
+    """Segundos hasta el siguiente intento tras `attempts` fallos."""
+    return min(settings.VERIAL_DISPATCH_RETRY_BASE * 2 ** (attempts - 1), settings.VERIAL_DISPATCH_RETRY_MAX)
+
+
+def _claim_next(queue):
+    """Reclama un pedido libre y lo reserva. Devuelve None si no queda ninguno."""
+    now = timezone.now()
+    with transaction.atomic():
+        order = (
+            pending_orders()
+            .filter(Q(verial_retry_at__isnull=True) | Q(verial_retry_at__lte=now))
+            .exclude(pk__in=queue.excluded())
+            .select_for_update(skip_locked=True)
+            .first()
+        )
+        if order is None:
+            return None
+        queue.mark(order.pk)
+        # La reserva caduca sola si el proceso muere a mitad del envío
+        order.verial_attempts += 1
+        order.verial_retry_at = now + timedelta(seconds=settings.VERIAL_DISPATCH_CLAIM_TIMEOUT)
+        order.save(update_fields=["verial_attempts", "verial_retry_at"])
+    return order
+
+
+def _send_next(queue):
+    """Reclama y envía un pedido. Devuelve False si no queda ninguno libre."""
+    order = _claim_next(queue)
+    if order is None:
+        return False
+
+    final = order.verial_attempts >= settings.VERIAL_DISPATCH_MAX_ATTEMPTS
+    # Si falla, el pedido queda reservado hasta el siguiente intento
+    order.verial_retry_at = None if final else timezone.now() + timedelta(seconds=retry_delay(order.verial_attempts))
+
+    started = time.monotonic()
+    try:
+        ok = send_order(order, final=final)
+        message = order.verial_error
+    except Exception as e:
+        ok, message = False, str(e)
+        logger.error(f"Error crítico enviando pedido {order.name}: {e}")
+        Order.objects.filter(pk=order.pk).update(
+            status="ERROR" if final else "RECEIVED", verial_error=message, verial_retry_at=order.verial_retry_at
+        )
+    if not ok and not final:
+        logger.warning(
+            f"Pedido {order.name}: intento {order.verial_attempts}/{settings.VERIAL_DISPATCH_MAX_ATTEMPTS} "
+            f"fallido, se reintenta a las {order.verial_retry_at:%H:%M:%S}"
+        )
+
+    queue.add_result({
+        "pedido": order.name,
+        "ok": ok,
+        "mensaje": message,
+        "segundos": round(time.monotonic() - started, 3),
+    })
+    return True
+
+
+def _worker(queue):
+    try:
+        while not queue.exhausted() and _send_next(queue):
+            pass
+    finally:
+        connection.close()
+
+
+def dispatch_pending_orders(workers=None, limit=None):
+    """
+    Envía los pedidos pendientes con `workers` hilos. Devuelve un resumen con
+    los resultados por pedido y el rendimiento (pedidos/s).
+    """
+    workers = workers or settings.VERIAL_DISPATCH_WORKERS
+    queue = _Queue(limit)
+    started = time.monotonic()
+
+    if workers <= 1:
+        while not queue.exhausted() and _send_next(queue):
+            pass
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="verial-dispatch") as executor:
+            for future in [executor.submit(_worker, queue) for _ in range(workers)]:
+                future.result()
+
+    elapsed = time.monotonic() - started
+    sent = sum(1 for r in queue.results if r["ok"])
+    summary = {
+        "total": len(queue.results),
+        "enviados": sent,
+        "errores": len(queue.results) - sent,
+        "workers": workers,
+        "segundos": round(elapsed, 3),
+        "pedidos_por_segundo": round(len(queue.results) / elapsed, 2) if elapsed > 0 else 0,
+        "resultados": queue.results,
+    }
+    logger.info(
+        f"Envío a Verial: {summary['enviados']}/{summary['total']} en {summary['segundos']}s "
+        f"({summary['pedidos_por_segundo']} pedidos/s, {workers} workers)"
+    )
+    return summary
@@ -0,0 +1,185 @@
+"""
+Cliente GraphQL de Shopify instrumentado.
+
+Por cada consulta registra coste solicitado y real, throttleStatus, latencia y
+reintentos como métricas Prometheus, y los acumula en los resúmenes por
+ejecución activos (track_run). Los errores THROTTLED se reintentan esperando
+lo que tarda el bucket en recuperar el coste de la consulta según restoreRate.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from erp_connector import metrics, transport
+
+logger = logging.getLogger('shopify_app')
+
+COST_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+# Espera mínima entre reintentos THROTTLED; sin bloque de coste no hay estimación
+# y se espera THROTTLE_UNKNOWN_WAIT, doblando en cada reintento
+THROTTLE_MIN_WAIT = 0.1
+THROTTLE_UNKNOWN_WAIT = 1.0
+
+QUERIES = metrics.counter("shopify_graphql_requests_total", "Consultas GraphQL a Shopify por operación y resultado")
+RETRIES = metrics.counter("shopify_graphql_retries_total", "Reintentos de consultas GraphQL por throttling")
+REQUESTED_COST = metrics.counter("shopify_graphql_requested_cost_total", "Coste solicitado acumulado por operación")
+ACTUAL_COST = metrics.counter("shopify_graphql_actual_cost_total", "Coste real acumulado por operación")
+COST = metrics.histogram("shopify_graphql_query_cost", "Coste real por consulta GraphQL", buckets=COST_BUCKETS)
+LATENCY = metrics.histogram("shopify_graphql_duration_seconds", "Latencia de consultas GraphQL por operación")
+AVAILABLE = metrics.gauge("shopify_graphql_throttle_available", "Puntos disponibles en el bucket de Shopify")
+RESTORE_RATE = metrics.gauge("shopify_graphql_throttle_restore_rate", "Puntos por segundo que recupera el bucket")
+
+_OPERATION_RE = re.compile(r"^\s*(?:query|mutation)\s+(\w+)")
+
+_runs = []
+_runs_lock = threading.Lock()
+
+
+def operation_name(query):
+    match = _OPERATION_RE.match(query)
+    return match.group(1) if match else "anonima"
+
+
+def cost_block(data):
+    return ((data or {}).get("extensions") or {}).get("cost") or {}
+
+
+def is_throttled(data):
+    return any(
+        (e.get("extensions") or {}).get("code") == "THROTTLED"
+        for e in (data or {}).get("errors") or []
+    )
+
+
+def throttle_wait(data, retry=1):
+    """Segundos hasta que el bucket recupere el coste de la consulta (`retry`: nº de reintento)."""
+    cost = cost_block(data)
+    status = cost.get("throttleStatus") or {}
+    if not status:
+        return THROTTLE_UNKNOWN_WAIT * 2 ** (retry - 1)
+    restore_rate = float(status.get("restoreRate") or 50.0)
+    missing = float(cost.get("requestedQueryCost") or 0) - float(status.get("currentlyAvailable") or 0)
+    return max(missing / restore_rate, THROTTLE_MIN_WAIT)
+
+
+class GraphQLRun:
+    """Resumen de las consultas GraphQL hechas durante una ejecución."""
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = {
+            "consultas": 0, "reintentos": 0, "throttled": 0, "errores": 0,
+            "coste_solicitado": 0.0, "coste_real": 0.0,
+            "disponible_min": None, "latencia_total_s": 0.0, "latencia_max_s": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def record(self, cost, latency, retries, result):
+        status = cost.get("throttleStatus") or {}
+        with self._lock:
+            s = self.stats
+            s["consultas"] += 1
+            s["reintentos"] += retries
+            s["throttled"] += result == "throttled"
+            s["errores"] += result == "error"
+            s["coste_solicitado"] += float(cost.get("requestedQueryCost") or 0)
+            s["coste_real"] += float(cost.get("actualQueryCost") or 0)
+            s["latencia_total_s"] = round(s["latencia_total_s"] + latency, 3)
+            s["latencia_max_s"] = round(max(s["latencia_max_s"], latency), 3)
+            available = status.get("currentlyAvailable")
+            if available is not None and (s["disponible_min"] is None or available < s["disponible_min"]):
+                s["disponible_min"] = available
+
+    def summary(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+@contextmanager
+def track_run(name):
+    """Acumula en un GraphQLRun todas las consultas (de cualquier hilo) mientras dure el bloque."""
+    run = GraphQLRun(name)
+    with _runs_lock:
+        _runs.append(run)
+    try:
+        yield run
+    finally:
+        with _runs_lock:
+            _runs.remove(run)
+        logger.info(f"GraphQL [{name}]: {run.summary()}")
+
+
+def _record(operation, data, latency, retries, result):
+    cost = cost_block(data)
+    status = cost.get("throttleStatus") or {}
+    QUERIES.inc(operation=operation, result=result)
+    LATENCY.observe(latency, operation=operation)
+    if retries:
+        RETRIES.inc(retries, operation=operation)
+    if cost.get("requestedQueryCost") is not None:
+        REQUESTED_COST.inc(float(cost["requestedQueryCost"]), operation=operation)
+    if cost.get("actualQueryCost") is not None:
+        ACTUAL_COST.inc(float(cost["actualQueryCost"]), operation=operation)
+        COST.observe(float(cost["actualQueryCost"]), operation=operation)
+    if status:
+        AVAILABLE.set(status.get("currentlyAvailable", 0))
+        RESTORE_RATE.set(status.get("restoreRate", 0))
+    with _runs_lock:
+        runs = list(_runs)
+    for run in runs:
+        run.record(cost, latency, retries, result)
+
+
+def execute(shop, query, variables=None):
+    """
+    Ejecuta la consulta y devuelve el JSON de respuesta, o None si Shopify
+    no responde 200. Un THROTTLED se reintenta hasta SHOPIFY_THROTTLE_MAX_RETRIES
+    veces; si se agotan se devuelve la respuesta con el error.
+    """
+    url = f"https://{shop.shop}/admin/api/2024-01/graphql.json"
+    headers = {"X-Shopify-Access-Token": shop.access_token, "Content-Type": "application/json"}
+    payload = {"query": query}
+    if variables:
+        payload["variables"] = variables
+
+    operation = operation_name(query)
+    retries = 0
+    started = time.monotonic()
+    while True:
+        try:
+            response = transport.post(url, headers=headers, json=payload, timeout=30)
+        except Exception as e:
+            logger.error(f"Error en GraphQL ({operation}): {e}")
+            _record(operation, None, time.monotonic() - started, retries, "error")
+            return None
+
+        if response.status_code == 429 and retries < settings.SHOPIFY_THROTTLE_MAX_RETRIES:
+            retries += 1
+            time.sleep(float(response.headers.get("Retry-After") or 1))
+            continue
+        if response.status_code != 200:
+            logger.error(f"GraphQL {operation}: HTTP {response.status_code}")
+            _record(operation, None, time.monotonic() - started, retries, "error")
+            return None
+
+        try:
+            data = response.json()
+        except ValueError as e:
+            # 200 con cuerpo no JSON (página de error, proxy): se trata como fallo
+            logger.error(f"GraphQL {operation}: respuesta no JSON ({e})")
+            _record(operation, None, time.monotonic() - started, retries, "error")
+            return None
+        if is_throttled(data) and retries < settings.SHOPIFY_THROTTLE_MAX_RETRIES:
+            retries += 1
+            wait = throttle_wait(data, retries)
+            logger.warning(f"GraphQL {operation} THROTTLED, reintento {retries} en {wait:.2f}s")
+            time.sleep(wait)
+            continue
+
+        result = "throttled" if is_throttled(data) else ("error" if data.get("errors") else "ok")
+        _record(operation, data, time.monotonic() - started, retries, result)
+        return data
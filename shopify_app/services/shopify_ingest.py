@@ -0,0 +1,243 @@
+"""
+Ingesta de datos de Shopify (productos, clientes, pedidos) hacia la BD local.
+
+Pipeline en streaming: fetch_pages genera las páginas de la API REST,
+prefetch pide la siguiente página en segundo plano mientras la actual se
+transforma y se escribe con el motor de upsert masivo. La memoria queda
+acotada al tamaño de página.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.utils.dateparse import parse_datetime
+
+from erp_connector import transport
+from shopify_app.models import Customer, Order, OrderLine, Product, ProductVariant
+from .bulk_upsert import bulk_upsert, get_pk_map
+
+PRODUCT_FIELDS = ("shop_id", "title", "vendor", "product_type", "status", "created_at")
+VARIANT_FIELDS = ("product_id", "title", "sku", "barcode", "price", "inventory_quantity")
+CUSTOMER_FIELDS = ("shop_id", "email", "first_name", "last_name", "phone", "created_at")
+ORDER_FIELDS = (
+    "shop_id", "name", "email", "total_price", "financial_status",
+    "fulfillment_status", "created_at", "status", "sent_to_verial",
+)
+SEND_STATE_FIELDS = ("status", "sent_to_verial")
+LINE_FIELDS = ("product_title", "variant_title", "sku", "quantity", "price", "discount_amount")
+
+
+def empty_stats():
+    return {"insertados": 0, "actualizados": 0, "sin_cambios": 0}
+
+
+def merge_stats(total, partial):
+    for key, value in partial.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+class ShopifyFetchError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"Error de Shopify (HTTP {status_code})")
+        self.status_code = status_code
+
+
+# --- Lectura paginada ---
+
+def next_page_url(link_header):
+    """Extrae la URL rel="next" de la cabecera Link de Shopify."""
+    for part in (link_header or "").split(","):
+        if 'rel="next"' in part:
+            return part.split(";")[0].strip().strip("<>")
+    return None
+
+
+def fetch_pages(url, headers, key):
+    """Genera las páginas (listas de `key`) siguiendo la paginación por cursor."""
+    while url:
+        response = transport.get(url, headers=headers)
+        if response.status_code != 200:
+            raise ShopifyFetchError(response.status_code)
+        yield response.json()[key]
+        url = next_page_url(response.headers.get("Link", ""))
+
+
+_DONE = object()
+
+
+def prefetch(iterable):
+    """
+    Recorre `iterable` en un hilo aparte con una página de adelanto, de modo
+    que la descarga de la siguiente se solapa con el procesado de la actual.
+    El hilo solo hace HTTP; las escrituras en BD siguen en el hilo llamante.
+    """
+    iterator = iter(iterable)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="shopify-prefetch") as executor:
+        future = executor.submit(next, iterator, _DONE)
+        while True:
+            item = future.result()
+            if item is _DONE:
+                return
+            future = executor.submit(next, iterator, _DONE)
+            yield item
+
+
+# --- Transformadores: JSON de Shopify -> fila de BD ---
+
+def product_row(shop, data):
+    return {
+        "shopify_id": data["id"],
+        "shop_id": shop.pk,
+        "title": data["title"],
+        "vendor": data.get("vendor", "") or "",
+        "product_type": data.get("product_type", "") or "",
+        "status": data["status"],
+        "created_at": parse_datetime(data["created_at"]),
+    }
+
+
+def variant_row(product_id, data):
+    return {
+        "shopify_id": data["id"],
+        "product_id": product_id,
+        "title": data.get("title", "Default"),
+        "sku": data.get("sku", "") or "",
+        "barcode": data.get("barcode", "") or "",
+        "price": data.get("price", 0),
+        "inventory_quantity": data.get("inventory_quantity", 0) or 0,
+    }
+
+
+def customer_row(shop, data):
+    return {
+        "shopify_id": data["id"],
+        "shop_id": shop.pk,
+        "email": data.get("email", "") or "",
+        "first_name": data.get("first_name", "") or "",
+        "last_name": data.get("last_name", "") or "",
+        "phone": data.get("phone", "") or "",
+        "created_at": parse_datetime(data["created_at"]),
+    }
+
+
+def order_row(shop, data, status="RECEIVED"):
+    return {
+        "shopify_id": data["id"],
+        "shop_id": shop.pk,
+        "name": data["name"],
+        "email": data.get("email", "") or "",
+        "total_price": data["total_price"],
+        "financial_status": data["financial_status"],
+        "fulfillment_status": data.get("fulfillment_status", "") or "",
+        "created_at": parse_datetime(data["created_at"]),
+        "status": status,
+        "sent_to_verial": False,
+    }
+
+
+def line_row(order_id, item):
+    return {
+        "order_id": order_id,
+        "shopify_id": item["id"],
+        "product_title": item.get("title", ""),
+        "variant_title": item.get("variant_title", "") or "",
+        "sku": item.get("sku", "") or "",
+        "quantity": item.get("quantity", 1),
+        "price": item.get("price", 0),
+        "discount_amount": item.get("total_discount", 0) or 0,
+    }
+
+
+# --- Escritores ---
+
+def upsert_products(shop, products):
+    """Upsert de productos y sus variantes. Devuelve estadísticas por modelo."""
+    products = list(products)
+    product_stats = bulk_upsert(Product, (product_row(shop, p) for p in products), PRODUCT_FIELDS)
+
+    product_ids = get_pk_map(Product, (p["id"] for p in products))
+    variant_stats = bulk_upsert(
+        ProductVariant,
+        (
+            variant_row(product_ids[p["id"]], v)
+            for p in products
+            for v in p.get("variants", [])
+        ),
+        VARIANT_FIELDS,
+    )
+    return {"productos": product_stats, "variantes": variant_stats}
+
+
+def upsert_customers(shop, customers):
+    return bulk_upsert(Customer, (customer_row(shop, c) for c in customers), CUSTOMER_FIELDS)
+
+
+def upsert_orders(shop, orders, enqueue=True):
+    """
+    Upsert de pedidos y sus líneas. Devuelve estadísticas por modelo.
+    Solo los pedidos nuevos reciben estado: RECEIVED (encolados para Verial)
+    o IMPORTED con enqueue=False (backfills) o si ya llegan cancelados. Los
+    existentes conservan su estado de envío, salvo que un pedido aún en cola
+    se cancele en Shopify: entonces sale de la cola como IMPORTED.
+    """
+    orders = list(orders)
+    existing_ids = set(
+        Order.objects.filter(shopify_id__in=[o["id"] for o in orders]).values_list("shopify_id", flat=True)
+    )
+    order_stats = bulk_upsert(
+        Order,
+        (
+            order_row(shop, o, "RECEIVED" if enqueue and not o.get("cancelled_at") else "IMPORTED")
+            for o in orders if o["id"] not in existing_ids
+        ),
+        ORDER_FIELDS,
+    )
+    if existing_ids:
+        merge_stats(order_stats, bulk_upsert(
+            Order,
+            (
+                {k: v for k, v in order_row(shop, o).items() if k not in SEND_STATE_FIELDS}
+                for o in orders if o["id"] in existing_ids
+            ),
+            [f for f in ORDER_FIELDS if f not in SEND_STATE_FIELDS],
+        ))
+        cancelled = [o["id"] for o in orders if o["id"] in existing_ids and o.get("cancelled_at")]
+        if cancelled:
+            Order.objects.filter(shopify_id__in=cancelled, status="RECEIVED", sent_to_verial=False).update(
+                status="IMPORTED"
+            )
+
+    order_ids = get_pk_map(Order, (o["id"] for o in orders))
+    line_stats = bulk_upsert(
+        OrderLine,
+        (
+            line_row(order_ids[o["id"]], item)
+            for o in orders
+            for item in o.get("line_items", [])
+        ),
+        LINE_FIELDS,
+        unique_fields=("order_id", "shopify_id"),
+    )
+    return {"pedidos": order_stats, "lineas": line_stats}
+
+
+# --- Pipelines completos: páginas -> transformador -> escritor ---
+
+def ingest_products(shop, pages):
+    """Consume páginas de productos. Devuelve totales y estadísticas de upsert."""
+    result = {"products": 0, "variants": 0, "detalle": {"productos": empty_stats(), "variantes": empty_stats()}}
+    for page in prefetch(pages):
+        stats = upsert_products(shop, page)
+        result["products"] += len(page)
+        result["variants"] += sum(len(p.get("variants", [])) for p in page)
+        merge_stats(result["detalle"]["productos"], stats["productos"])
+        merge_stats(result["detalle"]["variantes"], stats["variantes"])
+    return result
+
+
+def ingest_customers(shop, pages):
+    """Consume páginas de clientes. Devuelve totales y estadísticas de upsert."""
+    result = {"count": 0, "detalle": empty_stats()}
+    for page in prefetch(pages):
+        merge_stats(result["detalle"], upsert_customers(shop, page))
+        result["count"] += len(page)
+    return result
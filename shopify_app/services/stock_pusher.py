@@ -0,0 +1,148 @@
+"""
+Envío concurrente de stock a Shopify respetando el leaky bucket de GraphQL.
+
+Cada respuesta trae extensions.cost.throttleStatus (currentlyAvailable,
+maximumAvailable, restoreRate). ThrottleBucket estima con ello los puntos
+disponibles en cada momento; un chunk solo sale cuando hay puntos para su
+coste, así que hay tantos chunks en vuelo como permite el bucket (con
+SHOPIFY_STOCK_PUSH_WORKERS como techo). Los reintentos de un chunk THROTTLED
+los hace el cliente GraphQL (shopify_graphql), que espera lo que tarda en
+recuperarse su coste.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+
+from shopify_app import stock_sync
+from . import shopify_graphql
+
+logger = logging.getLogger('stock')
+
+CHUNK_SIZE = 250
+
+
+class ThrottleBucket:
+    """Estimación local del leaky bucket de la API GraphQL de Shopify."""
+
+    def __init__(self, maximum=1000.0, restore_rate=50.0):
+        self.maximum = float(maximum)
+        self.available = float(maximum)
+        self.restore_rate = float(restore_rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _estimate(self, now):
+        return min(self.maximum, self.available + self.restore_rate * (now - self._updated))
+
+    def observe(self, status):
+        """Sincroniza la estimación con el throttleStatus devuelto por Shopify."""
+        if not status:
+            return
+        with self._lock:
+            self.maximum = float(status.get("maximumAvailable", self.maximum))
+            self.available = float(status.get("currentlyAvailable", self.available))
+            self.restore_rate = float(status.get("restoreRate", self.restore_rate)) or self.restore_rate
+            self._updated = time.monotonic()
+
+    def wait_time(self, cost):
+        """Segundos hasta que haya `cost` puntos disponibles."""
+        with self._lock:
+            missing = cost - self._estimate(time.monotonic())
+            return max(missing, 0) / self.restore_rate
+
+    def acquire(self, cost):
+        """Reserva `cost` puntos, esperando lo justo si no los hay. Devuelve los segundos esperados."""
+        cost = min(cost, self.maximum)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                estimate = self._estimate(now)
+                if estimate >= cost:
+                    self.available = estimate - cost
+                    self._updated = now
+                    return waited
+                wait = (cost - estimate) / self.restore_rate
+            time.sleep(wait)
+            waited += wait
+
+
+def _push_chunk(shop, location_id, chunk, bucket, cost):
+    """Envía un chunk cuando el bucket estimado tiene puntos para su coste."""
+    bucket.acquire(cost)
+    success, info = stock_sync.update_stock_batch(shop, location_id, chunk)
+    bucket.observe(info.get("throttle"))
+    return success, info
+
+
+def push_stock(shop, location_id, quantities, on_accepted=None, on_rejected=None, workers=None,
+               chunk_size=CHUNK_SIZE):
+    """
+    Envía `quantities` en chunks concurrentes. `on_accepted(items)` y
+    `on_rejected(items)` se llaman en el hilo llamante con los items aceptados
+    y con los que Shopify rechazó uno a uno (userErrors) de cada chunk.
+    Devuelve {"aceptados", "fallidos", "rechazados", "reenviados", "errores_detalle", "reintentos", "chunks"}:
+    "rechazados" son los fallidos por userErrors (no se arreglan reintentando);
+    el resto de fallidos son de chunks enteros (red, throttling) y son transitorios.
+
+    inventorySetQuantities valida la entrada entera: un chunk con userErrors
+    puede no haber aplicado nada, así que el resto de sus items no se da por
+    aceptado y se reenvía sin los rechazados ("reenviados").
+    """
+    workers = workers or settings.SHOPIFY_STOCK_PUSH_WORKERS
+    cost = settings.SHOPIFY_STOCK_CHUNK_COST
+    chunks = [quantities[i:i + chunk_size] for i in range(0, len(quantities), chunk_size)]
+    bucket = ThrottleBucket()
+    result = {
+        "aceptados": 0, "fallidos": 0, "rechazados": 0, "reenviados": 0, "errores_detalle": [],
+        "reintentos": 0, "chunks": len(chunks),
+    }
+    if not chunks:
+        return result
+
+    with shopify_graphql.track_run("stock-push") as run, \
+            ThreadPoolExecutor(max_workers=min(workers, len(chunks)), thread_name_prefix="stock-push") as executor:
+        while chunks:
+            futures = {executor.submit(_push_chunk, shop, location_id, chunk, bucket, cost): chunk for chunk in chunks}
+            chunks = []
+            for future in as_completed(futures):
+                chunk = futures[future]
+                success, info = future.result()
+
+                if not success:
+                    logger.error(f"Error actualizando stock ({len(chunk)} items): {info.get('error')}")
+                    result["fallidos"] += len(chunk)
+                    result["errores_detalle"].extend(
+                        {"inventoryItemId": q["inventoryItemId"], "mensaje": str(info.get("error"))} for q in chunk
+                    )
+                    continue
+
+                fallidos = info.get("fallidos") or {}
+                rejected = [q for q in chunk if q["inventoryItemId"] in fallidos]
+                rest = [q for q in chunk if q["inventoryItemId"] not in fallidos]
+                if rejected:
+                    for q in rejected:
+                        message = fallidos[q["inventoryItemId"]]
+                        logger.error(f"Shopify rechazó el stock de {q['inventoryItemId']}: {message}")
+                        result["errores_detalle"].append(
+                            {"inventoryItemId": q["inventoryItemId"], "mensaje": message, "rechazado": True}
+                        )
+                    result["fallidos"] += len(rejected)
+                    result["rechazados"] += len(rejected)
+                    if on_rejected:
+                        on_rejected(rejected)
+                    if rest:
+                        # El chunk no se aplicó: el resto sale de nuevo sin los rechazados
+                        result["reenviados"] += len(rest)
+                        chunks.append(rest)
+                    continue
+
+                result["aceptados"] += len(rest)
+                if rest and on_accepted:
+                    on_accepted(rest)
+
+    result["reintentos"] = run.summary()["reintentos"]
+    return result
@@ -0,0 +1,137 @@
+"""
+Planificador adaptativo del stock para sync_runner.
+
+En vez de cruzar catálogo, inventario y stock cada pocos minutos, cada tick
+lanza una sonda barata: la huella del cuerpo de GetStockArticulosWS (sin
+parsear) más el recuento y el último updated_at del índice de inventario y del
+mapeo de almacenes. Solo si la firma cambió se ejecuta la sincronización
+completa. El siguiente tick se programa con un intervalo corto en horas punta,
+largo fuera de ellas y que se duplica con cada sondeo sin cambios.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from erp_connector import metrics
+from erp_connector.verial_client import VerialClient
+from shopify_app.models import ShopifyInventoryItem, StockLocationMapping
+
+logger = logging.getLogger('sync_runner')
+
+PROBES = metrics.counter("stock_probe_total", "Sondeos de cambios de stock por resultado")
+SAVED_RUNS = metrics.counter("stock_runs_saved_total", "Sincronizaciones de stock evitadas por la sonda")
+INTERVAL = metrics.gauge("stock_scheduler_interval_seconds", "Segundos hasta el siguiente sondeo de stock")
+
+# Tope de duplicaciones del intervalo (el límite real es STOCK_INTERVAL_MAX)
+MAX_BACKOFF_STEPS = 8
+
+
+def probe_signature():
+    """Firma de todo lo que alimenta el cruce de stock. Devuelve (success, firma | error)."""
+    success, digest = VerialClient().stock_fingerprint()
+    if not success:
+        return False, digest
+    inventory = ShopifyInventoryItem.objects.aggregate(total=Count("pk"), last=Max("updated_at"))
+    locations = StockLocationMapping.objects.aggregate(total=Count("pk"), last=Max("updated_at"))
+    return True, (
+        f"{digest}|{inventory['total']}:{inventory['last']}|{locations['total']}:{locations['last']}"
+    )
+
+
+def busy_hours():
+    """(inicio, fin) de STOCK_BUSY_HOURS; None si no está configurado o es inválido."""
+    try:
+        start, end = (int(part) for part in settings.STOCK_BUSY_HOURS.split("-"))
+    except (AttributeError, ValueError):
+        return None
+    return start, end
+
+
+def is_busy(now=None):
+    """Indica si `now` (hora local) cae en la franja de horas punta."""
+    hours = busy_hours()
+    if hours is None:
+        return False
+    hour = timezone.localtime(now or timezone.now()).hour
+    start, end = hours
+    if start <= end:
+        return start <= hour < end
+    # Franja que cruza medianoche, p. ej. "20-2"
+    return hour >= start or hour < end
+
+
+class AdaptiveStockScheduler:
+    """Estado del planificador adaptativo en un nodo de sync_runner."""
+
+    def __init__(self, sync=None, probe=None):
+        self.sync = sync or _run_sync
+        self.probe = probe or probe_signature
+        self.signature = None
+        self.idle_probes = 0
+        self.stats = {"sondeos": 0, "con_cambios": 0, "sin_cambios": 0, "errores": 0, "ahorradas": 0}
+
+    def next_interval(self, now=None):
+        """Segundos hasta el siguiente sondeo."""
+        base = settings.STOCK_INTERVAL_BUSY if is_busy(now) else settings.STOCK_INTERVAL_IDLE
+        stretched = base * 2 ** min(self.idle_probes, MAX_BACKOFF_STEPS)
+        return max(min(stretched, settings.STOCK_INTERVAL_MAX), settings.STOCK_INTERVAL_BUSY)
+
+    def tick(self, now=None):
+        """
+        Sondea y, si hay cambios, sincroniza. Devuelve los segundos hasta el
+        siguiente tick.
+        """
+        self.stats["sondeos"] += 1
+        success, signature = self.probe()
+
+        if not success:
+            self.stats["errores"] += 1
+            PROBES.inc(result="error")
+            logger.warning(f"⚠️ [STOCK] Sonda fallida: {signature}")
+        elif signature == self.signature:
+            self.idle_probes += 1
+            self.stats["sin_cambios"] += 1
+            self.stats["ahorradas"] += 1
+            PROBES.inc(result="sin_cambios")
+            SAVED_RUNS.inc()
+        else:
+            self.idle_probes = 0
+            self.stats["con_cambios"] += 1
+            PROBES.inc(result="con_cambios")
+            # La firma solo se da por procesada si no hubo errores transitorios:
+            # en ese caso el siguiente sondeo vuelve a lanzar la sincronización.
+            if self.sync():
+                self.signature = signature
+
+        delay = self.next_interval(now)
+        INTERVAL.set(delay)
+        logger.info(
+            f"📡 [STOCK] Sonda {self.stats['sondeos']}: {self.hit_ratio():.0%} con cambios, "
+            f"{self.stats['ahorradas']} sincronizaciones ahorradas; próxima en {delay}s"
+        )
+        return delay
+
+    def hit_ratio(self):
+        answered = self.stats["con_cambios"] + self.stats["sin_cambios"]
+        return self.stats["con_cambios"] / answered if answered else 0.0
+
+
+def _run_sync():
+    """
+    Sincronización completa de stock. True si terminó sin errores transitorios:
+    los items que Shopify rechaza quedan anotados en el snapshot y no se
+    arreglan repitiendo el cruce, así que no impiden alargar el intervalo.
+    """
+    from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+    success, result = sync_stock_verial_to_shopify()
+    if not success:
+        logger.error(f"❌ [STOCK] Error: {result.get('error', result)}")
+        return False
+    logger.info(
+        f"✅ [STOCK] {result.get('actualizados', 0)} actualizados, "
+        f"{result.get('errores', 0)} errores (modo {result.get('modo')})"
+    )
+    return not result.get("errores", 0) - result.get("rechazados", 0)
@@ -1,5 +1,5 @@
 import json
-import requests
+from erp_connector import transport
 from django.conf import settings
 from shopify_app.models import Customer, CustomerMapping
 
@@ -41,7 +41,7 @@ def get_or_create_verial_customer(customer: Customer):
     }
 
     try:
-        r = requests.post(
+        r = transport.post(
             settings.VERIAL_CREATE_CLIENT_URL,
             headers=settings.VERIAL_HEADERS,
             json=payload,
@@ -1,5 +1,5 @@
 import json
-import requests
+from erp_connector import transport
 from datetime import date, timedelta
 from django.conf import settings
 
@@ -24,7 +24,7 @@ def get_verial_orders_last_days(days=7):
     url = f"http://{settings.VERIAL_SERVER}/WcfServiceLibraryVerial/BuscarDocClienteWS"
 
     try:
-        r = requests.post(
+        r = transport.post(
             url,
             headers={"Content-Type": "application/json"},
             data=json.dumps(payload),
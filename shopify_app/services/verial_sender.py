@@ -5,8 +5,11 @@ DUPLICATE_MESSAGES = [
     "ya existe un documento con la misma referencia"
 ]
 
-def send_order(order):
-    
+def send_order(order, final=True):
+    """
+    Envía el pedido y guarda el resultado. Si falla y final=False el pedido
+    sigue en RECEIVED (con el error anotado) para que se reintente.
+    """
     if order.sent_to_verial:
         return True
 
@@ -28,10 +31,10 @@ def send_order(order):
                 order.sent_to_verial_at = timezone.now()
                 order.verial_error = "Duplicado en Verial (pedido ya existente)"
             else:
-                order.status = "ERROR"
+                order.status = "ERROR" if final else "RECEIVED"
                 order.verial_error = message
         else:
-            order.status = "ERROR"
+            order.status = "ERROR" if final else "RECEIVED"
             order.verial_error = "Error desconocido"
 
     order.save()
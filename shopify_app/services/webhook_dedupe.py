@@ -0,0 +1,118 @@
+"""
+Almacén de idempotencia para webhooks de Shopify (entrega "al menos una vez").
+
+Guarda en memoria, con caducidad (TTL), los X-Shopify-Webhook-Id y los hashes
+de cuerpo ya aceptados, de modo que un reintento se descarta con una consulta
+O(1) antes de parsear el JSON o tocar la BD. Al primer uso en cada proceso se
+precarga con lo recibido en la ventana de TTL según WebhookInbox; entre
+procesos sigue protegiendo la restricción única de la bandeja.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from erp_connector import metrics
+from shopify_app.models import WebhookInbox
+
+DUPLICATE_REASONS = ("id", "payload", "bd")
+
+CHECKS = metrics.counter("webhook_dedupe_total", "Webhooks comprobados por resultado y motivo")
+DUPLICATE_RATE = metrics.gauge("webhook_duplicate_rate", "Proporción de webhooks duplicados descartados")
+
+
+class TTLStore:
+    """Conjunto de claves con caducidad. Las más antiguas salen primero (orden de inserción)."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        while self._entries:
+            key, expires = next(iter(self._entries.items()))
+            if expires > now and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        expires = self._entries.get(key)
+        return expires is not None and expires > time.time()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, seen_at=None):
+        now = time.time()
+        expires = (seen_at or now) + self.ttl
+        with self._lock:
+            self._entries[key] = expires
+            self._entries.move_to_end(key)
+            self._evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def payload_hash(topic, body):
+    return hashlib.sha256(topic.encode("utf-8") + b"\n" + body).hexdigest()
+
+
+def _get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = TTLStore(settings.WEBHOOK_DEDUPE_TTL_HOURS * 3600, settings.WEBHOOK_DEDUPE_MAX_ENTRIES)
+                since = timezone.now() - timedelta(hours=settings.WEBHOOK_DEDUPE_TTL_HOURS)
+                recent = WebhookInbox.objects.filter(received_at__gte=since).order_by("received_at")
+                for webhook_id, digest, received_at in recent.values_list("webhook_id", "payload_hash", "received_at"):
+                    store.add(f"id:{webhook_id}", received_at.timestamp())
+                    if digest:
+                        store.add(f"hash:{digest}", received_at.timestamp())
+                _store = store
+    return _store
+
+
+def reset():
+    """Vacía el almacén (se recarga desde BD en el siguiente uso)."""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+def record(duplicate, reason=""):
+    """Contabiliza una comprobación y recalcula la tasa de duplicados del proceso."""
+    CHECKS.inc(result="duplicado" if duplicate else "nuevo", motivo=reason)
+    duplicates = sum(CHECKS.value(result="duplicado", motivo=r) for r in DUPLICATE_REASONS)
+    total = CHECKS.total()
+    DUPLICATE_RATE.set(round(duplicates / total, 4) if total else 0)
+
+
+def is_duplicate(webhook_id, digest):
+    """Devuelve True (y lo contabiliza) si el webhook o su cuerpo ya se aceptaron dentro del TTL."""
+    store = _get_store()
+    if f"id:{webhook_id}" in store:
+        record(True, "id")
+        return True
+    if f"hash:{digest}" in store:
+        record(True, "payload")
+        return True
+    return False
+
+
+def remember(webhook_id, digest):
+    store = _get_store()
+    store.add(f"id:{webhook_id}")
+    store.add(f"hash:{digest}")
@@ -0,0 +1,222 @@
+"""
+Bandeja de entrada de webhooks de Shopify.
+
+La vista solo verifica el HMAC y guarda el cuerpo crudo (deduplicado por
+X-Shopify-Webhook-Id). Un pool de workers reclama lotes de la bandeja y
+los vuelca con el motor de upsert masivo, fuera del ciclo de la petición.
+"""
+import json
+import logging
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from erp_connector import metrics
+from shopify_app.models import Shop, WebhookInbox
+from . import webhook_dedupe
+from .shopify_ingest import upsert_orders
+
+logger = logging.getLogger('shopify_app')
+
+RECEIVED = metrics.counter("webhook_inbox_received_total", "Webhooks recibidos por topic y resultado")
+PROCESSED = metrics.counter("webhook_inbox_processed_total", "Webhooks procesados por resultado")
+DEPTH = metrics.gauge("webhook_inbox_depth", "Webhooks pendientes de procesar")
+OLDEST = metrics.gauge("webhook_inbox_oldest_pending_seconds", "Antigüedad del webhook pendiente más antiguo")
+LAG = metrics.histogram("webhook_inbox_lag_seconds", "Tiempo entre la recepción y el procesado de un webhook")
+
+# Topic -> escritor masivo (shop, [payloads])
+HANDLERS = {
+    "orders/create": upsert_orders,
+    "orders/updated": upsert_orders,
+}
+
+
+def _claimable(now):
+    stale = now - timedelta(seconds=settings.WEBHOOK_INBOX_CLAIM_TIMEOUT)
+    return Q(status="PENDING") | Q(status="PROCESSING", claimed_at__lt=stale)
+
+
+# --- Entrada ---
+
+def enqueue(webhook_id, topic, shop_domain, body, digest=""):
+    """Guarda el webhook. Devuelve False si ese webhook_id ya estaba en la bandeja."""
+    try:
+        with transaction.atomic():
+            WebhookInbox.objects.create(
+                webhook_id=webhook_id, topic=topic, shop_domain=shop_domain,
+                payload_hash=digest, body=body,
+            )
+    except IntegrityError:
+        created = False
+    else:
+        created = True
+
+    if digest:
+        webhook_dedupe.remember(webhook_id, digest)
+    webhook_dedupe.record(not created, "" if created else "bd")
+    RECEIVED.inc(topic=topic, result="nuevo" if created else "duplicado")
+    return created
+
+
+def purge_processed(hours=None):
+    """Borra las entradas procesadas más antiguas que la ventana de idempotencia."""
+    hours = settings.WEBHOOK_DEDUPE_TTL_HOURS if hours is None else hours
+    cutoff = timezone.now() - timedelta(hours=hours)
+    deleted, _ = WebhookInbox.objects.filter(status="DONE", received_at__lt=cutoff).delete()
+    return deleted
+
+
+# --- Worker ---
+
+def claim_batch(batch_size, exclude_ids=()):
+    """
+    Reclama hasta batch_size entradas marcándolas con un token propio.
+    El UPDATE condicionado a status hace que dos workers no se lleven la misma fila.
+    """
+    now = timezone.now()
+    ids = list(
+        WebhookInbox.objects.filter(_claimable(now))
+        .exclude(pk__in=exclude_ids)
+        .order_by("received_at")
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    WebhookInbox.objects.filter(_claimable(now), pk__in=ids).update(
+        status="PROCESSING", claim_token=token, claimed_at=now, attempts=F("attempts") + 1
+    )
+    return list(WebhookInbox.objects.filter(claim_token=token).order_by("received_at"))
+
+
+def _resolve_shop(domain):
+    return Shop.objects.filter(shop=domain).first() if domain else Shop.objects.first()
+
+
+def _fail(entry, message, retry=True):
+    final = not retry or entry.attempts >= settings.WEBHOOK_INBOX_MAX_ATTEMPTS
+    WebhookInbox.objects.filter(pk=entry.pk).update(
+        status="ERROR" if final else "PENDING", claim_token="", error=message[:2000]
+    )
+    PROCESSED.inc(result="error" if final else "reintento")
+    logger.error(f"Webhook {entry.webhook_id} ({entry.topic}): {message}")
+
+
+def process_batch(entries):
+    """Procesa un lote reclamado. Devuelve {"procesados", "errores", "fallidos": [pk, ...]}."""
+    groups = defaultdict(list)
+    failed = []
+    for entry in entries:
+        handler = HANDLERS.get(entry.topic)
+        if handler is None:
+            _fail(entry, f"Topic no soportado: {entry.topic}", retry=False)
+            failed.append(entry.pk)
+            continue
+        try:
+            payload = json.loads(entry.body)
+        except ValueError as e:
+            _fail(entry, f"JSON inválido: {e}", retry=False)
+            failed.append(entry.pk)
+            continue
+        groups[(handler, entry.shop_domain)].append((entry, payload))
+
+    done = []
+    for (handler, domain), items in groups.items():
+        shop = _resolve_shop(domain)
+        if shop is None:
+            for entry, _ in items:
+                _fail(entry, f"Tienda no encontrada: {domain}")
+                failed.append(entry.pk)
+            continue
+        try:
+            with transaction.atomic():
+                handler(shop, [payload for _, payload in items])
+            done.extend(entry for entry, _ in items)
+        except Exception:
+            # Reprocesamos uno a uno para aislar el payload defectuoso
+            for entry, payload in items:
+                try:
+                    with transaction.atomic():
+                        handler(shop, [payload])
+                    done.append(entry)
+                except Exception as e:
+                    _fail(entry, str(e))
+                    failed.append(entry.pk)
+
+    if done:
+        now = timezone.now()
+        WebhookInbox.objects.filter(pk__in=[e.pk for e in done]).update(
+            status="DONE", processed_at=now, claim_token="", error=""
+        )
+        for entry in done:
+            LAG.observe((now - entry.received_at).total_seconds(), topic=entry.topic)
+        PROCESSED.inc(len(done), result="ok")
+
+    return {"procesados": len(done), "errores": len(failed), "fallidos": failed}
+
+
+def drain_inbox(batch_size=None, max_batches=None):
+    """Procesa lotes hasta vaciar la bandeja (o max_batches). Cada fallo se reintenta en otra pasada."""
+    batch_size = batch_size or settings.WEBHOOK_INBOX_BATCH_SIZE
+    stats = {"lotes": 0, "procesados": 0, "errores": 0}
+    failed_ids = set()
+    while max_batches is None or stats["lotes"] < max_batches:
+        entries = claim_batch(batch_size, exclude_ids=failed_ids)
+        if not entries:
+            break
+        result = process_batch(entries)
+        stats["lotes"] += 1
+        stats["procesados"] += result["procesados"]
+        stats["errores"] += result["errores"]
+        failed_ids.update(result["fallidos"])
+    update_inbox_metrics()
+    return stats
+
+
+def _drain_in_thread(batch_size, max_batches):
+    try:
+        return drain_inbox(batch_size, max_batches)
+    finally:
+        connection.close()
+
+
+def run_workers(workers=None, batch_size=None, max_batches=None):
+    """Lanza `workers` hilos que vacían la bandeja en paralelo y suma sus estadísticas."""
+    workers = workers or settings.WEBHOOK_INBOX_WORKERS
+    if workers <= 1:
+        return drain_inbox(batch_size, max_batches)
+
+    started = time.monotonic()
+    totals = {"lotes": 0, "procesados": 0, "errores": 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook-worker") as executor:
+        futures = [executor.submit(_drain_in_thread, batch_size, max_batches) for _ in range(workers)]
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] += value
+    logger.info(
+        f"Bandeja de webhooks: {totals['procesados']} procesados, {totals['errores']} errores "
+        f"en {time.monotonic() - started:.2f}s con {workers} workers"
+    )
+    return totals
+
+
+# --- Métricas ---
+
+@metrics.register_collector
+def update_inbox_metrics():
+    """Profundidad de la cola y antigüedad del pendiente más antiguo, leídas de BD."""
+    pending = WebhookInbox.objects.filter(status__in=("PENDING", "PROCESSING")).aggregate(
+        total=Count("pk"), oldest=Min("received_at")
+    )
+    DEPTH.set(pending["total"])
+    oldest = pending["oldest"]
+    OLDEST.set(round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0)
+
@@ -1,107 +1,167 @@
 import logging
-import requests
-from .models import Shop, ProductMapping, ProductVariant
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from .models import Shop, ProductMapping, ProductVariant, StockSnapshot, StockLocationMapping
+from erp_connector import catalog_cache, stock_poller
+from erp_connector.compact_index import StockTable, match_inventory
 from erp_connector.verial_client import VerialClient
+from .services import shopify_graphql
+from .services.shopify_graphql import is_throttled
 
 logger = logging.getLogger('stock')
 
+def stock_totals(rows):
+    """Filas de StockArticulos -> StockTable {IdArticulo: stock total}."""
+    return StockTable(
+        (item["IdArticulo"], int(float(item.get("Stock") or 0)))
+        for item in rows
+        if item.get("IdArticulo") is not None
+    )
+
+
+def stock_by_location(rows, almacen_locations):
+    """
+    Filas de StockArticulos -> {location_id: StockTable {IdArticulo: stock}} en una sola pasada.
+    almacen_locations = {IdAlmacen: location_id}.
+
+    Supuesto (no documentado por Verial): con almacenes mapeados cada artículo
+    trae su desglose en StockAlmacenes ([{"IdAlmacen", "Stock"}]). Un artículo
+    con desglose tiene entrada en todas las locations (0 en las que no
+    aparecen sus almacenes); los almacenes sin mapeo se ignoran y los que
+    comparten location se suman. Un artículo sin la clave StockAlmacenes, o
+    con desglose vacío y stock total distinto de 0, no entra en ninguna tabla:
+    quien llama lo omite en lugar de enviar 0 y vaciar la tienda.
+    """
+    location_ids = set(almacen_locations.values())
+    pairs = {location_id: [] for location_id in location_ids}
+    for item in rows:
+        art_id = item.get("IdArticulo")
+        if art_id is None:
+            continue
+        breakdown = item.get("StockAlmacenes")
+        if breakdown is None or (not breakdown and int(float(item.get("Stock") or 0)) != 0):
+            continue
+        for location_id in location_ids:
+            pairs[location_id].append((art_id, 0))
+        for row in breakdown:
+            location_id = almacen_locations.get(row.get("IdAlmacen"))
+            if location_id is not None:
+                pairs[location_id].append((art_id, int(float(row.get("Stock") or 0))))
+    return {location_id: StockTable(location_pairs) for location_id, location_pairs in pairs.items()}
+
+
 def get_verial_stock():
-    """Obtiene el stock real desde Verial usando el nuevo cliente."""
+    """Obtiene el stock real desde Verial (en streaming) usando el nuevo cliente."""
     client = VerialClient()
     if not client.is_configured():
         return False, "Verial no configurado"
     
-    success, result = client.get_stock(id_articulo=0)
+    success, result = client.iter_stock(id_articulo=0)
     
     if not success:
         return False, result
 
-    stock_data = {}
-    for item in result.get("StockArticulos", []):
-        art_id = item.get("IdArticulo")
-        stock = item.get("Stock", 0)
-        if art_id is not None:
-            stock_data[int(art_id)] = int(float(stock))
-    
-    return True, stock_data
+    try:
+        return True, stock_totals(result)
+    except ValueError as e:
+        return False, str(e)
 
 def get_verial_products_by_barcode():
-    """Obtiene el catálogo para mapear Barcode -> ID_Verial."""
-    client = VerialClient()
-    if not client.is_configured():
-        return False, "Verial no configurado"
-    
-    success, result = client.get_articles()
-    
-    if not success:
-        return False, result
-    
-    productos = {}
-    for art in result.get("Articulos", []):
-        barcode = str(art.get("ReferenciaBarras", "")).strip()
-        if barcode:
-            productos[barcode] = int(art.get("Id"))
-    
-    return True, productos
+    """Obtiene el índice compacto Barcode -> ID_Verial del catálogo (caché compartida)."""
+    return catalog_cache.get_compact_index()
 
 
 def graphql_request(shop, query, variables=None):
-    url = f"https://{shop.shop}/admin/api/2024-01/graphql.json"
-    headers = {
-        "X-Shopify-Access-Token": shop.access_token,
-        "Content-Type": "application/json"
-    }
-    payload = {"query": query}
-    if variables: payload["variables"] = variables
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
-        if response.status_code == 200:
-            return response.json()
-    except Exception as e:
-        logger.error(f"Error en GraphQL: {e}")
-    return None
+    """Consulta GraphQL instrumentada (coste, throttling y reintentos THROTTLED)."""
+    return shopify_graphql.execute(shop, query, variables)
 
-def get_shopify_location_id(shop):
-    query = """query { locations(first: 1) { nodes { id } } }"""
-    data = graphql_request(shop, query)
-    if data and data.get("data", {}).get("locations", {}).get("nodes"):
-        return data["data"]["locations"]["nodes"][0]["id"]
-    return None
-
-def get_shopify_inventory_items(shop):
-    """Obtiene todos los items de inventario paginados (250 por vez)"""
-    items = []
-    has_next_page = True
-    cursor = None
-    
-    while has_next_page:
-        cursor_str = f', after: "{cursor}"' if cursor else ""
-        query = """
-        query {
-            inventoryItems(first: 250 %s) {
-                nodes {
-                    id
-                    sku
-                    variant { barcode }
-                }
-                pageInfo { hasNextPage endCursor }
-            }
-        }
-        """ % cursor_str
-        
+_locations_cache = {}
+_locations_lock = threading.Lock()
+
+
+def get_shopify_locations(shop, force=False):
+    """
+    Devuelve [{"id", "name"}] con las locations de la tienda. Se consultan como
+    mucho una vez cada SHOPIFY_LOCATIONS_TTL segundos por proceso.
+    """
+    with _locations_lock:
+        cached = _locations_cache.get(shop.shop)
+        if cached and not force and time.time() - cached[0] < settings.SHOPIFY_LOCATIONS_TTL:
+            return cached[1]
+
+        query = """query Locations { locations(first: 50) { nodes { id name } } }"""
         data = graphql_request(shop, query)
-        if data and data.get("data", {}).get("inventoryItems"):
-            inv_data = data["data"]["inventoryItems"]
-            items.extend(inv_data["nodes"])
-            has_next_page = inv_data["pageInfo"]["hasNextPage"]
-            cursor = inv_data["pageInfo"]["endCursor"]
+        nodes = ((data or {}).get("data") or {}).get("locations", {}).get("nodes")
+        if nodes is None:
+            return cached[1] if cached else []
+        _locations_cache[shop.shop] = (time.time(), nodes)
+        return nodes
+
+
+def reset_locations_cache():
+    with _locations_lock:
+        _locations_cache.clear()
+
+
+def get_shopify_location_id(shop):
+    """Location por defecto (la primera de la tienda) cuando no hay mapeo de almacenes."""
+    locations = get_shopify_locations(shop)
+    return locations[0]["id"] if locations else None
+
+
+def get_stock_locations(shop):
+    """
+    Devuelve {IdAlmacen: location_id} según los mapeos activos. Los mapeos que solo
+    tienen nombre de location se resuelven contra Shopify una vez y el ID se guarda.
+    """
+    mappings = list(StockLocationMapping.objects.filter(active=True))
+    pending = [m for m in mappings if not m.shopify_location_id]
+    if pending:
+        by_name = {loc["name"]: loc["id"] for loc in get_shopify_locations(shop)}
+        resolved = []
+        for mapping in pending:
+            location_id = by_name.get(mapping.location_name)
+            if location_id:
+                mapping.shopify_location_id = location_id
+                resolved.append(mapping)
+            else:
+                logger.warning(
+                    f"Almacén {mapping.verial_almacen_id}: no existe la location '{mapping.location_name}' en Shopify"
+                )
+        StockLocationMapping.objects.bulk_update(resolved, ["shopify_location_id"])
+    return {m.verial_almacen_id: m.shopify_location_id for m in mappings if m.shopify_location_id}
+
+def throttle_status(data):
+    """Bloque extensions.cost.throttleStatus de una respuesta GraphQL (o None)."""
+    return (((data or {}).get("extensions") or {}).get("cost") or {}).get("throttleStatus")
+
+
+def assign_user_errors(quantities, user_errors):
+    """
+    Reparte los userErrors entre los items del chunk usando el índice del campo
+    (["input", "quantities", "3", "quantity"] -> item 3).
+    Devuelve ({inventoryItemId: mensaje}, [errores sin item]).
+    """
+    per_item = {}
+    general = []
+    for error in user_errors:
+        index = next((int(part) for part in error.get("field") or [] if str(part).isdigit()), None)
+        if index is not None and index < len(quantities):
+            item_id = quantities[index]["inventoryItemId"]
+            per_item[item_id] = "; ".join(filter(None, [per_item.get(item_id), error.get("message")]))
         else:
-            has_next_page = False
-    return items
+            general.append(error.get("message"))
+    return per_item, general
+
 
 def update_stock_batch(shop, location_id, quantities):
-    """Actualización masiva de stock"""
+    """
+    Actualización masiva de stock. Devuelve (success, info):
+    info["fallidos"] = {inventoryItemId: mensaje} con los items rechazados por Shopify,
+    info["throttle"] = throttleStatus de la respuesta, info["throttled"] si hay que reintentar.
+    """
     mutation = """
     mutation InventorySet($input: InventorySetQuantitiesInput!) {
         inventorySetQuantities(input: $input) {
@@ -118,54 +178,186 @@ def update_stock_batch(shop, location_id, quantities):
         }
     }
     data = graphql_request(shop, mutation, variables)
-    if data:
-        errors = data.get("data", {}).get("inventorySetQuantities", {}).get("userErrors", [])
-        if errors: return False, errors
-        return True, "OK"
-    return False, "No response"
+    if not data:
+        return False, {"error": "No response", "throttle": None}
+
+    info = {"throttle": throttle_status(data)}
+    if is_throttled(data):
+        return False, {**info, "throttled": True, "error": "THROTTLED"}
 
+    result = (data.get("data") or {}).get("inventorySetQuantities")
+    if result is None:
+        return False, {**info, "error": data.get("errors") or "Respuesta sin datos"}
 
-def sync_stock_verial_to_shopify():
+    fallidos, general = assign_user_errors(quantities, result.get("userErrors") or [])
+    if general:
+        return False, {**info, "error": "; ".join(filter(None, general))}
+    return True, {**info, "fallidos": fallidos}
+
+
+def get_stock_snapshot(location_id):
+    """Devuelve {inventoryItemId: cantidad} con lo último enviado a la location."""
+    return dict(
+        StockSnapshot.objects.filter(location_id=location_id)
+        .values_list("inventory_item_id", "quantity")
+    )
+
+
+def save_stock_snapshot(location_id, quantities, rejected=False):
+    """
+    Registra como enviadas las cantidades de un chunk aceptado por Shopify.
+    Con rejected=True guarda los items con cantidad NULL: vistos pero no aceptados.
+    """
+    snapshots = [
+        StockSnapshot(
+            inventory_item_id=q["inventoryItemId"],
+            location_id=location_id,
+            quantity=None if rejected else q["quantity"],
+        )
+        for q in quantities
+    ]
+    with transaction.atomic():
+        StockSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=["inventory_item_id", "location_id"],
+            update_fields=["quantity", "pushed_at"],
+        )
+
+
+def sync_stock_verial_to_shopify(full_reconcile=False):
+    """
+    Sincroniza stock Verial -> Shopify. De Verial solo se toman los artículos
+    cuyo stock cambió desde el último envío (stock_poller) y de ellos solo se
+    envían los items cuya cantidad difiere de la última enviada (StockSnapshot).
+    Con full_reconcile=True se reenvía todo para corregir desvíos en Shopify.
+    El resultado incluye en "graphql" el resumen de coste y throttling de la ejecución.
+    """
+    with shopify_graphql.track_run("stock") as run:
+        success, result = _sync_stock(full_reconcile)
+    if success:
+        result["graphql"] = run.summary()
+        result["reintentos_throttle"] = result["graphql"]["reintentos"]
+    return success, result
+
+
+def _sync_stock(full_reconcile):
     shop = Shop.objects.first()
     if not shop: return False, {"error": "Tienda no configurada"}
-    
-    location_id = get_shopify_location_id(shop)
-    if not location_id: return False, {"error": "No hay Location ID"}
+
+    # Con mapeo de almacenes cada location recibe el stock de los suyos;
+    # sin él, todo el stock de Verial va a la location por defecto.
+    almacen_locations = get_stock_locations(shop)
+    if almacen_locations:
+        location_ids = sorted(set(almacen_locations.values()))
+    else:
+        location_id = get_shopify_location_id(shop)
+        if not location_id: return False, {"error": "No hay Location ID"}
+        location_ids = [location_id]
 
     success_p, verial_products = get_verial_products_by_barcode()
-    success_s, verial_stock = get_verial_stock()
-    
-    if not success_p or not success_s:
+    if not success_p:
         return False, {"error": "Error conectando con Verial"}
 
-    shopify_items = get_shopify_inventory_items(shop)
-    
-    quantities = []
-    for item in shopify_items:
-        code = None
-        if item.get("variant") and item["variant"].get("barcode"):
-            code = str(item["variant"]["barcode"]).strip()
-        if not code:
-            code = str(item.get("sku", "")).strip()
-        
-        if not code: continue
-
-        verial_id = verial_products.get(code)
-        if verial_id is not None:
-            stock = verial_stock.get(verial_id, 0)
-            quantities.append({
-                "inventoryItemId": item["id"],
-                "locationId": location_id,
-                "quantity": int(stock)
-            })
-    
-    if not quantities:
+    from .inventory_index import get_indexed_inventory_items
+    from .services.stock_pusher import push_stock
+    shopify_items = get_indexed_inventory_items(shop)
+
+    inventory_ids, verial_ids = match_inventory(shopify_items, verial_products)
+    if not inventory_ids:
         return False, {"error": "Nada que actualizar"}
 
-    actualizados = 0
-    for i in range(0, len(quantities), 250):
-        chunk = quantities[i:i + 250]
-        success, res = update_stock_batch(shop, location_id, chunk)
-        if success: actualizados += len(chunk)
+    # Un item sin snapshot (mapeo nuevo) necesita su stock aunque en Verial no se
+    # haya movido: se pide su artículo junto a los cambios. Los rechazados por
+    # Shopify o sin stock por almacén tienen snapshot NULL y no cuentan.
+    snapshots = {} if full_reconcile else {loc: get_stock_snapshot(loc) for loc in location_ids}
+    unsent = {
+        verial_ids[i] for i, inv in enumerate(inventory_ids)
+        if any(inv not in snapshot for snapshot in snapshots.values())
+    }
+    success_s, changes = stock_poller.poll(full=full_reconcile, include=unsent)
+    if not success_s:
+        return False, {"error": "Error conectando con Verial"}
+
+    rows = list(changes.rows.values())
+    if almacen_locations:
+        stock_vectors = stock_by_location(rows, almacen_locations)
+    else:
+        stock_vectors = {location_id: stock_totals(rows)}
+    moved = [i for i, vid in enumerate(verial_ids) if vid in changes.rows]
+    # Artículos sin stock por almacén: no se envían (ni a 0)
+    sin_desglose = {
+        verial_ids[i] for i in moved
+        if not any(verial_ids[i] in vector for vector in stock_vectors.values())
+    }
+    if sin_desglose:
+        logger.warning(
+            f"Stock: {len(sin_desglose)} artículo(s) sin desglose StockAlmacenes, se omiten "
+            f"(p.ej. {sorted(sin_desglose)[:5]})"
+        )
+
+    result = {
+        "modo": "completo" if full_reconcile else "delta",
+        "verial": {"modo": changes.modo, "recibidos": changes.recibidos, "cambiados": len(changes.rows)},
+        "actualizados": 0,
+        "cambiados": 0,
+        "omitidos": 0,
+        "errores": 0,
+        "rechazados": 0,
+        "errores_detalle": [],
+        "ubicaciones": {},
+        "sin_desglose": len(sin_desglose),
+        "total": len(shopify_items),
+    }
+    for location_id in location_ids:
+        verial_stock = stock_vectors.get(location_id) or StockTable()
+        quantities = [
+            {"inventoryItemId": inventory_ids[i], "locationId": location_id, "quantity": verial_stock.get(verial_ids[i])}
+            for i in moved
+            if verial_ids[i] in verial_stock
+        ]
+        if full_reconcile:
+            changed = quantities
+        else:
+            snapshot = snapshots[location_id]
+            changed = [
+                q for q in quantities
+                if snapshot.get(q["inventoryItemId"]) != q["quantity"]
+            ]
+
+        skipped = [
+            {"inventoryItemId": inventory_ids[i]} for i in moved
+            if verial_ids[i] in sin_desglose and not full_reconcile
+            and inventory_ids[i] not in snapshots[location_id]
+        ]
+        if skipped:
+            save_stock_snapshot(location_id, skipped, rejected=True)
+
+        push = push_stock(
+            shop, location_id, changed,
+            on_accepted=lambda items, location_id=location_id: save_stock_snapshot(location_id, items),
+            on_rejected=lambda items, location_id=location_id: save_stock_snapshot(location_id, items, rejected=True),
+        )
+        result["ubicaciones"][location_id] = {
+            "cambiados": len(changed), "actualizados": push["aceptados"], "errores": push["fallidos"],
+        }
+        result["actualizados"] += push["aceptados"]
+        result["errores"] += push["fallidos"]
+        result["rechazados"] += push["rechazados"]
+        result["cambiados"] += len(changed)
+        result["omitidos"] += len(inventory_ids) - len(changed)
+        result["errores_detalle"].extend(push["errores_detalle"])
+
+    # Solo los fallos transitorios (chunk sin respuesta) dejan el artículo sin
+    # confirmar para el siguiente sondeo. Los rechazos de Shopify y los artículos
+    # sin desglose quedan en el snapshot con NULL y se reintentan cuando el
+    # artículo cambie o en la reconciliación completa.
+    verial_by_item = dict(zip(inventory_ids, verial_ids))
+    transient = {verial_by_item.get(e["inventoryItemId"]) for e in result["errores_detalle"] if not e.get("rechazado")}
+    stock_poller.commit(changes, exclude=transient)
 
-    return True, {"actualizados": actualizados, "total": len(shopify_items)}
\ No newline at end of file
+    logger.info(
+        f"Stock [{result['modo']}] en {len(location_ids)} location(s): {result['cambiados']} cambiados, "
+        f"{result['omitidos']} sin cambios, {result['actualizados']} enviados, {result['errores']} errores"
+    )
+    return True, result
@@ -0,0 +1,178 @@
+"""
+Tests para el importador basado en Shopify Bulk Operations.
+
+Reproducen ficheros JSONL grabados en tests/fixtures sin acceder a Shopify.
+"""
+import json
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+import responses
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+RESULT_URL = 'https://storage.googleapis.com/shopify-bulk/result.jsonl'
+
+
+def _read_fixture(name):
+    return (FIXTURES / name).read_text(encoding='utf-8')
+
+
+def _records(name):
+    return (json.loads(line) for line in _read_fixture(name).splitlines() if line)
+
+
+def _register_bulk_flow(shop, fixture, statuses=('RUNNING', 'COMPLETED')):
+    """Simula el ciclo completo: mutation -> polling -> descarga del JSONL"""
+    graphql_url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+    responses.add(responses.POST, graphql_url, json={'data': {'bulkOperationRunQuery': {
+        'bulkOperation': {'id': 'gid://shopify/BulkOperation/1', 'status': 'CREATED'},
+        'userErrors': [],
+    }}})
+    for status in statuses:
+        node = {'id': 'gid://shopify/BulkOperation/1', 'status': status, 'errorCode': None, 'objectCount': '5'}
+        if status == 'COMPLETED':
+            node['url'] = RESULT_URL
+        responses.add(responses.POST, graphql_url, json={'data': {'node': node}})
+    responses.add(responses.GET, RESULT_URL, body=_read_fixture(fixture))
+
+
+@pytest.mark.unit
+class TestGroupRecords:
+    """Tests para la reconstrucción padre/hijos del JSONL"""
+
+    def test_children_are_attached_to_parent(self):
+        """Las variantes se agrupan bajo su producto"""
+        from shopify_app.services.bulk_operations import group_records
+
+        grouped = list(group_records(_records('bulk_products.jsonl')))
+
+        assert len(grouped) == 2
+        assert len(grouped[0]['__children']) == 2
+        assert len(grouped[1]['__children']) == 1
+
+    def test_product_conversion_matches_rest_shape(self):
+        """La conversión produce la forma que esperan los transformadores REST"""
+        from shopify_app.services.bulk_operations import group_records, product_from_bulk
+
+        product = product_from_bulk(next(group_records(_records('bulk_products.jsonl'))))
+
+        assert product['id'] == 1234567890
+        assert product['status'] == 'active'
+        assert product['variants'][0]['id'] == 9876543210
+        assert product['variants'][0]['barcode'] == '8412345678901'
+
+
+@pytest.mark.integration
+class TestBulkImport:
+    """Tests del flujo completo con fixtures grabados"""
+
+    @responses.activate
+    def test_import_products_bulk(self, shop):
+        """Importa el catálogo desde el JSONL de la operación masiva"""
+        from shopify_app.models import Product, ProductVariant
+        from shopify_app.services.bulk_operations import import_products_bulk
+
+        _register_bulk_flow(shop, 'bulk_products.jsonl')
+
+        success, result = import_products_bulk(shop, poll_interval=0)
+
+        assert success is True
+        assert result['products'] == 2
+        assert result['variants'] == 3
+        assert Product.objects.get(shopify_id=1234567891).status == 'draft'
+        assert ProductVariant.objects.get(shopify_id=9876543212).barcode == ''
+        assert ProductVariant.objects.filter(product__shopify_id=1234567890).count() == 2
+
+    @responses.activate
+    def test_import_orders_bulk_with_since(self, shop):
+        """Importa pedidos con líneas y filtra por updated_at"""
+        from datetime import datetime, timezone
+        from shopify_app.models import Order
+        from shopify_app.services.bulk_operations import import_orders_bulk
+
+        _register_bulk_flow(shop, 'bulk_orders.jsonl', statuses=('COMPLETED',))
+
+        success, result = import_orders_bulk(
+            shop, since=datetime(2024, 1, 1, tzinfo=timezone.utc), poll_interval=0
+        )
+
+        assert success is True
+        assert result['count'] == 2
+        run_request = json.loads(responses.calls[0].request.body)
+        assert "updated_at:>='2024-01-01T00:00:00+00:00'" in run_request['variables']['query']
+        order = Order.objects.get(shopify_id=4444444445)
+        assert order.financial_status == 'partially_refunded'
+        assert order.fulfillment_status == 'fulfilled'
+        line = order.lines.get()
+        assert line.discount_amount == Decimal('2.00')
+        assert line.variant_title == ''
+
+    def test_backfill_does_not_enqueue_orders(self, shop):
+        """Un backfill no deja pedidos en la cola de envío ni toca los ya encolados"""
+        from shopify_app.models import Order
+        from shopify_app.services.bulk_operations import load_orders
+        from shopify_app.services.order_dispatcher import pending_orders
+
+        load_orders(shop, _records('bulk_orders.jsonl'))
+        queued = Order.objects.get(shopify_id=4444444445)
+        queued.status = 'RECEIVED'
+        queued.save()
+
+        load_orders(shop, _records('bulk_orders.jsonl'))
+
+        assert list(Order.objects.exclude(pk=queued.pk).values_list('status', flat=True)) == ['IMPORTED']
+        assert list(pending_orders()) == [queued]
+
+    @responses.activate
+    def test_failed_operation_reports_error(self, shop):
+        """Una operación FAILED devuelve error sin tocar la BD"""
+        from shopify_app.models import Product
+        from shopify_app.services.bulk_operations import import_products_bulk
+
+        _register_bulk_flow(shop, 'bulk_products.jsonl', statuses=('FAILED',))
+
+        success, result = import_products_bulk(shop, poll_interval=0)
+
+        assert success is False
+        assert 'FAILED' in result['error']
+        assert Product.objects.count() == 0
+
+    @responses.activate
+    def test_truncated_download_reports_error(self, shop):
+        """Un JSONL cortado a mitad de línea se informa como error, sin excepción"""
+        from shopify_app.services.bulk_operations import import_products_bulk
+
+        _register_bulk_flow(shop, 'bulk_products.jsonl')
+        body = _read_fixture('bulk_products.jsonl')
+        responses.replace(responses.GET, RESULT_URL, body=body[:len(body) - 10])
+
+        success, result = import_products_bulk(shop, poll_interval=0)
+
+        assert success is False
+        assert 'interrumpida' in result['error']
+
+    @responses.activate
+    def test_download_connection_error_reports_error(self, shop):
+        """Un fallo de red al descargar el JSONL se informa como error"""
+        import requests
+        from shopify_app.services.bulk_operations import import_orders_bulk
+
+        _register_bulk_flow(shop, 'bulk_orders.jsonl')
+        responses.replace(responses.GET, RESULT_URL, body=requests.exceptions.ConnectionError('reset'))
+
+        success, result = import_orders_bulk(shop, poll_interval=0)
+
+        assert success is False
+        assert 'reset' in result['error']
+
+    @responses.activate
+    def test_import_is_idempotent(self, shop):
+        """Reimportar el mismo fichero no genera cambios"""
+        from shopify_app.services.bulk_operations import load_products
+
+        load_products(shop, _records('bulk_products.jsonl'))
+        result = load_products(shop, _records('bulk_products.jsonl'))
+
+        assert result['detalle']['productos'] == {'insertados': 0, 'actualizados': 0, 'sin_cambios': 2}
+        assert result['detalle']['variantes']['sin_cambios'] == 3
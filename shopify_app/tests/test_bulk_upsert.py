@@ -0,0 +1,106 @@
+"""
+Tests para el motor de upsert masivo
+"""
+import pytest
+from decimal import Decimal
+
+
+def _product(i, title=None):
+    return {
+        'id': 1000 + i,
+        'title': title or f'Producto {i}',
+        'vendor': 'Vendor',
+        'product_type': 'Tipo',
+        'status': 'active',
+        'created_at': '2024-01-01T00:00:00Z',
+        'variants': [
+            {
+                'id': 5000 + i,
+                'title': 'Default',
+                'sku': f'SKU-{i}',
+                'barcode': f'84100000000{i}',
+                'price': '29.99',
+                'inventory_quantity': 10,
+            }
+        ],
+    }
+
+
+@pytest.mark.unit
+class TestBulkUpsert:
+    """Tests para bulk_upsert"""
+
+    def test_counts_inserted_updated_unchanged(self, shop):
+        """Clasifica filas en insertadas, actualizadas y sin cambios"""
+        from shopify_app.services.shopify_ingest import upsert_products
+
+        first = upsert_products(shop, [_product(1), _product(2)])
+        second = upsert_products(shop, [_product(1), _product(2, title='Renombrado'), _product(3)])
+
+        assert first['productos'] == {'insertados': 2, 'actualizados': 0, 'sin_cambios': 0}
+        assert second['productos'] == {'insertados': 1, 'actualizados': 1, 'sin_cambios': 1}
+        assert second['variantes'] == {'insertados': 1, 'actualizados': 0, 'sin_cambios': 2}
+
+    def test_decimal_strings_compare_as_unchanged(self, shop):
+        """Un precio '29.99' no cuenta como cambio frente a Decimal('29.99')"""
+        from shopify_app.models import ProductVariant
+        from shopify_app.services.shopify_ingest import upsert_products
+
+        upsert_products(shop, [_product(1)])
+        stats = upsert_products(shop, [_product(1)])
+
+        assert stats['variantes']['sin_cambios'] == 1
+        assert ProductVariant.objects.get(shopify_id=5001).price == Decimal('29.99')
+
+    def test_one_read_and_one_write_per_chunk(self, shop, django_assert_num_queries):
+        """Cada chunk hace una lectura y un único upsert"""
+        from shopify_app.models import Product
+        from shopify_app.services.bulk_upsert import bulk_upsert
+        from shopify_app.services.shopify_ingest import PRODUCT_FIELDS, product_row
+
+        rows = [product_row(shop, _product(i)) for i in range(10)]
+
+        # 2 chunks x (SELECT + SAVEPOINT + INSERT ON CONFLICT + RELEASE)
+        with django_assert_num_queries(8):
+            stats = bulk_upsert(Product, rows, PRODUCT_FIELDS, chunk_size=5)
+
+        assert stats['insertados'] == 10
+        assert Product.objects.count() == 10
+
+    def test_composite_unique_fields(self, order):
+        """Las líneas se identifican por (pedido, shopify_id)"""
+        from shopify_app.models import OrderLine
+        from shopify_app.services.bulk_upsert import bulk_upsert
+        from shopify_app.services.shopify_ingest import LINE_FIELDS, line_row
+
+        item = {'id': 1, 'title': 'Línea', 'sku': 'A', 'quantity': 1, 'price': '5.00'}
+        bulk_upsert(OrderLine, [line_row(order.pk, item)], LINE_FIELDS, unique_fields=('order_id', 'shopify_id'))
+        stats = bulk_upsert(
+            OrderLine,
+            [line_row(order.pk, {**item, 'quantity': 3})],
+            LINE_FIELDS,
+            unique_fields=('order_id', 'shopify_id'),
+        )
+
+        assert stats['actualizados'] == 1
+        assert OrderLine.objects.get(order=order, shopify_id=1).quantity == 3
+
+    def test_customer_upsert_keeps_local_fields(self, shop, customer):
+        """El upsert de clientes no pisa NIF/empresa introducidos localmente"""
+        from shopify_app.services.shopify_ingest import upsert_customers
+
+        customer.nif = '12345678A'
+        customer.save()
+
+        upsert_customers(shop, [{
+            'id': customer.shopify_id,
+            'email': 'nuevo@example.com',
+            'first_name': customer.first_name,
+            'last_name': customer.last_name,
+            'phone': customer.phone,
+            'created_at': '2024-01-01T00:00:00Z',
+        }])
+
+        customer.refresh_from_db()
+        assert customer.email == 'nuevo@example.com'
+        assert customer.nif == '12345678A'
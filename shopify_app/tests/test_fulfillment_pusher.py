@@ -0,0 +1,275 @@
+"""
+Tests para los fulfillments hacia Shopify de los pedidos enviados según Verial
+"""
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+import responses
+
+GRAPHQL_URL = 'https://test-shop.myshopify.com/admin/api/2024-01/graphql.json'
+
+
+def _completed_orders(shop, count, start=5000):
+    from shopify_app.models import Order
+
+    return [
+        Order.objects.create(
+            shop=shop, shopify_id=start + n, name=f'#{start + n}', total_price=Decimal('10.00'),
+            financial_status='paid', created_at=datetime.now(timezone.utc),
+            status='COMPLETED', fulfillment_status='fulfilled', sent_to_verial=True,
+        )
+        for n in range(count)
+    ]
+
+
+class FakeShopify:
+    """Simula nodes(ids:) y fulfillmentCreateV2 con alias sobre un estado en memoria."""
+
+    def __init__(self, fulfillment_orders, rejected=()):
+        # {order gid: [{id, status}]}
+        self.fulfillment_orders = fulfillment_orders
+        self.rejected = set(rejected)
+        self.lookups = []
+        self.mutations = []
+
+    def __call__(self, request):
+        body = json.loads(request.body)
+        variables = body.get('variables') or {}
+        if body['query'].lstrip().startswith('query FulfillmentOrders'):
+            self.lookups.append(variables['ids'])
+            nodes = [
+                {'id': gid, 'fulfillmentOrders': {'nodes': self.fulfillment_orders[gid]}}
+                if gid in self.fulfillment_orders else None
+                for gid in variables['ids']
+            ]
+            return 200, {}, json.dumps({'data': {'nodes': nodes}})
+
+        self.mutations.append(len(variables))
+        data = {}
+        for alias, fulfillment in variables.items():
+            fo_id = fulfillment['lineItemsByFulfillmentOrder'][0]['fulfillmentOrderId']
+            if fo_id in self.rejected:
+                data[alias] = {'fulfillment': None, 'userErrors': [{'field': None, 'message': 'Sin stock asignado'}]}
+                continue
+            for fos in self.fulfillment_orders.values():
+                for fo in fos:
+                    if fo['id'] == fo_id:
+                        fo['status'] = 'CLOSED'
+            data[alias] = {'fulfillment': {'id': f'gid://shopify/Fulfillment/{fo_id.rsplit("/", 1)[1]}'}, 'userErrors': []}
+        return 200, {}, json.dumps({'data': data})
+
+
+def _fake(orders, per_order=1, status='OPEN', rejected=()):
+    fulfillment_orders = {
+        f'gid://shopify/Order/{o.shopify_id}': [
+            {'id': f'gid://shopify/FulfillmentOrder/{o.shopify_id}{k}', 'status': status} for k in range(per_order)
+        ]
+        for o in orders
+    }
+    fake = FakeShopify(fulfillment_orders, rejected)
+    responses.add_callback(responses.POST, GRAPHQL_URL, callback=fake)
+    return fake
+
+
+@pytest.mark.unit
+def test_fulfillment_mutation_uses_aliases():
+    """La mutación agrupa un fulfillmentCreateV2 por alias"""
+    from shopify_app.services.fulfillment_pusher import fulfillment_mutation
+
+    mutation = fulfillment_mutation(3)
+
+    assert mutation.startswith('mutation FulfillmentCreate($f0: FulfillmentV2Input!, $f1: FulfillmentV2Input!')
+    assert mutation.count('fulfillmentCreateV2(') == 3
+    assert 'f2: fulfillmentCreateV2(fulfillment: $f2)' in mutation
+
+
+@pytest.mark.integration
+class TestPushFulfillments:
+    """Tests del pipeline contra Shopify simulado"""
+
+    @responses.activate
+    def test_batches_lookups_and_mutations(self, shop, settings):
+        """Los pedidos se consultan y se preparan por lotes, no uno a uno"""
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import push_fulfillments
+
+        settings.SHOPIFY_FULFILLMENT_BATCH_SIZE = 10
+        orders = _completed_orders(shop, 60)
+        fake = _fake(orders)
+
+        result = push_fulfillments(workers=3)
+
+        assert sorted(len(ids) for ids in fake.lookups) == [10, 50]
+        assert sorted(fake.mutations) == [10] * 6
+        assert result['creados'] == 60
+        assert result['mutaciones'] == 6
+        assert Order.objects.filter(shopify_fulfilled_at__isnull=True).count() == 0
+        order = Order.objects.get(shopify_id=5000)
+        assert order.shopify_fulfillment_id == 'gid://shopify/Fulfillment/50000'
+
+    @responses.activate
+    def test_rerun_never_duplicates(self, shop):
+        """Un pedido ya marcado no se vuelve a enviar"""
+        from shopify_app.services.fulfillment_pusher import push_fulfillments
+
+        fake = _fake(_completed_orders(shop, 3))
+
+        push_fulfillments()
+        result = push_fulfillments()
+
+        assert sum(fake.mutations) == 3
+        assert result['pedidos'] == 0
+
+    @responses.activate
+    def test_closed_fulfillment_orders_are_only_marked(self, shop):
+        """Si Shopify ya lo tiene preparado (ejecución cortada) se marca sin crear otro"""
+        from shopify_app.services.fulfillment_pusher import push_fulfillments
+
+        orders = _completed_orders(shop, 2)
+        fake = _fake(orders, status='CLOSED')
+
+        result = push_fulfillments()
+
+        assert fake.mutations == []
+        assert result['ya_cerrados'] == 2
+
+    @responses.activate
+    def test_on_hold_fulfillment_order_stays_pending(self, shop):
+        """Un pedido retenido en Shopify (ON_HOLD) no se marca y se vuelve a mirar"""
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import pending_fulfillments, push_fulfillments
+
+        order, = _completed_orders(shop, 1)
+        fake = _fake([order], status='ON_HOLD')
+
+        result = push_fulfillments()
+
+        assert fake.mutations == []
+        assert result['ya_cerrados'] == 0
+        assert result['en_espera'] == 1
+        assert result['errores'] == 0
+        order.refresh_from_db()
+        assert order.shopify_fulfilled_at is None
+        assert order.shopify_fulfillment_attempts == 0
+        assert list(pending_fulfillments()) == [order]
+
+        # Liberado en Shopify: la siguiente ejecución crea el fulfillment
+        fake.fulfillment_orders[f'gid://shopify/Order/{order.shopify_id}'][0]['status'] = 'OPEN'
+        result = push_fulfillments()
+
+        assert result['creados'] == 1
+        assert Order.objects.get(pk=order.pk).shopify_fulfilled_at is not None
+
+    @responses.activate
+    def test_open_and_on_hold_fulfillment_orders(self, shop):
+        """Se crea el fulfillment de lo abierto, pero el pedido no se marca mientras quede algo retenido"""
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import push_fulfillments
+
+        order, = _completed_orders(shop, 1)
+        fake = _fake([order], per_order=2)
+        fake.fulfillment_orders[f'gid://shopify/Order/{order.shopify_id}'][1]['status'] = 'ON_HOLD'
+
+        result = push_fulfillments()
+
+        assert sum(fake.mutations) == 1
+        assert result['creados'] == 0
+        assert result['en_espera'] == 1
+        assert Order.objects.get(pk=order.pk).shopify_fulfilled_at is None
+
+    @responses.activate
+    def test_order_is_marked_only_when_every_fulfillment_order_succeeds(self, shop):
+        """Con varios fulfillment orders, uno rechazado deja el pedido pendiente"""
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import push_fulfillments
+
+        ok, partial = _completed_orders(shop, 2)
+        fake = _fake([ok, partial], per_order=2, rejected={f'gid://shopify/FulfillmentOrder/{partial.shopify_id}1'})
+
+        result = push_fulfillments()
+
+        assert result['creados'] == 1
+        assert result['errores'] == 1
+        assert result['errores_detalle'] == [{'pedido': partial.name, 'mensaje': 'Sin stock asignado'}]
+        assert Order.objects.get(pk=partial.pk).shopify_fulfilled_at is None
+
+        # Al reintentar solo se crea el fulfillment order que quedó abierto
+        fake.rejected.clear()
+        fake.mutations.clear()
+        result = push_fulfillments()
+
+        assert sum(fake.mutations) == 1
+        assert result['creados'] == 1
+
+    @responses.activate
+    def test_status_sync_pushes_newly_completed_orders(self, shop, settings):
+        """sync_order_status lleva a Shopify los pedidos que pasan a enviados"""
+        from erp_connector.verial_client import VerialClient
+        from shopify_app.models import OrderMapping
+        from shopify_app.order_status_sync import sync_order_status
+
+        settings.SHOPIFY_PUSH_FULFILLMENTS = True
+        order, = _completed_orders(shop, 1)
+        order.status = 'SENT'
+        order.save()
+        OrderMapping.objects.create(order=order, verial_id=77, verial_referencia='REF-77')
+        responses.add(responses.POST, f'{VerialClient().base_url}/EstadoPedidosWS', json={
+            'InfoError': {'Codigo': 0, 'Descripcion': None}, 'Pedidos': [{'Id': 77, 'Estado': 4}],
+        })
+        _fake([order])
+
+        success, result = sync_order_status()
+
+        assert success is True
+        assert result['completados'] == 1
+        assert result['fulfillments']['creados'] == 1
+
+    @responses.activate
+    def test_orders_outside_horizon_are_ignored(self, shop, settings):
+        """El histórico COMPLETED anterior al horizonte no se consulta"""
+        from datetime import timedelta
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import pending_fulfillments
+
+        settings.ORDER_STATUS_SYNC_HORIZON_DAYS = 90
+        recent, old = _completed_orders(shop, 2)
+        Order.objects.filter(pk=old.pk).update(created_at=datetime.now(timezone.utc) - timedelta(days=91))
+
+        assert [o.pk for o in pending_fulfillments()] == [recent.pk]
+
+    @responses.activate
+    def test_failing_order_stops_after_max_attempts(self, shop, settings):
+        """Un pedido que Shopify rechaza siempre deja de reintentarse"""
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import pending_fulfillments, push_fulfillments
+
+        settings.SHOPIFY_FULFILLMENT_MAX_ATTEMPTS = 2
+        order, = _completed_orders(shop, 1)
+        fake = _fake([order], rejected={f'gid://shopify/FulfillmentOrder/{order.shopify_id}0'})
+
+        first = push_fulfillments()
+        second = push_fulfillments()
+        third = push_fulfillments()
+
+        assert (first['errores'], first['agotados']) == (1, 0)
+        assert (second['errores'], second['agotados']) == (1, 1)
+        assert third['pedidos'] == 0
+        assert sum(fake.mutations) == 2
+        assert Order.objects.get(pk=order.pk).shopify_fulfillment_attempts == 2
+        assert not pending_fulfillments().exists()
+
+    @responses.activate
+    def test_order_missing_in_shopify_counts_attempt(self, shop):
+        """Un pedido que Shopify no encuentra también consume un intento"""
+        from shopify_app.models import Order
+        from shopify_app.services.fulfillment_pusher import push_fulfillments
+
+        order, = _completed_orders(shop, 1)
+        _fake([])
+
+        result = push_fulfillments()
+
+        assert result['errores'] == 1
+        assert Order.objects.get(pk=order.pk).shopify_fulfillment_attempts == 1
@@ -0,0 +1,115 @@
+"""
+Tests para el índice local de inventory items de Shopify
+"""
+import json
+import pytest
+import responses
+
+
+def _graphql_page(nodes, has_next=False, cursor=None):
+    return {
+        'data': {
+            'inventoryItems': {
+                'nodes': nodes,
+                'pageInfo': {'hasNextPage': has_next, 'endCursor': cursor},
+            }
+        }
+    }
+
+
+def _node(i, updated_at='2024-01-01T00:00:00Z', barcode=None):
+    return {
+        'id': f'gid://shopify/InventoryItem/{i}',
+        'sku': f'SKU-{i}',
+        'updatedAt': updated_at,
+        'variant': {'legacyResourceId': str(9000 + i), 'barcode': barcode or f'84100000000{i}'},
+    }
+
+
+@pytest.mark.integration
+class TestRefreshInventoryIndex:
+    """Tests para la construcción y refresco del índice"""
+
+    @responses.activate
+    def test_full_build_follows_pagination(self, shop):
+        """La construcción completa recorre todas las páginas"""
+        from shopify_app.models import ShopifyInventoryItem, SyncWatermark
+        from shopify_app.inventory_index import refresh_inventory_index, WATERMARK_RESOURCE
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_graphql_page([_node(1)], has_next=True, cursor='c1'))
+        responses.add(responses.POST, url, json=_graphql_page([_node(2, '2024-02-01T00:00:00Z')]))
+
+        success, result = refresh_inventory_index(shop, full=True)
+
+        assert success is True
+        assert result['actualizados'] == 2
+        assert ShopifyInventoryItem.objects.count() == 2
+        second_request = json.loads(responses.calls[1].request.body)
+        assert second_request['variables']['cursor'] == 'c1'
+        watermark = SyncWatermark.get_value(shop, WATERMARK_RESOURCE)
+        assert watermark.isoformat().startswith('2024-02-01')
+
+    @responses.activate
+    def test_incremental_refresh_uses_watermark(self, shop):
+        """El refresco incremental filtra por updated_at y actualiza filas existentes"""
+        from shopify_app.models import ShopifyInventoryItem
+        from shopify_app.inventory_index import refresh_inventory_index
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_graphql_page([_node(1)]))
+        refresh_inventory_index(shop, full=True)
+
+        responses.add(
+            responses.POST, url,
+            json=_graphql_page([_node(1, '2024-03-01T00:00:00Z', barcode='8410000000999')]),
+        )
+        success, result = refresh_inventory_index(shop)
+
+        assert success is True
+        request = json.loads(responses.calls[1].request.body)
+        assert request['variables']['query'].startswith("updated_at:>='2024-01-01")
+        assert ShopifyInventoryItem.objects.get(inventory_item_id=_node(1)['id']).barcode == '8410000000999'
+
+    @responses.activate
+    def test_full_build_removes_deleted_items(self, shop):
+        """La reconstrucción completa elimina items que ya no existen"""
+        from shopify_app.models import ShopifyInventoryItem
+        from shopify_app.inventory_index import refresh_inventory_index
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_graphql_page([_node(1), _node(2)]))
+        refresh_inventory_index(shop, full=True)
+
+        responses.add(responses.POST, url, json=_graphql_page([_node(2)]))
+        success, result = refresh_inventory_index(shop, full=True)
+
+        assert result['eliminados'] == 1
+        assert list(ShopifyInventoryItem.objects.values_list('inventory_item_id', flat=True)) == [_node(2)['id']]
+
+    @responses.activate
+    def test_get_indexed_items_without_network(self, shop):
+        """Con el índice construido la resolución no hace llamadas a Shopify"""
+        from shopify_app.inventory_index import get_indexed_inventory_items
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_graphql_page([_node(1)]))
+
+        first = get_indexed_inventory_items(shop)
+        second = get_indexed_inventory_items(shop)
+
+        assert first == second == [(_node(1)['id'], 'SKU-1', '841000000001')]
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_null_data_with_errors_fails_cleanly(self, shop):
+        """Una respuesta con data null y errores se informa como error, sin excepciones"""
+        from shopify_app.inventory_index import refresh_inventory_index
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json={'data': None, 'errors': [{'message': 'Internal error'}]})
+
+        success, result = refresh_inventory_index(shop)
+
+        assert success is False
+        assert 'Internal error' in result['error']
@@ -0,0 +1,143 @@
+"""
+Tests para los leases en BD de los jobs de sync_runner
+"""
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+
+@pytest.mark.unit
+class TestLease:
+    """Tests de adquisición, latido y liberación"""
+
+    def test_only_one_node_holds_the_lease(self):
+        """Mientras un nodo tiene el lease, otro no puede tomarlo"""
+        from shopify_app.services.job_lease import Lease
+
+        first = Lease('sync_stock', owner='nodo-a')
+        second = Lease('sync_stock', owner='nodo-b')
+
+        assert first.acquire() is True
+        assert second.acquire() is False
+
+        first.release()
+        assert second.acquire() is True
+
+    def test_expired_lease_is_taken_over(self):
+        """Si el nodo deja de latir, otro toma el lease al caducar"""
+        from shopify_app.models import JobLease
+        from shopify_app.services.job_lease import Lease
+
+        first = Lease('sync_stock', owner='nodo-a')
+        second = Lease('sync_stock', owner='nodo-b')
+        first.acquire()
+        JobLease.objects.filter(name='sync_stock').update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        assert second.acquire() is True
+        assert first.heartbeat() is False
+        assert first.lost is True
+        assert JobLease.objects.get(name='sync_stock').owner == 'nodo-b'
+
+    def test_heartbeat_extends_expiry(self, settings):
+        """Cada latido aleja la caducidad"""
+        from shopify_app.models import JobLease
+        from shopify_app.services.job_lease import Lease
+
+        settings.JOB_LEASE_TTL = 60
+        lease = Lease('sync_orders', owner='nodo-a')
+        lease.acquire()
+        JobLease.objects.filter(name='sync_orders').update(expires_at=timezone.now() + timedelta(seconds=5))
+
+        assert lease.heartbeat() is True
+
+        expires_at = JobLease.objects.get(name='sync_orders').expires_at
+        assert expires_at > timezone.now() + timedelta(seconds=50)
+
+    def test_min_interval_coalesces_runs_across_nodes(self, settings):
+        """Un job recién ejecutado por otro nodo no se repite en el mismo intervalo"""
+        from shopify_app.models import JobLease
+        from shopify_app.services.job_lease import Lease
+
+        settings.JOB_LEASE_SLACK = 10
+        first = Lease('sync_stock', owner='nodo-a')
+        first.acquire(min_interval=120)
+        first.release()
+
+        assert Lease('sync_stock', owner='nodo-b').acquire(min_interval=120) is False
+
+        JobLease.objects.filter(name='sync_stock').update(acquired_at=timezone.now() - timedelta(seconds=115))
+        assert Lease('sync_stock', owner='nodo-b').acquire(min_interval=120) is True
+        assert JobLease.objects.get(name='sync_stock').runs == 2
+
+
+@pytest.mark.unit
+class TestRunExclusive:
+    """Tests del envoltorio usado por sync_runner"""
+
+    def test_job_runs_and_releases(self):
+        """El job se ejecuta con el lease y al terminar queda libre"""
+        from shopify_app.models import JobLease
+        from shopify_app.services.job_lease import run_exclusive
+
+        calls = []
+
+        assert run_exclusive('sync_products', lambda: calls.append(1)) is True
+
+        lease = JobLease.objects.get(name='sync_products')
+        assert calls == [1]
+        assert lease.owner == ''
+        assert lease.last_finished_at is not None
+
+    def test_job_is_skipped_when_other_node_holds_it(self):
+        """Si otro nodo tiene el lease el job no se ejecuta"""
+        from shopify_app.services.job_lease import Lease, run_exclusive
+
+        Lease('sync_products', owner='otro-nodo').acquire()
+        calls = []
+
+        assert run_exclusive('sync_products', lambda: calls.append(1)) is False
+        assert calls == []
+
+    def test_lease_is_released_when_job_fails(self):
+        """Una excepción en el job no deja el lease tomado"""
+        from shopify_app.models import JobLease
+        from shopify_app.services.job_lease import run_exclusive
+
+        def boom():
+            raise RuntimeError('fallo')
+
+        with pytest.raises(RuntimeError):
+            run_exclusive('sync_orders', boom)
+
+        assert JobLease.objects.get(name='sync_orders').owner == ''
+
+    def test_wait_runs_once_the_lease_is_released(self):
+        """Con wait se espera a que el otro job suelte el lease en lugar de omitirse"""
+        from unittest.mock import patch
+        from shopify_app.services.job_lease import Lease, run_exclusive
+
+        delta = Lease('sync_stock', owner='otro-nodo')
+        delta.acquire()
+        calls = []
+
+        with patch('shopify_app.services.job_lease.time.sleep', side_effect=lambda _: delta.release()) as sleep:
+            assert run_exclusive('sync_stock', lambda: calls.append(1), wait=60) is True
+
+        sleep.assert_called_once()
+        assert calls == [1]
+
+    def test_wait_gives_up_after_timeout(self):
+        """Si el lease no se libera dentro de wait el job se omite"""
+        from unittest.mock import patch
+        from shopify_app.services.job_lease import Lease, run_exclusive
+
+        Lease('sync_stock', owner='otro-nodo').acquire()
+        calls = []
+
+        with patch('shopify_app.services.job_lease.time.monotonic', side_effect=[0.0, 3.0, 6.0]), \
+                patch('shopify_app.services.job_lease.time.sleep') as sleep:
+            assert run_exclusive('sync_stock', lambda: calls.append(1), wait=5) is False
+
+        assert [c.args[0] for c in sleep.call_args_list] == [2.0]
+        assert calls == []
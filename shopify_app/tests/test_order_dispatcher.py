@@ -0,0 +1,141 @@
+"""
+Tests para el envío concurrente de pedidos a Verial
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.utils import timezone
+
+
+def _orders(shop, count):
+    from shopify_app.models import Order
+    return [
+        Order.objects.create(
+            shop=shop, shopify_id=7000 + i, name=f'#70{i}', total_price=Decimal('10.00'),
+            financial_status='paid', created_at=timezone.now(),
+        )
+        for i in range(count)
+    ]
+
+
+def _fake_send(fail_names=()):
+    def send(order):
+        if order.name in fail_names:
+            return False, "Producto sin mapear en Shopify: X"
+        order.sent_to_verial = True
+        order.save(update_fields=['sent_to_verial'])
+        return True, "Pedido inyectado correctamente"
+    return send
+
+
+@pytest.mark.integration
+class TestDispatchPendingOrders:
+    """Tests para el dispatcher"""
+
+    def test_sends_all_pending_and_summarizes(self, shop):
+        """Envía todos los pendientes y devuelve el resumen de rendimiento"""
+        from shopify_app.models import Order
+        from shopify_app.services.order_dispatcher import dispatch_pending_orders
+
+        _orders(shop, 3)
+        with patch('shopify_app.services.verial_sender.send_order_to_verial', side_effect=_fake_send(('#701',))):
+            summary = dispatch_pending_orders(workers=1)
+
+        assert summary['total'] == 3
+        assert summary['enviados'] == 2
+        assert summary['errores'] == 1
+        assert summary['pedidos_por_segundo'] > 0
+        assert Order.objects.filter(status='SENT', sent_to_verial=True).count() == 2
+        failed = Order.objects.get(name='#701')
+        assert failed.status == 'RECEIVED'
+        assert failed.verial_attempts == 1
+        assert failed.verial_retry_at > timezone.now()
+        assert 'sin mapear' in failed.verial_error
+
+    def test_failed_order_is_retried_after_backoff_until_max_attempts(self, shop, settings):
+        """Un fallo se reintenta pasada la espera y solo pasa a ERROR al agotar los intentos"""
+        from shopify_app.models import Order
+        from shopify_app.services.order_dispatcher import dispatch_pending_orders
+
+        settings.VERIAL_DISPATCH_MAX_ATTEMPTS = 2
+        order, = _orders(shop, 1)
+        with patch('shopify_app.services.verial_sender.send_order_to_verial', side_effect=_fake_send(('#700',))):
+            dispatch_pending_orders(workers=1)
+            # Dentro de la espera no se vuelve a intentar
+            assert dispatch_pending_orders(workers=1)['total'] == 0
+
+            Order.objects.filter(pk=order.pk).update(verial_retry_at=timezone.now())
+            summary = dispatch_pending_orders(workers=1)
+
+        order.refresh_from_db()
+        assert summary['total'] == 1
+        assert order.verial_attempts == 2
+        assert order.status == 'ERROR'
+
+    def test_send_runs_outside_the_claim_transaction(self, shop):
+        """El pedido se reserva en una transacción ya confirmada antes de llamar a Verial"""
+        from django.db import connection
+        from shopify_app.services.order_dispatcher import dispatch_pending_orders
+
+        _orders(shop, 1)
+        depth = []
+
+        def send(order):
+            depth.append(len(connection.savepoint_ids))
+            return True, "Pedido inyectado correctamente"
+
+        with patch('shopify_app.services.verial_sender.send_order_to_verial', side_effect=send):
+            dispatch_pending_orders(workers=1)
+
+        # Con pytest-django todo corre en una transacción del test: fuera del
+        # atomic() del reclamo no queda ningún savepoint abierto
+        assert depth == [0]
+
+    def test_limit_caps_the_run(self, shop):
+        """--limit corta la ejecución tras N pedidos"""
+        from shopify_app.services.order_dispatcher import dispatch_pending_orders, pending_orders
+
+        _orders(shop, 3)
+        with patch('shopify_app.services.verial_sender.send_order_to_verial', side_effect=_fake_send()):
+            summary = dispatch_pending_orders(workers=1, limit=2)
+
+        assert summary['total'] == 2
+        assert pending_orders().count() == 1
+
+    def test_unexpected_error_does_not_loop(self, shop):
+        """Una excepción no deja el pedido en bucle dentro de la misma ejecución"""
+        from shopify_app.services.order_dispatcher import dispatch_pending_orders
+
+        _orders(shop, 1)
+        with patch('shopify_app.services.order_dispatcher.send_order', side_effect=RuntimeError('boom')) as send:
+            summary = dispatch_pending_orders(workers=1)
+
+        assert send.call_count == 1
+        assert summary['errores'] == 1
+        assert summary['resultados'][0]['mensaje'] == 'boom'
+
+    def test_claim_uses_skip_locked(self, shop):
+        """El pedido se reclama con SELECT ... FOR UPDATE SKIP LOCKED"""
+        from shopify_app.services.order_dispatcher import dispatch_pending_orders
+
+        _orders(shop, 1)
+        with patch('django.db.models.query.QuerySet.select_for_update', autospec=True,
+                   side_effect=lambda self, **kwargs: self) as select_for_update, \
+                patch('shopify_app.services.verial_sender.send_order_to_verial', side_effect=_fake_send()):
+            dispatch_pending_orders(workers=1)
+
+        assert select_for_update.call_args.kwargs == {'skip_locked': True}
+
+    def test_command_prints_throughput(self, shop):
+        """El comando muestra el resumen final"""
+        from io import StringIO
+        from django.core.management import call_command
+
+        _orders(shop, 2)
+        out = StringIO()
+        with patch('shopify_app.services.verial_sender.send_order_to_verial', side_effect=_fake_send()):
+            call_command('send_orders_to_verial', '--workers', '1', stdout=out)
+
+        assert '2 enviados' in out.getvalue()
+        assert 'pedidos/s' in out.getvalue()
@@ -0,0 +1,173 @@
+"""
+Tests para la sincronización de estados de pedido desde Verial
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+import responses
+
+INFO_OK = {'Codigo': 0, 'Descripcion': None}
+
+
+def _status_url():
+    from erp_connector.verial_client import VerialClient
+    return f'{VerialClient().base_url}/EstadoPedidosWS'
+
+
+def _estados_callback(estados, calls):
+    """Responde a EstadoPedidosWS con el estado de cada Id pedido."""
+    def callback(request):
+        ids = [p['Id'] for p in json.loads(request.body)['Pedidos']]
+        calls.append(ids)
+        pedidos = [{'Id': i, 'Estado': estados[i]} for i in ids if i in estados]
+        return 200, {}, json.dumps({'InfoError': INFO_OK, 'Pedidos': pedidos})
+    return callback
+
+
+def _sent_orders(shop, count, start=1000):
+    from shopify_app.models import Order, OrderMapping
+
+    orders = []
+    for n in range(count):
+        order = Order.objects.create(
+            shop=shop, shopify_id=start + n, name=f'#{start + n}', total_price=Decimal('10.00'),
+            financial_status='paid', created_at=datetime.now(timezone.utc),
+            status='SENT', sent_to_verial=True,
+        )
+        OrderMapping.objects.create(order=order, verial_id=start + n, verial_referencia=f'REF-{n}')
+        orders.append(order)
+    return orders
+
+
+@pytest.mark.unit
+class TestApplyVerialStatus:
+    """Tests del mapeo estado Verial -> pedido"""
+
+    @pytest.mark.parametrize('estado,status,fulfillment', [
+        (1, 'SENT', ''),
+        (2, 'IN_PROGRESS', 'partial'),
+        (3, 'IN_PROGRESS', 'partial'),
+        (4, 'COMPLETED', 'fulfilled'),
+    ])
+    def test_estado_maps_to_status(self, order, estado, status, fulfillment):
+        """Cada estado de Verial se traduce al estado del pedido"""
+        from shopify_app.order_status_sync import apply_verial_status
+
+        order.status = 'SENT'
+
+        assert apply_verial_status(order, estado) is True
+        assert (order.verial_status, order.status, order.fulfillment_status) == (str(estado), status, fulfillment)
+
+    def test_same_estado_is_not_a_change(self, order):
+        """Repetir el mismo estado no cuenta como cambio"""
+        from shopify_app.order_status_sync import apply_verial_status
+
+        apply_verial_status(order, 2)
+
+        assert apply_verial_status(order, 2) is False
+
+
+@pytest.mark.unit
+class TestLiveOrders:
+    """Tests del horizonte de sincronización"""
+
+    def test_terminal_and_stale_orders_are_skipped(self, shop, settings):
+        """Completados, cancelados/reembolsados y pedidos fuera del horizonte no se consultan"""
+        from shopify_app.order_status_sync import live_orders
+
+        settings.ORDER_STATUS_SYNC_HORIZON_DAYS = 30
+        live, completed, refunded, voided, stale = _sent_orders(shop, 5)
+        completed.status = 'COMPLETED'
+        completed.save()
+        refunded.financial_status = 'refunded'
+        refunded.save()
+        voided.financial_status = 'voided'
+        voided.save()
+        stale.created_at = datetime.now(timezone.utc) - timedelta(days=31)
+        stale.save()
+
+        assert [o.pk for o in live_orders()] == [live.pk]
+        assert live_orders()[0].verial_mapping.verial_id == live.shopify_id
+
+
+@pytest.mark.integration
+class TestSyncOrderStatus:
+    """Tests del motor de sincronización contra Verial simulado"""
+
+    @responses.activate
+    def test_batches_of_25_and_bulk_update(self, shop, django_assert_max_num_queries):
+        """Se consulta por lotes de 25 IDs Verial y se guarda con un bulk_update por lote"""
+        from shopify_app.models import Order
+        from shopify_app.order_status_sync import sync_order_status
+
+        orders = _sent_orders(shop, 60)
+        estados = {o.shopify_id: (4 if n % 3 == 0 else 2) for n, o in enumerate(orders)}
+        calls = []
+        responses.add_callback(responses.POST, _status_url(), callback=_estados_callback(estados, calls))
+
+        # 1 consulta de pedidos + 3 lotes x (bulk_update en su transacción)
+        with django_assert_max_num_queries(1 + 3 * 3):
+            success, result = sync_order_status(workers=3)
+
+        assert success is True
+        assert sorted(len(ids) for ids in calls) == [10, 25, 25]
+        assert result['consultados'] == 60
+        assert result['lotes'] == 3
+        assert result['actualizados'] == 60
+        assert result['completados'] == 20
+        assert Order.objects.filter(status='COMPLETED', fulfillment_status='fulfilled').count() == 20
+        assert Order.objects.filter(status='IN_PROGRESS', verial_status='2').count() == 40
+
+    @responses.activate
+    def test_completed_and_unsent_orders_are_not_queried(self, shop, order):
+        """Los pedidos completados o sin enviar no se consultan"""
+        from shopify_app.order_status_sync import sync_order_status
+
+        done, pending = _sent_orders(shop, 2)
+        done.status = 'COMPLETED'
+        done.save()
+        calls = []
+        responses.add_callback(responses.POST, _status_url(),
+                               callback=_estados_callback({pending.shopify_id: 1}, calls))
+
+        success, result = sync_order_status()
+
+        assert success is True
+        assert calls == [[pending.shopify_id]]
+        assert result['actualizados'] == 1
+
+    @responses.activate
+    def test_failed_batch_does_not_stop_the_rest(self, shop):
+        """Un lote con error se cuenta y el resto se aplica"""
+        from shopify_app.order_status_sync import sync_order_status
+
+        orders = _sent_orders(shop, 30)
+        first_batch = {o.shopify_id for o in orders[:25]}
+        estados = {o.shopify_id: 4 for o in orders}
+        ok_callback = _estados_callback(estados, [])
+
+        def callback(request):
+            ids = {p['Id'] for p in json.loads(request.body)['Pedidos']}
+            if ids == first_batch:
+                return 200, {}, json.dumps({'InfoError': {'Codigo': 5, 'Descripcion': 'Sesión caducada'}})
+            return ok_callback(request)
+
+        responses.add_callback(responses.POST, _status_url(), callback=callback)
+
+        success, result = sync_order_status()
+
+        assert success is True
+        assert result['lotes_fallidos'] == 1
+        assert result['errores'] == ['Sesión caducada']
+        assert result['actualizados'] == 5
+
+    def test_no_pending_orders(self, order):
+        """Sin pedidos enviados no se llama a Verial"""
+        from shopify_app.order_status_sync import sync_order_status
+
+        success, result = sync_order_status()
+
+        assert success is True
+        assert result['actualizados'] == 0
@@ -0,0 +1,155 @@
+"""
+Tests para la sincronización incremental de pedidos
+"""
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import responses
+
+
+def _order(order_id, updated_at, name=None, financial_status='paid', created_at='2024-01-01T00:00:00Z',
+           cancelled_at=None):
+    return {
+        'id': order_id, 'name': name or f'#{order_id}', 'email': 'c@example.com',
+        'total_price': '10.00', 'financial_status': financial_status,
+        'fulfillment_status': None, 'created_at': created_at, 'cancelled_at': cancelled_at,
+        'updated_at': updated_at, 'line_items': [],
+    }
+
+
+def _orders_url(shop):
+    return f'https://{shop.shop}/admin/api/2024-01/orders.json'
+
+
+@pytest.mark.integration
+class TestSyncOrdersIncremental:
+    """Tests para la marca de agua y la paginación de pedidos"""
+
+    @responses.activate
+    def test_follows_pagination_and_stores_watermark(self, shop):
+        """Recorre todas las páginas y guarda el mayor updated_at"""
+        from shopify_app.models import Order, SyncWatermark
+        from shopify_app.services.order_sync import sync_orders_incremental
+
+        base = _orders_url(shop)
+        responses.add(
+            responses.GET, base,
+            json={'orders': [_order(1, '2024-03-01T10:00:00Z')]},
+            headers={'Link': f'<{base}?limit=250&page_info=p2>; rel="next"'},
+        )
+        responses.add(
+            responses.GET, f'{base}?limit=250&page_info=p2',
+            json={'orders': [_order(2, '2024-03-02T08:00:00Z')]},
+        )
+
+        success, result = sync_orders_incremental(shop, full=True)
+
+        assert success is True
+        assert result['count'] == 2
+        assert Order.objects.count() == 2
+        assert SyncWatermark.get_value(shop, 'orders').isoformat() == '2024-03-02T08:00:00+00:00'
+        assert 'updated_at_min' not in parse_qs(urlparse(responses.calls[0].request.url).query)
+
+    @responses.activate
+    def test_first_run_starts_at_newest_local_order(self, shop, order):
+        """Sin marca de agua no se recorre el histórico: se empieza en el pedido local más reciente"""
+        from shopify_app.models import SyncWatermark
+        from shopify_app.services.order_sync import sync_orders_incremental
+
+        responses.add(responses.GET, _orders_url(shop), json={'orders': []})
+
+        sync_orders_incremental(shop)
+
+        params = parse_qs(urlparse(responses.calls[0].request.url).query)
+        assert params['updated_at_min'] == [order.created_at.isoformat()]
+        assert SyncWatermark.get_value(shop, 'orders') == order.created_at
+
+    @responses.activate
+    def test_only_recent_open_orders_are_enqueued(self, shop, settings):
+        """Los pedidos antiguos o cancelados entran como IMPORTED y no se envían"""
+        from datetime import datetime, timedelta, timezone
+        from shopify_app.models import Order
+        from shopify_app.services.order_dispatcher import pending_orders
+        from shopify_app.services.order_sync import sync_orders_incremental
+
+        settings.ORDER_SYNC_ENQUEUE_DAYS = 7
+        recent = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+        responses.add(responses.GET, _orders_url(shop), json={'orders': [
+            _order(1, recent, created_at=recent),
+            _order(2, recent, created_at=recent, cancelled_at=recent),
+            _order(3, recent),
+        ]})
+
+        success, result = sync_orders_incremental(shop, full=True)
+
+        assert success is True
+        assert result['detalle']['pedidos']['insertados'] == 3
+        assert dict(Order.objects.values_list('shopify_id', 'status')) == {1: 'RECEIVED', 2: 'IMPORTED', 3: 'IMPORTED'}
+        assert [o.shopify_id for o in pending_orders()] == [1]
+
+    @responses.activate
+    def test_second_run_requests_only_changes(self, shop):
+        """La segunda ejecución filtra por updated_at_min"""
+        from shopify_app.services.order_sync import sync_orders_incremental
+
+        responses.add(responses.GET, _orders_url(shop), json={'orders': [_order(1, '2024-03-01T10:00:00Z')]})
+        sync_orders_incremental(shop, full=True)
+        sync_orders_incremental(shop)
+
+        params = parse_qs(urlparse(responses.calls[1].request.url).query)
+        assert params['updated_at_min'] == ['2024-03-01T10:00:00+00:00']
+        assert params['status'] == ['any']
+
+    @responses.activate
+    def test_full_ignores_watermark(self, shop):
+        """full=True vuelve a pedir todos los pedidos"""
+        from shopify_app.models import SyncWatermark
+        from shopify_app.services.order_sync import sync_orders_incremental
+        from django.utils.dateparse import parse_datetime
+
+        SyncWatermark.set_value(shop, 'orders', parse_datetime('2024-03-01T10:00:00Z'))
+        responses.add(responses.GET, _orders_url(shop), json={'orders': []})
+
+        sync_orders_incremental(shop, full=True)
+
+        assert 'updated_at_min' not in responses.calls[0].request.url
+
+    @responses.activate
+    def test_sent_order_keeps_send_state(self, shop, order, order_mapping):
+        """Un pedido ya enviado se actualiza sin volver a RECEIVED"""
+        from shopify_app.models import Order
+        from shopify_app.services.order_sync import sync_orders_incremental
+
+        Order.objects.filter(pk=order.pk).update(status='SENT', sent_to_verial=True)
+        responses.add(
+            responses.GET, _orders_url(shop),
+            json={'orders': [_order(order.shopify_id, '2024-03-01T10:00:00Z', name=order.name, financial_status='refunded')]},
+        )
+
+        success, _ = sync_orders_incremental(shop)
+
+        order.refresh_from_db()
+        assert success is True
+        assert order.financial_status == 'refunded'
+        assert order.status == 'SENT'
+        assert order.sent_to_verial is True
+
+    @responses.activate
+    def test_error_does_not_advance_watermark(self, shop):
+        """Un error de Shopify no mueve la marca de agua"""
+        from shopify_app.models import SyncWatermark
+        from shopify_app.services.order_sync import sync_orders_incremental
+
+        base = _orders_url(shop)
+        responses.add(
+            responses.GET, base,
+            json={'orders': [_order(1, '2024-03-01T10:00:00Z')]},
+            headers={'Link': f'<{base}?page_info=p2>; rel="next"'},
+        )
+        responses.add(responses.GET, f'{base}?page_info=p2', json={}, status=502)
+
+        success, result = sync_orders_incremental(shop, full=True)
+
+        assert success is False
+        assert result['status'] == 502
+        assert SyncWatermark.get_value(shop, 'orders') is None
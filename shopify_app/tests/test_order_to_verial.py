@@ -380,4 +380,60 @@ class TestOrderLineMapping:
         
         assert len(payload['Contenido']) == 2
         assert payload['Contenido'][0]['ID_Articulo'] == 1001
-        assert payload['Contenido'][1]['ID_Articulo'] == 1002
\ No newline at end of file
+        assert payload['Contenido'][1]['ID_Articulo'] == 1002
+
+@pytest.mark.integration
+class TestResolveLineMappings:
+    """Tests para la resolución de mapeos por lotes"""
+
+    def _order_with_lines(self, order, product, count):
+        from shopify_app.models import OrderLine, ProductMapping, ProductVariant
+
+        for i in range(count):
+            variant = ProductVariant.objects.create(
+                product=product, shopify_id=500 + i, title=f'V{i}', sku=f'B-{i}',
+                barcode=f'99{i}', price=Decimal('1.00'),
+            )
+            ProductMapping.objects.create(variant=variant, verial_id=9000 + i, verial_barcode=f'99{i}')
+            OrderLine.objects.create(
+                order=order, shopify_id=600 + i, product_title=product.title, variant_title=f'V{i}',
+                sku=f'B-{i}', quantity=1, price=Decimal('1.00'),
+            )
+        return order
+
+    def test_query_count_does_not_grow_with_lines(self, order, product):
+        """Resolver 1 o 20 líneas cuesta las mismas consultas"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from shopify_app.order_to_verial import build_order_payload
+
+        self._order_with_lines(order, product, 20)
+
+        with CaptureQueriesContext(connection) as queries:
+            payload = build_order_payload(order, id_cliente=1)
+
+        assert len(payload['Contenido']) == 20
+        assert {l['ID_Articulo'] for l in payload['Contenido']} == {9000 + i for i in range(20)}
+        # líneas del pedido + variantes por SKU con su mapeo
+        assert len(queries) == 2
+
+    def test_resolves_lines_of_several_orders(self, order, product, shop):
+        """Un único resolver sirve para las líneas de varios pedidos"""
+        from shopify_app.models import Order, OrderLine
+        from shopify_app.order_to_verial import resolve_line_mappings
+
+        self._order_with_lines(order, product, 2)
+        other = Order.objects.create(
+            shop=shop, shopify_id=42, name='#42', total_price=Decimal('1.00'),
+            financial_status='paid', created_at=timezone.now(),
+        )
+        OrderLine.objects.create(
+            order=other, shopify_id=700, product_title=product.title, variant_title='V1',
+            sku='', quantity=1, price=Decimal('1.00'),
+        )
+
+        lines = OrderLine.objects.filter(order__in=[order, other])
+        mappings = resolve_line_mappings(lines)
+
+        assert len(mappings) == 3
+        assert mappings[OrderLine.objects.get(shopify_id=700).pk].verial_id == 9001
@@ -0,0 +1,133 @@
+"""
+Tests para el mapeo incremental de productos por código de barras
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+
+def _catalog(*pairs):
+    return {barcode: {'id': verial_id, 'nombre': '', 'barcode': barcode} for barcode, verial_id in pairs}
+
+
+def _variant(product, i, barcode):
+    from shopify_app.models import ProductVariant
+    return ProductVariant.objects.create(
+        product=product, shopify_id=900 + i, title=f'V{i}', sku=f'M-{i}', barcode=barcode, price=Decimal('1.00'),
+    )
+
+
+@pytest.mark.integration
+class TestAutoMapIncremental:
+    """Tests del diff contra el catálogo"""
+
+    @pytest.fixture
+    def scenario(self, product):
+        from shopify_app.models import ProductMapping
+
+        same = _variant(product, 1, '111')
+        changed = _variant(product, 2, '222')
+        stale = _variant(product, 3, '333')
+        new = _variant(product, 4, '444')
+        manual = _variant(product, 5, '')
+        ProductMapping.objects.create(variant=same, verial_id=1, verial_barcode='111')
+        ProductMapping.objects.create(variant=changed, verial_id=2, verial_barcode='222')
+        ProductMapping.objects.create(variant=stale, verial_id=3, verial_barcode='333')
+        ProductMapping.objects.create(variant=manual, verial_id=5, verial_barcode='')
+        catalog = _catalog(('111', 1), ('222', 20), ('444', 4))
+        return {'same': same, 'changed': changed, 'stale': stale, 'new': new, 'manual': manual, 'catalog': catalog}
+
+    def test_writes_only_the_diff(self, scenario):
+        """Inserta, actualiza y borra solo lo necesario"""
+        from shopify_app.models import ProductMapping
+        from shopify_app.product_mapping import auto_map_products_by_barcode
+
+        untouched_sync = ProductMapping.objects.get(variant=scenario['same']).last_sync
+
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, scenario['catalog'])):
+            success, stats = auto_map_products_by_barcode()
+
+        assert success is True
+        assert (stats['nuevos'], stats['actualizados'], stats['eliminados'], stats['sin_cambios']) == (1, 1, 1, 1)
+        assert ProductMapping.objects.get(variant=scenario['changed']).verial_id == 20
+        assert ProductMapping.objects.get(variant=scenario['new']).verial_id == 4
+        assert not ProductMapping.objects.filter(variant=scenario['stale']).exists()
+        assert ProductMapping.objects.filter(variant=scenario['manual']).exists()
+        assert ProductMapping.objects.get(variant=scenario['same']).last_sync == untouched_sync
+
+    def test_constant_number_of_queries(self, scenario):
+        """Las escrituras son masivas: el nº de consultas no depende del catálogo"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from shopify_app.product_mapping import auto_map_products_by_barcode
+
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, scenario['catalog'])), \
+                CaptureQueriesContext(connection) as queries:
+            auto_map_products_by_barcode()
+
+        # 2 lecturas + insert + update + delete (+ savepoint/transacción)
+        writes = [q for q in queries if not q['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        assert len(writes) == 3
+
+    def test_second_run_is_a_no_op(self, scenario):
+        """Sin cambios en Verial no se escribe nada"""
+        from shopify_app.product_mapping import auto_map_products_by_barcode
+
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, scenario['catalog'])):
+            auto_map_products_by_barcode()
+            success, stats = auto_map_products_by_barcode()
+
+        assert (stats['nuevos'], stats['actualizados'], stats['eliminados']) == (0, 0, 0)
+        assert stats['sin_cambios'] == 3
+
+    def test_dry_run_reports_diff_without_writing(self, scenario):
+        """El dry-run devuelve el diff y no modifica la BD"""
+        from io import StringIO
+        from django.core.management import call_command
+        from shopify_app.models import ProductMapping
+
+        before = set(ProductMapping.objects.values_list('variant_id', 'verial_id'))
+        out = StringIO()
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, scenario['catalog'])):
+            call_command('map_products', '--dry-run', stdout=out)
+
+        assert set(ProductMapping.objects.values_list('variant_id', 'verial_id')) == before
+        output = out.getvalue()
+        assert '+ M-4 (444) -> 4' in output
+        assert '~ M-2 (222) 2 -> 20' in output
+        assert '- M-3 (333) -> 3' in output
+        assert '[dry-run]' in output
+
+    def test_empty_catalog_deletes_nothing(self, scenario):
+        """Un catálogo vacío (fallo del ERP) se informa como error y no borra mapeos"""
+        from shopify_app.models import ProductMapping
+        from shopify_app.product_mapping import auto_map_products_by_barcode
+
+        before = ProductMapping.objects.count()
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, {})):
+            success, stats = auto_map_products_by_barcode()
+
+        assert success is False
+        assert 'vacío' in stats['error']
+        assert ProductMapping.objects.count() == before
+
+    def test_mass_delete_is_blocked(self, scenario, settings):
+        """Si el catálogo parece truncado no se borra, pero sí se aplican altas y cambios"""
+        from shopify_app.models import ProductMapping
+        from shopify_app.product_mapping import auto_map_products_by_barcode
+
+        settings.PRODUCT_MAPPING_DELETE_MIN = 0
+        settings.PRODUCT_MAPPING_MAX_DELETE_RATIO = 0.5
+        truncated = _catalog(('444', 4))
+
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, truncated)):
+            success, stats = auto_map_products_by_barcode()
+
+        assert success is False
+        assert 'bloqueado' in stats['error']
+        assert stats['borrados_bloqueados'] == 3
+        assert stats['eliminados'] == 0
+        assert ProductMapping.objects.filter(variant=scenario['stale']).exists()
+        assert ProductMapping.objects.filter(variant=scenario['same']).exists()
+        assert ProductMapping.objects.get(variant=scenario['new']).verial_id == 4
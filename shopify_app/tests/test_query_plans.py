@@ -0,0 +1,172 @@
+"""
+Regresión de planes de consulta y nº de queries en los caminos calientes
+
+Cada test ejecuta el camino real sobre un volumen de datos sembrado, captura
+sus consultas con CaptureQueriesContext y pide a SQLite el plan de cada una
+(EXPLAIN QUERY PLAN). Si alguien quita un índice o cambia un filtro de forma
+que ya no lo usa, aparece un "SCAN <tabla>" y el test falla; si una consulta
+pasa a repetirse por fila (N+1), el recuento deja de ser constante.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+ORDERS = 3000
+VARIANTS = 2000
+CUSTOMERS = 2000
+
+# "SCAN tabla" a secas es un recorrido completo; con USING [COVERING] INDEX no lo es
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def selects(captured):
+    return [q['sql'] for q in captured if q['sql'].lstrip().upper().startswith('SELECT')]
+
+
+def full_scans(captured, *tables):
+    """[(tabla, sql)] de las consultas capturadas que recorren entera alguna de `tables`."""
+    scanned = []
+    for sql in selects(captured):
+        for line in query_plan(sql):
+            match = FULL_SCAN.match(line)
+            if match and match.group(1) in tables:
+                scanned.append((match.group(1), sql))
+    return scanned
+
+
+@pytest.fixture
+def large_dataset(shop):
+    """Catálogo, clientes y pedidos con volumen suficiente para que el planificador elija índices."""
+    from shopify_app.models import Customer, Order, Product, ProductMapping, ProductVariant
+
+    now = datetime.now(timezone.utc)
+    products = Product.objects.bulk_create([
+        Product(shop=shop, shopify_id=10_000 + p, title=f'Producto {p}', status='active', created_at=now)
+        for p in range(VARIANTS // 20)
+    ])
+    variants = ProductVariant.objects.bulk_create([
+        ProductVariant(
+            product=products[n // 20], shopify_id=20_000 + n, title=f'Variante {n}',
+            sku=f'SKU-{n:05d}', barcode=f'84{n:011d}', price=Decimal('9.95'),
+        )
+        for n in range(VARIANTS)
+    ])
+    ProductMapping.objects.bulk_create([
+        ProductMapping(variant=v, verial_id=30_000 + n, verial_barcode=v.barcode) for n, v in enumerate(variants)
+    ])
+    Customer.objects.bulk_create([
+        Customer(shop=shop, shopify_id=40_000 + n, email=f'cliente{n}@example.com', created_at=now)
+        for n in range(CUSTOMERS)
+    ])
+    Order.objects.bulk_create([
+        Order(
+            shop=shop, shopify_id=50_000 + n, name=f'#{n}', email=f'cliente{n % CUSTOMERS}@example.com',
+            total_price=Decimal('25.00'), financial_status='paid',
+            created_at=now - timedelta(days=n % 400), received_at=now - timedelta(days=n % 400),
+            status='RECEIVED' if n % 50 == 0 else 'COMPLETED', sent_to_verial=n % 50 != 0,
+        )
+        for n in range(ORDERS)
+    ])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return variants
+
+
+@pytest.mark.integration
+class TestHotPathQueryPlans:
+    """Cada camino caliente usa su índice y un nº de consultas que no crece con los datos"""
+
+    def test_line_mappings_resolve_by_sku_index(self, order, large_dataset):
+        """Las líneas se resuelven por SKU con variant_sku y en una consulta, sean 5 o 50"""
+        from shopify_app.models import OrderLine
+        from shopify_app.order_to_verial import resolve_line_mappings
+
+        lines = OrderLine.objects.bulk_create([
+            OrderLine(order=order, shopify_id=n, product_title='Producto', sku=v.sku, quantity=1, price=Decimal('9.95'))
+            for n, v in enumerate(large_dataset[:50])
+        ])
+
+        with CaptureQueriesContext(connection) as few:
+            resolve_line_mappings(lines[:5])
+        with CaptureQueriesContext(connection) as many:
+            mappings = resolve_line_mappings(lines)
+
+        assert all(mappings.values())
+        assert len(many) == len(few) == 1
+        assert full_scans(many, 'shopify_app_productvariant') == []
+        assert any('variant_sku' in line for line in query_plan(selects(many)[0]))
+
+    def test_mapping_job_reads_variants_from_covering_index(self, large_dataset):
+        """El mapeo por barcode recorre el índice variant_barcode, no la tabla"""
+        from shopify_app.product_mapping import auto_map_products_by_barcode
+
+        catalog = {v.barcode: {'id': 30_000 + n, 'barcode': v.barcode} for n, v in enumerate(large_dataset)}
+
+        with patch('shopify_app.product_mapping.get_verial_products_by_barcode', return_value=(True, catalog)):
+            with CaptureQueriesContext(connection) as captured:
+                success, stats = auto_map_products_by_barcode(dry_run=True)
+
+        assert success is True
+        assert stats['sin_cambios'] == VARIANTS
+        assert len(captured) == 2
+        assert full_scans(captured, 'shopify_app_productvariant') == []
+
+    def test_customer_lookup_uses_shop_email_index(self, shop, large_dataset):
+        """ensure_customer_in_verial busca el cliente por (shop, email) con índice"""
+        from shopify_app.models import Order
+        from shopify_app.services.customer_sync import ensure_customer_in_verial
+
+        order = Order.objects.get(shopify_id=50_000 + 1234)
+
+        with patch('shopify_app.services.customer_sync.get_or_create_verial_customer', return_value=(True, 1)):
+            with CaptureQueriesContext(connection) as captured:
+                ensure_customer_in_verial(order)
+
+        assert full_scans(captured, 'shopify_app_customer') == []
+        customer_queries = [sql for sql in selects(captured) if 'shopify_app_customer' in sql]
+        assert any('customer_shop_email' in line for line in query_plan(customer_queries[0]))
+
+    def test_send_queue_uses_index_and_needs_no_sort(self, large_dataset):
+        """La cola de envío a Verial sale ordenada del índice order_send_queue"""
+        from shopify_app.services.order_dispatcher import pending_orders
+
+        with CaptureQueriesContext(connection) as captured:
+            first = pending_orders().first()
+
+        assert first is not None
+        plan = query_plan(selects(captured)[0])
+        assert any('order_send_queue' in line for line in plan)
+        assert not any('TEMP B-TREE' in line for line in plan)
+
+    def test_dashboard_date_windows_use_created_index(self, api_client, large_dataset):
+        """Las ventanas de fechas del dashboard filtran por rango con order_created"""
+        with CaptureQueriesContext(connection) as captured:
+            response = api_client.get('/shopify/dashboard/')
+
+        assert response.status_code == 200
+        windows = [sql for sql in selects(captured) if '"created_at" >=' in sql]
+        assert len(windows) == 4
+        assert full_scans([{'sql': sql} for sql in windows], 'shopify_app_order') == []
+        # Totales, 3 ventanas, estados, recientes y pedidos por día (+ sesión/usuario)
+        assert len(captured) <= 12
+
+    def test_status_sync_selects_from_live_partial_index(self, large_dataset):
+        """La selección de pedidos vivos usa el índice parcial order_live_created"""
+        from shopify_app.order_status_sync import live_orders
+
+        with CaptureQueriesContext(connection) as captured:
+            list(live_orders())
+
+        plan = query_plan(selects(captured)[0])
+        assert any('order_live_created' in line for line in plan)
@@ -0,0 +1,141 @@
+"""
+Tests para el cliente GraphQL instrumentado de Shopify
+"""
+from unittest.mock import patch
+
+import pytest
+import responses
+
+
+def _cost(requested=10, actual=10, available=990, restore=50.0):
+    return {'cost': {
+        'requestedQueryCost': requested,
+        'actualQueryCost': actual,
+        'throttleStatus': {'maximumAvailable': 1000.0, 'currentlyAvailable': available, 'restoreRate': restore},
+    }}
+
+
+def _throttled(requested=100, available=20, restore=50.0):
+    return {
+        'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+        'extensions': _cost(requested, None, available, restore),
+    }
+
+
+@pytest.mark.unit
+class TestHelpers:
+    """Tests de las funciones auxiliares"""
+
+    def test_operation_name(self):
+        """El nombre de la operación se extrae de la consulta"""
+        from shopify_app.services.shopify_graphql import operation_name
+
+        assert operation_name('\n    mutation InventorySet($input: X!) { a }') == 'InventorySet'
+        assert operation_name('query Locations { locations { id } }') == 'Locations'
+        assert operation_name('query { shop { name } }') == 'anonima'
+
+    def test_throttle_wait_uses_restore_rate(self):
+        """La espera es lo que falta para cubrir el coste dividido entre restoreRate"""
+        from shopify_app.services.shopify_graphql import throttle_wait
+
+        assert throttle_wait(_throttled(requested=100, available=20, restore=50)) == pytest.approx(1.6)
+        assert throttle_wait(_throttled(requested=10, available=500)) == pytest.approx(0.1)
+
+    def test_throttle_wait_backs_off_without_cost_block(self):
+        """Sin extensions.cost no hay estimación: se espera un mínimo que dobla en cada reintento"""
+        from shopify_app.services.shopify_graphql import throttle_wait
+
+        data = {'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}]}
+
+        assert [throttle_wait(data, retry) for retry in (1, 2, 3)] == [1.0, 2.0, 4.0]
+
+
+@pytest.mark.integration
+class TestExecute:
+    """Tests de execute contra la API simulada"""
+
+    @responses.activate
+    def test_records_cost_and_run_summary(self, shop):
+        """Cada consulta suma coste, throttleStatus y latencia al resumen de la ejecución"""
+        from shopify_app.services import shopify_graphql
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json={'data': {}, 'extensions': _cost(12, 8, available=900)})
+        responses.add(responses.POST, url, json={'data': {}, 'extensions': _cost(12, 6, available=850)})
+        before = shopify_graphql.ACTUAL_COST.value(operation='Locations')
+
+        with shopify_graphql.track_run('test') as run:
+            for _ in range(2):
+                assert shopify_graphql.execute(shop, 'query Locations { locations { id } }') is not None
+
+        summary = run.summary()
+        assert summary['consultas'] == 2
+        assert summary['coste_solicitado'] == 24
+        assert summary['coste_real'] == 14
+        assert summary['disponible_min'] == 850
+        assert summary['reintentos'] == 0
+        assert shopify_graphql.ACTUAL_COST.value(operation='Locations') - before == 14
+        assert shopify_graphql.AVAILABLE.value() == 850
+
+    @responses.activate
+    def test_throttled_is_retried_after_computed_wait(self, shop):
+        """Un THROTTLED se reintenta tras esperar (coste - disponible) / restoreRate"""
+        from shopify_app.services import shopify_graphql
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_throttled(requested=100, available=20, restore=50))
+        responses.add(responses.POST, url, json={'data': {'ok': True}, 'extensions': _cost(100, 90)})
+
+        with shopify_graphql.track_run('test') as run, \
+                patch('shopify_app.services.shopify_graphql.time.sleep') as sleep:
+            data = shopify_graphql.execute(shop, 'query Big { a }')
+
+        assert data['data'] == {'ok': True}
+        sleep.assert_called_once()
+        assert sleep.call_args[0][0] == pytest.approx(1.6)
+        assert run.summary()['reintentos'] == 1
+        assert run.summary()['throttled'] == 0
+
+    @responses.activate
+    def test_gives_up_after_max_retries(self, shop, settings):
+        """Agotados los reintentos se devuelve la respuesta THROTTLED sin perderla"""
+        from shopify_app.services import shopify_graphql
+
+        settings.SHOPIFY_THROTTLE_MAX_RETRIES = 2
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_throttled())
+
+        with shopify_graphql.track_run('test') as run, \
+                patch('shopify_app.services.shopify_graphql.time.sleep') as sleep:
+            data = shopify_graphql.execute(shop, 'query Big { a }')
+
+        assert shopify_graphql.is_throttled(data)
+        assert sleep.call_count == 2
+        assert len(responses.calls) == 3
+        assert run.summary()['throttled'] == 1
+
+    @responses.activate
+    def test_http_error_returns_none(self, shop):
+        """Una respuesta no 200 devuelve None y cuenta como error"""
+        from shopify_app.services import shopify_graphql
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, status=500)
+
+        with shopify_graphql.track_run('test') as run:
+            assert shopify_graphql.execute(shop, 'query { a }') is None
+
+        assert run.summary()['errores'] == 1
+
+    @responses.activate
+    def test_non_json_body_returns_none(self, shop):
+        """Un 200 con cuerpo no JSON (página de error de un proxy) devuelve None y cuenta como error"""
+        from shopify_app.services import shopify_graphql
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, body='<html>Bad gateway</html>', status=200, content_type='text/html')
+
+        with shopify_graphql.track_run('test') as run:
+            assert shopify_graphql.execute(shop, 'query { a }') is None
+
+        assert run.summary()['errores'] == 1
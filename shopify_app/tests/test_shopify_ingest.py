@@ -0,0 +1,123 @@
+"""
+Tests para el pipeline de ingesta en streaming desde Shopify
+"""
+import threading
+import time
+
+import pytest
+import responses
+
+
+@pytest.mark.unit
+class TestPrefetch:
+    """Tests para la lectura con una página de adelanto"""
+
+    def test_prefetch_yields_all_items_in_order(self):
+        """prefetch no altera el orden ni pierde elementos"""
+        from shopify_app.services.shopify_ingest import prefetch
+
+        assert list(prefetch(iter([[1], [2], [3]]))) == [[1], [2], [3]]
+
+    def test_prefetch_overlaps_fetch_and_processing(self):
+        """La siguiente página se pide mientras se procesa la actual"""
+        from shopify_app.services.shopify_ingest import prefetch
+
+        requested = []
+
+        def pages():
+            for i in range(3):
+                requested.append(i)
+                yield [i]
+
+        consumer = prefetch(pages())
+        first = next(consumer)
+        deadline = time.monotonic() + 2
+        while len(requested) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert first == [0]
+        assert requested == [0, 1]
+        assert list(consumer) == [[1], [2]]
+
+    def test_prefetch_propagates_errors(self):
+        """Un error de descarga se propaga al consumidor"""
+        from shopify_app.services.shopify_ingest import prefetch, ShopifyFetchError
+
+        def pages():
+            yield [1]
+            raise ShopifyFetchError(500)
+
+        consumer = prefetch(pages())
+        assert next(consumer) == [1]
+        with pytest.raises(ShopifyFetchError):
+            next(consumer)
+
+    def test_prefetch_runs_fetch_off_the_main_thread(self):
+        """La descarga se ejecuta en el hilo de prefetch"""
+        from shopify_app.services.shopify_ingest import prefetch
+
+        threads = []
+
+        def pages():
+            threads.append(threading.current_thread().name)
+            yield [1]
+
+        list(prefetch(pages()))
+
+        assert threads[0].startswith('shopify-prefetch')
+
+
+@pytest.mark.integration
+class TestIngestProducts:
+    """Tests para la ingesta paginada de productos"""
+
+    @responses.activate
+    def test_sync_products_follows_link_pagination(self, api_client, shop):
+        """Cada página se escribe y se sigue la cabecera Link"""
+        from shopify_app.models import Product, ProductVariant
+
+        base = f'https://{shop.shop}/admin/api/2024-01/products.json'
+
+        def product(i):
+            return {
+                'id': 100 + i, 'title': f'P{i}', 'vendor': '', 'product_type': '',
+                'status': 'active', 'created_at': '2024-01-01T00:00:00Z',
+                'variants': [{'id': 200 + i, 'title': 'Default', 'sku': f'S{i}', 'barcode': '', 'price': '1.00'}],
+            }
+
+        responses.add(
+            responses.GET, f'{base}?limit=250',
+            json={'products': [product(1)]},
+            headers={'Link': f'<{base}?limit=250&page_info=abc>; rel="next"'},
+        )
+        responses.add(
+            responses.GET, f'{base}?limit=250&page_info=abc',
+            json={'products': [product(2)]},
+            headers={'Link': f'<{base}?limit=250>; rel="previous"'},
+        )
+
+        response = api_client.get('/shopify/sync-products/')
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data['products'] == 2
+        assert data['variants'] == 2
+        assert data['detalle']['productos']['insertados'] == 2
+        assert Product.objects.count() == 2
+        assert ProductVariant.objects.count() == 2
+
+    @responses.activate
+    def test_sync_customers_error_mid_stream(self, api_client, shop):
+        """Un error de Shopify en una página devuelve 500"""
+        base = f'https://{shop.shop}/admin/api/2024-01/customers.json'
+        responses.add(
+            responses.GET, f'{base}?limit=250',
+            json={'customers': [{'id': 1, 'created_at': '2024-01-01T00:00:00Z'}]},
+            headers={'Link': f'<{base}?limit=250&page_info=x>; rel="next"'},
+        )
+        responses.add(responses.GET, f'{base}?limit=250&page_info=x', json={}, status=401)
+
+        response = api_client.get('/shopify/sync-customers/')
+
+        assert response.status_code == 500
+        assert response.json()['status'] == 401
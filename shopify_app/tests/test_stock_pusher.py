@@ -0,0 +1,199 @@
+"""
+Tests para el envío concurrente de stock con control de throttling
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+import responses
+
+
+def _quantities(n):
+    return [
+        {'inventoryItemId': f'gid://shopify/InventoryItem/{i}', 'locationId': 'gid://shopify/Location/1', 'quantity': i}
+        for i in range(n)
+    ]
+
+
+def _throttle(available, restore=50.0):
+    return {'maximumAvailable': 1000.0, 'currentlyAvailable': available, 'restoreRate': restore}
+
+
+def _ok(user_errors=(), available=990):
+    return {
+        'data': {'inventorySetQuantities': {'userErrors': list(user_errors)}},
+        'extensions': {'cost': {'requestedQueryCost': 10, 'actualQueryCost': 10, 'throttleStatus': _throttle(available)}},
+    }
+
+
+def _throttled(available=2):
+    return {
+        'errors': [{'message': 'Throttled', 'extensions': {'code': 'THROTTLED'}}],
+        'extensions': {'cost': {'requestedQueryCost': 10, 'throttleStatus': _throttle(available)}},
+    }
+
+
+@pytest.mark.unit
+class TestThrottleBucket:
+    """Tests para la estimación del leaky bucket"""
+
+    def test_acquire_waits_for_restore(self):
+        """Sin puntos suficientes espera (coste - disponible) / restoreRate"""
+        from shopify_app.services.stock_pusher import ThrottleBucket
+
+        bucket = ThrottleBucket()
+        bucket.observe(_throttle(available=0, restore=100))
+        with patch('shopify_app.services.stock_pusher.time.sleep') as sleep, \
+                patch('shopify_app.services.stock_pusher.time.monotonic', side_effect=[0.0, 0.5]):
+            bucket._updated = 0.0
+            bucket.acquire(50)
+
+        sleep.assert_called_once()
+        assert sleep.call_args[0][0] == pytest.approx(0.5)
+
+    def test_acquire_is_immediate_with_capacity(self):
+        """Con puntos de sobra no se espera"""
+        from shopify_app.services.stock_pusher import ThrottleBucket
+
+        bucket = ThrottleBucket()
+        with patch('shopify_app.services.stock_pusher.time.sleep') as sleep:
+            assert bucket.acquire(10) == 0
+        sleep.assert_not_called()
+
+
+@pytest.mark.integration
+class TestPushStock:
+    """Tests del envío completo contra la API GraphQL simulada"""
+
+    @responses.activate
+    def test_user_errors_are_reported_per_item(self, shop):
+        """Un userError solo marca como fallido su item"""
+        from shopify_app.services.stock_pusher import push_stock
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_ok([
+            {'field': ['input', 'quantities', '1', 'inventoryItemId'], 'message': 'Inventory item no existe'},
+        ]))
+        responses.add(responses.POST, url, json=_ok())
+        accepted, rejected = [], []
+
+        result = push_stock(shop, 'gid://shopify/Location/1', _quantities(3),
+                            on_accepted=accepted.extend, on_rejected=rejected.extend)
+
+        assert result['aceptados'] == 2
+        assert result['fallidos'] == result['rechazados'] == 1
+        assert result['errores_detalle'] == [
+            {'inventoryItemId': 'gid://shopify/InventoryItem/1', 'mensaje': 'Inventory item no existe', 'rechazado': True},
+        ]
+        assert [q['quantity'] for q in accepted] == [0, 2]
+        assert [q['inventoryItemId'] for q in rejected] == ['gid://shopify/InventoryItem/1']
+
+    @responses.activate
+    def test_rest_of_errored_chunk_is_resent(self, shop):
+        """Un chunk con userErrors puede no haberse aplicado: el resto se reenvía sin los rechazados"""
+        from shopify_app.services.stock_pusher import push_stock
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_ok([
+            {'field': ['input', 'quantities', '0', 'quantity'], 'message': 'Cantidad inválida'},
+        ]))
+        responses.add(responses.POST, url, json=_ok())
+        accepted = []
+
+        result = push_stock(shop, 'gid://shopify/Location/1', _quantities(4), on_accepted=accepted.extend)
+
+        resent = json.loads(responses.calls[1].request.body)['variables']['input']['quantities']
+        assert [q['quantity'] for q in resent] == [1, 2, 3]
+        assert result['reenviados'] == 3
+        assert result['aceptados'] == 3
+        assert result['rechazados'] == 1
+        assert [q['quantity'] for q in accepted] == [1, 2, 3]
+
+    @responses.activate
+    def test_errored_chunk_is_not_accepted_if_resend_fails(self, shop):
+        """Si el reenvío falla, ningún item del chunk se da por aceptado"""
+        from shopify_app.services.stock_pusher import push_stock
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_ok([
+            {'field': ['input', 'quantities', '0', 'quantity'], 'message': 'Cantidad inválida'},
+        ]))
+        responses.add(responses.POST, url, json={}, status=502)
+        accepted = []
+
+        result = push_stock(shop, 'gid://shopify/Location/1', _quantities(3), on_accepted=accepted.extend)
+
+        assert accepted == []
+        assert result['aceptados'] == 0
+        assert result['fallidos'] == 3
+        assert result['rechazados'] == 1
+
+    @responses.activate
+    def test_throttled_chunk_is_retried(self, shop):
+        """Un chunk THROTTLED espera la recuperación y se reintenta"""
+        from shopify_app.services.stock_pusher import push_stock
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_throttled(available=2))
+        responses.add(responses.POST, url, json=_ok())
+
+        with patch('shopify_app.services.shopify_graphql.time.sleep') as sleep:
+            result = push_stock(shop, 'gid://shopify/Location/1', _quantities(2))
+
+        assert result['aceptados'] == 2
+        assert result['reintentos'] == 1
+        # (10 - 2) / 50 = 0.16 s de espera antes del reintento
+        assert any(call.args[0] == pytest.approx(0.16, abs=0.01) for call in sleep.call_args_list)
+
+    @responses.activate
+    def test_chunks_are_sent_concurrently(self, shop, settings):
+        """Los chunks se reparten entre varios workers"""
+        import threading
+        from shopify_app.services.stock_pusher import push_stock
+
+        settings.SHOPIFY_STOCK_PUSH_WORKERS = 3
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        threads = set()
+
+        def callback(request):
+            threads.add(threading.current_thread().name)
+            items = json.loads(request.body)['variables']['input']['quantities']
+            assert len(items) <= 2
+            return 200, {}, json.dumps(_ok())
+
+        responses.add_callback(responses.POST, url, callback=callback)
+
+        result = push_stock(shop, 'gid://shopify/Location/1', _quantities(6), chunk_size=2)
+
+        assert result['chunks'] == 3
+        assert result['aceptados'] == 6
+        assert all(name.startswith('stock-push') for name in threads)
+
+    @responses.activate
+    def test_sync_stores_snapshot_only_for_accepted_items(self, shop):
+        """El snapshot registra la cantidad de los aceptados y NULL en los rechazados"""
+        from shopify_app.models import StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json=_ok([
+            {'field': ['input', 'quantities', '0', 'quantity'], 'message': 'Cantidad inválida'},
+        ]))
+        responses.add(responses.POST, url, json=_ok())
+        items = [(f'gid://shopify/InventoryItem/{i}', f'S{i}', f'84{i}') for i in range(2)]
+
+        with patch('shopify_app.stock_sync.get_shopify_location_id', return_value='gid://shopify/Location/1'), \
+                patch('shopify_app.stock_sync.get_verial_products_by_barcode', return_value=(True, {'840': 1, '841': 2})), \
+                patch('erp_connector.verial_client.VerialClient.iter_stock', return_value=(True, iter([
+                    {'IdArticulo': 1, 'Stock': 3}, {'IdArticulo': 2, 'Stock': 4},
+                ]))), \
+                patch('shopify_app.inventory_index.get_indexed_inventory_items', return_value=items):
+            success, result = sync_stock_verial_to_shopify()
+
+        assert result['actualizados'] == 1
+        assert result['errores'] == 1
+        assert result['errores_detalle'][0]['mensaje'] == 'Cantidad inválida'
+        assert result['rechazados'] == 1
+        assert dict(StockSnapshot.objects.values_list('inventory_item_id', 'quantity')) == {
+            'gid://shopify/InventoryItem/0': None, 'gid://shopify/InventoryItem/1': 4,
+        }
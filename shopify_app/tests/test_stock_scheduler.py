@@ -0,0 +1,148 @@
+"""
+Tests para el planificador adaptativo de stock
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+import responses
+
+MADRID = ZoneInfo('Europe/Madrid')
+BUSY = datetime(2026, 3, 10, 11, 0, tzinfo=MADRID)
+NIGHT = datetime(2026, 3, 10, 3, 0, tzinfo=MADRID)
+
+
+@pytest.fixture
+def scheduler_settings(settings):
+    settings.STOCK_BUSY_HOURS = '8-22'
+    settings.STOCK_INTERVAL_BUSY = 60
+    settings.STOCK_INTERVAL_IDLE = 300
+    settings.STOCK_INTERVAL_MAX = 900
+    return settings
+
+
+def _scheduler(signatures, sync_results=None):
+    from shopify_app.services.stock_scheduler import AdaptiveStockScheduler
+
+    signatures = iter(signatures)
+    sync_results = iter(sync_results or [])
+    calls = []
+
+    def sync():
+        calls.append(1)
+        return next(sync_results, True)
+
+    scheduler = AdaptiveStockScheduler(sync=sync, probe=lambda: next(signatures))
+    return scheduler, calls
+
+
+@pytest.mark.unit
+class TestAdaptiveStockScheduler:
+    """Tests de la sonda y del cálculo de intervalos"""
+
+    def test_sync_runs_only_when_signature_changes(self, scheduler_settings):
+        """Con la misma firma no se vuelve a cruzar ni enviar"""
+        scheduler, calls = _scheduler([(True, 'a'), (True, 'a'), (True, 'b'), (True, 'b')])
+
+        for _ in range(4):
+            scheduler.tick(now=BUSY)
+
+        assert len(calls) == 2
+        assert scheduler.stats == {'sondeos': 4, 'con_cambios': 2, 'sin_cambios': 2, 'errores': 0, 'ahorradas': 2}
+        assert scheduler.hit_ratio() == 0.5
+
+    def test_failed_sync_is_retried_on_next_probe(self, scheduler_settings):
+        """Si la sincronización tuvo errores la firma no se da por procesada"""
+        scheduler, calls = _scheduler([(True, 'a'), (True, 'a'), (True, 'a')], sync_results=[False, True])
+
+        for _ in range(3):
+            scheduler.tick(now=BUSY)
+
+        assert len(calls) == 2
+
+    @pytest.mark.parametrize('errores,rechazados,processed', [(0, 0, True), (2, 2, True), (3, 1, False)])
+    def test_only_transient_errors_keep_the_signature_pending(self, errores, rechazados, processed):
+        """Los items rechazados por Shopify no impiden dar la firma por procesada"""
+        from unittest.mock import patch
+        from shopify_app.services.stock_scheduler import _run_sync
+
+        result = {'actualizados': 5, 'errores': errores, 'rechazados': rechazados, 'modo': 'delta'}
+        with patch('shopify_app.stock_sync.sync_stock_verial_to_shopify', return_value=(True, result)):
+            assert _run_sync() is processed
+
+    def test_probe_error_skips_sync(self, scheduler_settings):
+        """Si la sonda no llega a Verial no se lanza la sincronización"""
+        scheduler, calls = _scheduler([(False, 'timeout')])
+
+        assert scheduler.tick(now=BUSY) == 60
+        assert calls == []
+        assert scheduler.stats['errores'] == 1
+
+    def test_interval_stretches_while_idle_and_resets_on_change(self, scheduler_settings):
+        """Cada sondeo sin cambios duplica el intervalo hasta el máximo"""
+        scheduler, _ = _scheduler([(True, 'a')] * 6 + [(True, 'b')])
+
+        delays = [scheduler.tick(now=BUSY) for _ in range(7)]
+
+        assert delays == [60, 120, 240, 480, 900, 900, 60]
+
+    def test_interval_is_longer_outside_busy_hours(self, scheduler_settings):
+        """Fuera de horas punta se parte del intervalo largo"""
+        from shopify_app.services.stock_scheduler import is_busy
+
+        scheduler, _ = _scheduler([(True, 'a')])
+
+        assert scheduler.tick(now=NIGHT) == 300
+        assert is_busy(BUSY) is True
+        assert is_busy(NIGHT) is False
+
+    def test_busy_hours_across_midnight(self, scheduler_settings):
+        """Una franja como 20-2 incluye la madrugada"""
+        from shopify_app.services.stock_scheduler import is_busy
+
+        scheduler_settings.STOCK_BUSY_HOURS = '20-2'
+
+        assert is_busy(datetime(2026, 3, 10, 1, 0, tzinfo=MADRID)) is True
+        assert is_busy(BUSY) is False
+
+
+@pytest.mark.integration
+class TestProbeSignature:
+    """Tests de la firma contra Verial simulado"""
+
+    @responses.activate
+    def test_signature_follows_stock_and_inventory(self, shop):
+        """La firma cambia si cambia el stock de Verial o el índice de inventario"""
+        from erp_connector.verial_client import VerialClient
+        from shopify_app.models import ShopifyInventoryItem
+        from shopify_app.services.stock_scheduler import probe_signature
+
+        url = f'{VerialClient().base_url}/GetStockArticulosWS'
+        body = {'InfoError': {'Codigo': 0, 'Descripcion': None}, 'StockArticulos': [{'ID_Articulo': 1, 'Stock': 5}]}
+        responses.add(responses.GET, url, json=body)
+        responses.add(responses.GET, url, json=body)
+        body_moved = {'InfoError': {'Codigo': 0, 'Descripcion': None}, 'StockArticulos': [{'ID_Articulo': 1, 'Stock': 4}]}
+        responses.add(responses.GET, url, json=body_moved)
+        responses.add(responses.GET, url, json=body_moved)
+
+        first = probe_signature()
+        assert probe_signature() == first
+
+        moved = probe_signature()
+        assert moved[0] is True and moved != first
+
+        ShopifyInventoryItem.objects.create(shop=shop, inventory_item_id='gid://shopify/InventoryItem/1')
+        assert probe_signature() != moved
+
+    @responses.activate
+    def test_http_error_is_reported(self):
+        """Un HTTP distinto de 200 hace fallar la sonda"""
+        from erp_connector.verial_client import VerialClient
+        from shopify_app.services.stock_scheduler import probe_signature
+
+        responses.add(responses.GET, f'{VerialClient().base_url}/GetStockArticulosWS', status=500)
+
+        success, error = probe_signature()
+
+        assert success is False
+        assert '500' in error
@@ -0,0 +1,328 @@
+"""
+Tests para sincronización de stock Verial -> Shopify
+"""
+import pytest
+import responses
+from unittest.mock import patch
+
+
+LOCATION_ID = 'gid://shopify/Location/1'
+
+
+def _inventory_items(n):
+    return [
+        (f'gid://shopify/InventoryItem/{i}', f'SKU-{i}', f'84100000000{i}')
+        for i in range(n)
+    ]
+
+
+def _verial_stock(stock, per_almacen=None):
+    """Respuesta en streaming de GetStockArticulosWS construida a partir de {IdArticulo: stock}"""
+    rows = []
+    for art_id, total in stock.items():
+        row = {'IdArticulo': art_id, 'Stock': total}
+        if per_almacen is not None:
+            row['StockAlmacenes'] = [
+                {'IdAlmacen': almacen, 'Stock': qty} for almacen, qty in per_almacen.get(art_id, {}).items()
+            ]
+        rows.append(row)
+    return True, iter(rows)
+
+
+@pytest.fixture
+def stock_sources():
+    """Parchea las fuentes externas (Shopify y Verial) de sync_stock"""
+    items = _inventory_items(3)
+    products = {f'84100000000{i}': 1000 + i for i in range(3)}
+    stock = {1000: 5, 1001: 10, 1002: 0}
+
+    with patch('shopify_app.stock_sync.get_shopify_location_id', return_value=LOCATION_ID), \
+         patch('shopify_app.stock_sync.get_verial_products_by_barcode', return_value=(True, products)), \
+         patch('erp_connector.verial_client.VerialClient.iter_stock', side_effect=lambda *a, **kw: _verial_stock(stock)) as mock_stock, \
+         patch('shopify_app.inventory_index.get_indexed_inventory_items', return_value=items), \
+         patch('shopify_app.stock_sync.update_stock_batch', return_value=(True, {'fallidos': {}, 'throttle': None})) as mock_update:
+        yield {'stock': stock, 'update': mock_update, 'verial': mock_stock}
+
+
+@pytest.mark.unit
+class TestStockDeltaSync:
+    """Tests para el envío incremental de stock"""
+
+    def test_first_run_pushes_everything(self, shop, stock_sources):
+        """Sin snapshot previo se envían todos los items"""
+        from shopify_app.models import StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        success, result = sync_stock_verial_to_shopify()
+
+        assert success is True
+        assert result['actualizados'] == 3
+        assert result['omitidos'] == 0
+        assert StockSnapshot.objects.count() == 3
+
+    def test_second_run_skips_unchanged(self, shop, stock_sources):
+        """Si nada cambia en Verial no se llama a Shopify"""
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        sync_stock_verial_to_shopify()
+        stock_sources['update'].reset_mock()
+
+        success, result = sync_stock_verial_to_shopify()
+
+        assert success is True
+        assert result['cambiados'] == 0
+        assert result['omitidos'] == 3
+        stock_sources['update'].assert_not_called()
+
+    def test_only_changed_items_are_pushed(self, shop, stock_sources):
+        """Solo se envían los items cuyo stock cambió"""
+        from shopify_app.models import StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        sync_stock_verial_to_shopify()
+        stock_sources['update'].reset_mock()
+        stock_sources['stock'][1001] = 7
+
+        success, result = sync_stock_verial_to_shopify()
+
+        assert result['cambiados'] == 1
+        assert result['actualizados'] == 1
+        pushed = stock_sources['update'].call_args[0][2]
+        assert pushed == [{
+            'inventoryItemId': 'gid://shopify/InventoryItem/1',
+            'locationId': LOCATION_ID,
+            'quantity': 7,
+        }]
+        snapshot = StockSnapshot.objects.get(inventory_item_id='gid://shopify/InventoryItem/1')
+        assert snapshot.quantity == 7
+
+    def test_full_reconcile_pushes_everything(self, shop, stock_sources):
+        """La reconciliación completa ignora el snapshot"""
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        sync_stock_verial_to_shopify()
+
+        success, result = sync_stock_verial_to_shopify(full_reconcile=True)
+
+        assert result['modo'] == 'completo'
+        assert result['actualizados'] == 3
+
+    def test_failed_chunk_is_retried_next_run(self, shop, stock_sources):
+        """Un chunk rechazado no se guarda en el snapshot"""
+        from shopify_app.models import StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        stock_sources['update'].return_value = (False, {'error': 'No response', 'throttle': None})
+
+        success, result = sync_stock_verial_to_shopify()
+
+        assert result['errores'] == 3
+        assert StockSnapshot.objects.count() == 0
+
+        stock_sources['update'].return_value = (True, {'fallidos': {}, 'throttle': None})
+        success, result = sync_stock_verial_to_shopify()
+
+        assert result['actualizados'] == 3
+        assert StockSnapshot.objects.count() == 3
+
+    def test_rejected_item_does_not_force_full_polls(self, shop, stock_sources, settings):
+        """Un item que Shopify rechaza queda visto: los siguientes sondeos siguen siendo por fecha"""
+        from shopify_app.models import StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        settings.VERIAL_STOCK_DATE_FILTER = True
+        stock_sources['update'].return_value = (
+            True, {'fallidos': {'gid://shopify/InventoryItem/0': 'Inventory item no existe'}, 'throttle': None},
+        )
+        success, result = sync_stock_verial_to_shopify()
+        assert result['rechazados'] == 1
+
+        stock_sources['update'].return_value = (True, {'fallidos': {}, 'throttle': None})
+        success, second = sync_stock_verial_to_shopify()
+
+        assert second['verial']['modo'] == 'fecha'
+        assert second['cambiados'] == 0
+        assert StockSnapshot.objects.get(inventory_item_id='gid://shopify/InventoryItem/0').quantity is None
+
+    def test_new_mapping_fetches_only_its_article(self, shop, stock_sources):
+        """Un item recién mapeado se envía aunque su artículo no se haya movido, sin sondeo completo"""
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        # El artículo 1003 ya está en Verial (y confirmado) pero aún sin item en Shopify
+        stock_sources['stock'][1003] = 8
+        sync_stock_verial_to_shopify()
+        stock_sources['update'].reset_mock()
+        items = _inventory_items(4)
+        products = {f'84100000000{i}': 1000 + i for i in range(4)}
+
+        with patch('shopify_app.inventory_index.get_indexed_inventory_items', return_value=items), \
+                patch('shopify_app.stock_sync.get_verial_products_by_barcode', return_value=(True, products)):
+            success, result = sync_stock_verial_to_shopify()
+
+        assert result['verial']['cambiados'] == 1
+        pushed = stock_sources['update'].call_args[0][2]
+        assert pushed == [{'inventoryItemId': items[3][0], 'locationId': LOCATION_ID, 'quantity': 8}]
+
+
+@pytest.mark.unit
+class TestIncrementalVerialStock:
+    """Tests para el sondeo incremental de GetStockArticulosWS"""
+
+    def test_only_moved_articles_reach_the_push(self, shop, stock_sources):
+        """Tras el primer envío solo se procesan los artículos cuyo stock cambió en Verial"""
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        sync_stock_verial_to_shopify()
+        stock_sources['stock'][1002] = 4
+
+        success, result = sync_stock_verial_to_shopify()
+
+        assert result['verial'] == {'modo': 'hash', 'recibidos': 3, 'cambiados': 1}
+        assert result['cambiados'] == 1
+
+    def test_state_is_persisted(self, shop, stock_sources):
+        """La tabla {IdArticulo: (stock, hash)} se guarda y se recarga tras reiniciar"""
+        from erp_connector import stock_poller
+        from erp_connector.models import VerialStockState
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        sync_stock_verial_to_shopify()
+        assert dict(VerialStockState.objects.values_list('verial_id', 'stock')) == {1000: 5, 1001: 10, 1002: 0}
+
+        stock_poller.reset()
+        success, changes = stock_poller.poll()
+
+        assert success is True
+        assert changes.rows == {}
+
+    def test_date_filter_is_sent_after_first_poll(self, shop, stock_sources, settings):
+        """Con VERIAL_STOCK_DATE_FILTER el segundo sondeo pide solo lo movido desde la fecha"""
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        settings.VERIAL_STOCK_DATE_FILTER = True
+
+        sync_stock_verial_to_shopify()
+        success, result = sync_stock_verial_to_shopify()
+
+        first, second = stock_sources['verial'].call_args_list
+        assert first.kwargs['fecha'] is None
+        assert second.kwargs['fecha']
+        assert result['verial']['modo'] == 'fecha'
+
+    def test_vanished_article_goes_to_zero(self, shop, stock_sources):
+        """Un artículo que desaparece de la respuesta completa pasa a stock 0"""
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        sync_stock_verial_to_shopify()
+        del stock_sources['stock'][1000]
+
+        success, result = sync_stock_verial_to_shopify()
+
+        pushed = stock_sources['update'].call_args[0][2]
+        assert pushed == [{'inventoryItemId': 'gid://shopify/InventoryItem/0', 'locationId': LOCATION_ID, 'quantity': 0}]
+
+
+@pytest.mark.integration
+class TestMultiLocationStock:
+    """Tests para el stock por almacén Verial -> location Shopify"""
+
+    @responses.activate
+    def test_locations_are_cached(self, shop):
+        """Las locations se consultan una sola vez por ventana de TTL"""
+        from shopify_app.stock_sync import get_shopify_location_id
+
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json={'data': {'locations': {'nodes': [
+            {'id': LOCATION_ID, 'name': 'Almacén'},
+        ]}}})
+
+        assert get_shopify_location_id(shop) == LOCATION_ID
+        assert get_shopify_location_id(shop) == LOCATION_ID
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_mapping_names_are_resolved_once(self, shop):
+        """El ID de location resuelto por nombre se guarda en el mapeo"""
+        from shopify_app.models import StockLocationMapping
+        from shopify_app.stock_sync import get_stock_locations, reset_locations_cache
+
+        StockLocationMapping.objects.create(verial_almacen_id=1, location_name='Almacén')
+        StockLocationMapping.objects.create(verial_almacen_id=2, location_name='Tienda')
+        StockLocationMapping.objects.create(verial_almacen_id=3, location_name='Antigua', active=False)
+        url = f'https://{shop.shop}/admin/api/2024-01/graphql.json'
+        responses.add(responses.POST, url, json={'data': {'locations': {'nodes': [
+            {'id': 'gid://shopify/Location/1', 'name': 'Almacén'},
+            {'id': 'gid://shopify/Location/2', 'name': 'Tienda'},
+        ]}}})
+
+        assert get_stock_locations(shop) == {1: 'gid://shopify/Location/1', 2: 'gid://shopify/Location/2'}
+        reset_locations_cache()
+        assert get_stock_locations(shop) == {1: 'gid://shopify/Location/1', 2: 'gid://shopify/Location/2'}
+        assert len(responses.calls) == 1
+
+    def test_stock_vector_per_location(self):
+        """Una pasada por las filas de GetStockArticulosWS reparte el stock por location"""
+        from shopify_app.stock_sync import stock_by_location
+
+        rows = list(_verial_stock({1000: 9, 1001: 4}, {1000: {1: 5, 2: 3, 3: 1}, 1001: {2: 4}})[1])
+
+        vectors = stock_by_location(rows, {1: 'loc-a', 2: 'loc-b', 3: 'loc-a'})
+
+        assert {loc: dict(table.items()) for loc, table in vectors.items()} == {
+            'loc-a': {1000: 6, 1001: 0}, 'loc-b': {1000: 3, 1001: 4},
+        }
+
+    def test_article_without_breakdown_is_skipped_not_zeroed(self, shop):
+        """Un artículo sin StockAlmacenes no se envía a 0: se omite sin forzar sondeos completos"""
+        from shopify_app.models import StockLocationMapping, StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        StockLocationMapping.objects.create(verial_almacen_id=1, shopify_location_id='loc-a')
+        items = _inventory_items(2)
+        products = {'841000000000': 1000, '841000000001': 1001}
+        rows = [
+            {'IdArticulo': 1000, 'Stock': 7, 'StockAlmacenes': [{'IdAlmacen': 1, 'Stock': 7}]},
+            {'IdArticulo': 1001, 'Stock': 12},
+        ]
+
+        with patch('shopify_app.stock_sync.get_verial_products_by_barcode', return_value=(True, products)), \
+                patch('erp_connector.verial_client.VerialClient.iter_stock', side_effect=lambda *a, **kw: (True, iter(rows))), \
+                patch('shopify_app.inventory_index.get_indexed_inventory_items', return_value=items), \
+                patch('shopify_app.stock_sync.update_stock_batch',
+                      return_value=(True, {'fallidos': {}, 'throttle': None})) as mock_update:
+            success, result = sync_stock_verial_to_shopify()
+            pushed = [q for call in mock_update.call_args_list for q in call[0][2]]
+            _, second = sync_stock_verial_to_shopify()
+
+        assert success is True
+        assert result['sin_desglose'] == 1
+        assert pushed == [{'inventoryItemId': items[0][0], 'locationId': 'loc-a', 'quantity': 7}]
+        assert StockSnapshot.objects.get(inventory_item_id=items[1][0]).quantity is None
+        assert second['verial']['cambiados'] == 0
+
+    def test_batches_are_grouped_by_location(self, shop):
+        """Cada llamada a inventorySetQuantities lleva una sola location"""
+        from shopify_app.models import StockLocationMapping, StockSnapshot
+        from shopify_app.stock_sync import sync_stock_verial_to_shopify
+
+        StockLocationMapping.objects.create(verial_almacen_id=1, shopify_location_id='loc-a')
+        StockLocationMapping.objects.create(verial_almacen_id=2, shopify_location_id='loc-b')
+        items = _inventory_items(2)
+        products = {'841000000000': 1000, '841000000001': 1001}
+        verial = _verial_stock({1000: 9, 1001: 4}, {1000: {1: 6, 2: 3}, 1001: {2: 4}})
+
+        with patch('shopify_app.stock_sync.get_verial_products_by_barcode', return_value=(True, products)), \
+                patch('erp_connector.verial_client.VerialClient.iter_stock', return_value=verial), \
+                patch('shopify_app.inventory_index.get_indexed_inventory_items', return_value=items), \
+                patch('shopify_app.stock_sync.update_stock_batch',
+                      return_value=(True, {'fallidos': {}, 'throttle': None})) as mock_update:
+            success, result = sync_stock_verial_to_shopify()
+
+        assert success is True
+        assert result['actualizados'] == 4
+        assert set(result['ubicaciones']) == {'loc-a', 'loc-b'}
+        for call in mock_update.call_args_list:
+            location_id, quantities = call[0][1], call[0][2]
+            assert {q['locationId'] for q in quantities} == {location_id}
+        assert StockSnapshot.objects.get(location_id='loc-a', inventory_item_id=items[1][0]).quantity == 0
+        assert StockSnapshot.objects.get(location_id='loc-b', inventory_item_id=items[1][0]).quantity == 4
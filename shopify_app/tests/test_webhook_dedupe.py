@@ -0,0 +1,117 @@
+"""
+Tests para el almacén de idempotencia de webhooks
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _post(api_client, body, signature, webhook_id):
+    return api_client.post(
+        '/shopify/webhook/orders/create/', data=body, content_type='application/json',
+        HTTP_X_SHOPIFY_HMAC_SHA256=signature, HTTP_X_SHOPIFY_WEBHOOK_ID=webhook_id,
+        HTTP_X_SHOPIFY_TOPIC='orders/create',
+    )
+
+
+@pytest.mark.unit
+class TestTTLStore:
+    """Tests para el conjunto con caducidad"""
+
+    def test_expired_keys_are_evicted(self):
+        """Las claves caducadas dejan de considerarse vistas"""
+        from shopify_app.services.webhook_dedupe import TTLStore
+
+        store = TTLStore(ttl=60, max_entries=10)
+        with patch('shopify_app.services.webhook_dedupe.time.time', return_value=1000):
+            store.add('a')
+            assert 'a' in store
+        with patch('shopify_app.services.webhook_dedupe.time.time', return_value=1061):
+            assert 'a' not in store
+            store.add('b')
+        assert len(store) == 1
+
+    def test_max_entries_drops_oldest(self):
+        """Al superar el tamaño máximo sale la clave más antigua"""
+        from shopify_app.services.webhook_dedupe import TTLStore
+
+        store = TTLStore(ttl=60, max_entries=2)
+        for key in ('a', 'b', 'c'):
+            store.add(key)
+
+        assert 'a' not in store
+        assert 'b' in store and 'c' in store
+
+
+@pytest.mark.webhook
+class TestWebhookDedupe:
+    """Tests del descarte de reintentos en la vista"""
+
+    def test_retry_short_circuits_without_queries(self, api_client, shop, shopify_webhook_data, shopify_hmac_signature):
+        """Un reintento con el mismo webhook id no parsea ni consulta la BD"""
+        body = json.dumps(shopify_webhook_data)
+        signature = shopify_hmac_signature(body)
+        assert _post(api_client, body, signature, 'wh-1').status_code == 200
+
+        with CaptureQueriesContext(connection) as queries, \
+                patch('shopify_app.views.json.loads') as loads:
+            response = _post(api_client, body, signature, 'wh-1')
+
+        assert response.status_code == 200
+        assert len(queries) == 0
+        loads.assert_not_called()
+
+    def test_same_payload_with_new_id_is_duplicate(self, api_client, shop, shopify_webhook_data, shopify_hmac_signature):
+        """El mismo cuerpo con otro webhook id también se descarta"""
+        from shopify_app.models import WebhookInbox
+
+        body = json.dumps(shopify_webhook_data)
+        signature = shopify_hmac_signature(body)
+        _post(api_client, body, signature, 'wh-1')
+        _post(api_client, body, signature, 'wh-2')
+
+        assert WebhookInbox.objects.count() == 1
+
+    def test_store_is_warmed_from_inbox(self, api_client, shop, shopify_webhook_data, shopify_hmac_signature):
+        """Tras reiniciar el proceso los webhooks recientes siguen contando como vistos"""
+        from shopify_app.models import WebhookInbox
+        from shopify_app.services import webhook_dedupe
+
+        body = json.dumps(shopify_webhook_data)
+        signature = shopify_hmac_signature(body)
+        _post(api_client, body, signature, 'wh-1')
+        webhook_dedupe.reset()
+
+        assert webhook_dedupe.is_duplicate('wh-1', 'otro-hash') is True
+        assert WebhookInbox.objects.count() == 1
+
+    def test_duplicate_rate_metric(self, api_client, shop, shopify_webhook_data, shopify_hmac_signature):
+        """La tasa de duplicados refleja los reintentos descartados"""
+        from shopify_app.services.webhook_dedupe import CHECKS, DUPLICATE_RATE
+
+        before_dup = CHECKS.value(result='duplicado', motivo='id')
+        body = json.dumps(shopify_webhook_data)
+        signature = shopify_hmac_signature(body)
+        _post(api_client, body, signature, 'wh-1')
+        _post(api_client, body, signature, 'wh-1')
+
+        assert CHECKS.value(result='duplicado', motivo='id') == before_dup + 1
+        assert 0 < DUPLICATE_RATE.value() <= 1
+
+    def test_purge_removes_old_processed_entries(self, shop):
+        """Las entradas procesadas fuera de la ventana se purgan"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from shopify_app.models import WebhookInbox
+        from shopify_app.services.webhook_inbox import purge_processed
+
+        old = timezone.now() - timedelta(hours=72)
+        WebhookInbox.objects.create(webhook_id='old', topic='orders/create', body='{}', status='DONE', received_at=old)
+        WebhookInbox.objects.create(webhook_id='failed', topic='orders/create', body='{}', status='ERROR', received_at=old)
+        WebhookInbox.objects.create(webhook_id='new', topic='orders/create', body='{}', status='DONE')
+
+        assert purge_processed(hours=48) == 1
+        assert set(WebhookInbox.objects.values_list('webhook_id', flat=True)) == {'failed', 'new'}
@@ -0,0 +1,171 @@
+"""
+Tests para la bandeja de webhooks y su worker
+"""
+import json
+
+import pytest
+
+
+def _payload(order_id, name=None):
+    return {
+        'id': order_id, 'name': name or f'#{order_id}', 'email': 'c@example.com',
+        'total_price': '10.00', 'financial_status': 'paid', 'fulfillment_status': None,
+        'created_at': '2024-01-01T00:00:00Z',
+        'line_items': [{'id': order_id * 10, 'title': 'Producto', 'sku': 'SKU', 'quantity': 1, 'price': '10.00'}],
+    }
+
+
+@pytest.mark.webhook
+class TestWebhookView:
+    """La vista solo verifica y encola"""
+
+    def test_duplicate_webhook_id_is_enqueued_once(self, api_client, shop, shopify_webhook_data, shopify_hmac_signature):
+        """El mismo X-Shopify-Webhook-Id no genera dos entradas"""
+        from shopify_app.models import WebhookInbox
+
+        body = json.dumps(shopify_webhook_data)
+        for _ in range(2):
+            response = api_client.post(
+                '/shopify/webhook/orders/create/', data=body, content_type='application/json',
+                HTTP_X_SHOPIFY_HMAC_SHA256=shopify_hmac_signature(body),
+                HTTP_X_SHOPIFY_WEBHOOK_ID='wh-1', HTTP_X_SHOPIFY_TOPIC='orders/create',
+                HTTP_X_SHOPIFY_SHOP_DOMAIN=shop.shop,
+            )
+            assert response.status_code == 200
+
+        entry = WebhookInbox.objects.get()
+        assert entry.webhook_id == 'wh-1'
+        assert entry.status == 'PENDING'
+        assert entry.shop_domain == shop.shop
+
+
+@pytest.mark.integration
+class TestDrainInbox:
+    """Tests para el procesado por lotes"""
+
+    def test_batch_writes_orders_and_lines(self, shop):
+        """Un lote de webhooks se vuelca de una vez"""
+        from shopify_app.models import Order, OrderLine, WebhookInbox
+        from shopify_app.services.webhook_inbox import drain_inbox, enqueue
+
+        for i in range(1, 4):
+            enqueue(f'wh-{i}', 'orders/create', shop.shop, json.dumps(_payload(i)))
+
+        stats = drain_inbox(batch_size=2)
+
+        assert stats == {'lotes': 2, 'procesados': 3, 'errores': 0}
+        assert Order.objects.count() == 3
+        assert OrderLine.objects.count() == 3
+        assert set(WebhookInbox.objects.values_list('status', flat=True)) == {'DONE'}
+
+    @pytest.mark.parametrize('status', ['IMPORTED', 'ERROR'])
+    def test_update_keeps_send_state_of_existing_order(self, shop, status):
+        """orders/updated no vuelve a encolar un pedido histórico o fallido"""
+        from shopify_app.models import Order
+        from shopify_app.services.order_dispatcher import pending_orders
+        from shopify_app.services.webhook_inbox import drain_inbox, enqueue
+
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(_payload(1)))
+        drain_inbox()
+        Order.objects.update(status=status)
+
+        enqueue('wh-2', 'orders/updated', shop.shop, json.dumps({**_payload(1), 'financial_status': 'refunded'}))
+        drain_inbox()
+
+        order = Order.objects.get()
+        assert order.financial_status == 'refunded'
+        assert order.status == status
+        assert not pending_orders().exists()
+
+    def test_cancelled_order_leaves_the_queue(self, shop):
+        """Un pedido cancelado antes de enviarse sale de la cola de Verial"""
+        from shopify_app.models import Order
+        from shopify_app.services.order_dispatcher import pending_orders
+        from shopify_app.services.webhook_inbox import drain_inbox, enqueue
+
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(_payload(1)))
+        enqueue('wh-2', 'orders/create', shop.shop, json.dumps({**_payload(2), 'cancelled_at': '2024-01-02T00:00:00Z'}))
+        drain_inbox()
+        assert [o.shopify_id for o in pending_orders()] == [1]
+
+        enqueue('wh-3', 'orders/updated', shop.shop, json.dumps({**_payload(1), 'cancelled_at': '2024-01-02T00:00:00Z'}))
+        drain_inbox()
+
+        assert set(Order.objects.values_list('status', flat=True)) == {'IMPORTED'}
+        assert not pending_orders().exists()
+
+    def test_cancelled_sent_order_keeps_its_state(self, shop):
+        """La cancelación no toca un pedido ya enviado a Verial"""
+        from shopify_app.models import Order
+        from shopify_app.services.webhook_inbox import drain_inbox, enqueue
+
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(_payload(1)))
+        drain_inbox()
+        Order.objects.update(status='SENT', sent_to_verial=True)
+
+        enqueue('wh-2', 'orders/updated', shop.shop, json.dumps({**_payload(1), 'cancelled_at': '2024-01-02T00:00:00Z'}))
+        drain_inbox()
+
+        assert Order.objects.get().status == 'SENT'
+
+    def test_bad_payload_is_isolated(self, shop):
+        """Un payload inválido no impide procesar el resto del lote"""
+        from shopify_app.models import Order, WebhookInbox
+        from shopify_app.services.webhook_inbox import drain_inbox, enqueue
+
+        broken = _payload(2)
+        del broken['total_price']
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(_payload(1)))
+        enqueue('wh-2', 'orders/create', shop.shop, json.dumps(broken))
+        enqueue('wh-3', 'orders/create', shop.shop, 'no es json')
+
+        stats = drain_inbox()
+
+        assert stats['procesados'] == 1
+        assert stats['errores'] == 2
+        assert Order.objects.filter(shopify_id=1).exists()
+        assert WebhookInbox.objects.get(webhook_id='wh-2').status == 'PENDING'
+        assert WebhookInbox.objects.get(webhook_id='wh-3').status == 'ERROR'
+
+    def test_retries_until_max_attempts(self, shop, settings):
+        """Tras agotar los intentos la entrada queda en ERROR"""
+        from shopify_app.models import WebhookInbox
+        from shopify_app.services.webhook_inbox import drain_inbox, enqueue
+
+        settings.WEBHOOK_INBOX_MAX_ATTEMPTS = 2
+        broken = _payload(1)
+        del broken['name']
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(broken))
+
+        drain_inbox()
+        drain_inbox()
+
+        entry = WebhookInbox.objects.get()
+        assert entry.attempts == 2
+        assert entry.status == 'ERROR'
+        assert 'name' in entry.error
+
+    def test_claimed_entries_are_not_claimed_twice(self, shop):
+        """Una entrada en proceso no la reclama otro worker"""
+        from shopify_app.services.webhook_inbox import claim_batch, enqueue
+
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(_payload(1)))
+
+        assert len(claim_batch(10)) == 1
+        assert claim_batch(10) == []
+
+    def test_metrics_report_depth_and_lag(self, shop):
+        """Las métricas exponen la profundidad y el retraso de la cola"""
+        from erp_connector.metrics import REGISTRY
+        from shopify_app.services.webhook_inbox import DEPTH, drain_inbox, enqueue
+
+        enqueue('wh-1', 'orders/create', shop.shop, json.dumps(_payload(1)))
+        enqueue('wh-2', 'orders/create', shop.shop, json.dumps(_payload(2)))
+
+        text = REGISTRY.render_prometheus()
+        assert 'webhook_inbox_depth 2' in text
+        assert 'webhook_inbox_oldest_pending_seconds' in text
+
+        drain_inbox()
+        assert DEPTH.value() == 0
+        assert 'webhook_inbox_lag_seconds_count{topic="orders/create"}' in REGISTRY.render_prometheus()
@@ -3,8 +3,7 @@ import json
 import hmac
 import hashlib
 import base64
-import requests
-from datetime import datetime, timedelta
+from datetime import timedelta
 from shopify_app.product_mapping import auto_map_products_by_barcode
 from django.conf import settings
 from django.http import HttpResponse, JsonResponse
@@ -13,9 +12,19 @@ from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Sum, Count
 from django.db.models.functions import TruncDate
 from urllib.parse import urlencode
-from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from erp_connector import transport
 
-from .models import Shop, Order, OrderLine, Product, ProductVariant, Customer
+from .models import Shop, Order, Product, Customer
+from .services.shopify_ingest import (
+    ShopifyFetchError,
+    fetch_pages,
+    ingest_customers,
+    ingest_products,
+)
+from .services.order_sync import sync_orders_incremental
+from .services import webhook_dedupe
+from .services.webhook_inbox import enqueue as enqueue_webhook
 
 
 SHOPIFY_API_KEY = os.getenv("SHOPIFY_API_KEY")
@@ -59,7 +68,7 @@ def shopify_callback(request):
         "code": code,
     }
 
-    response = requests.post(token_url, json=payload)
+    response = transport.post(token_url, json=payload)
 
     try:
         data = response.json()
@@ -95,7 +104,7 @@ def orders_view(request):
     url = f"https://{shop.shop}/admin/api/2024-01/orders.json"
     headers = {"X-Shopify-Access-Token": shop.access_token}
 
-    response = requests.get(url, headers=headers)
+    response = transport.get(url, headers=headers)
 
     if response.status_code != 200:
         return JsonResponse({
@@ -129,57 +138,12 @@ def sync_orders(request):
     if not shop:
         return JsonResponse({"error": "Tienda no encontrada"}, status=404)
 
-    url = f"https://{shop.shop}/admin/api/2024-01/orders.json"
-    headers = {"X-Shopify-Access-Token": shop.access_token}
-
-    response = requests.get(url, headers=headers)
-
-    if response.status_code != 200:
-        return JsonResponse({
-            "error": "Error de Shopify",
-            "status": response.status_code
-        }, status=500)
-
-    data = response.json()
-
-    saved = 0
-    for order_data in data["orders"]:
-        order, created = Order.objects.update_or_create(
-            shopify_id=order_data["id"],
-            defaults={
-                "shop": shop,
-                "name": order_data["name"],
-                "email": order_data.get("email", ""),
-                "total_price": order_data["total_price"],
-                "financial_status": order_data["financial_status"],
-                "fulfillment_status": order_data.get("fulfillment_status", "") or "",
-                "created_at": parse_datetime(order_data["created_at"]),
-                "status": "RECEIVED",
-                "sent_to_verial": False,
-            }
-        )
+    success, result = sync_orders_incremental(shop, full=request.GET.get("full") == "1")
 
-        # Guardar líneas de pedido
-        for item in order_data.get("line_items", []):
-            OrderLine.objects.update_or_create(
-                order=order,
-                shopify_id=item["id"],
-                defaults={
-                    "product_title": item.get("title", ""),
-                    "variant_title": item.get("variant_title", "") or "",
-                    "sku": item.get("sku", "") or "",
-                    "quantity": item.get("quantity", 1),
-                    "price": item.get("price", 0),
-                    "discount_amount": item.get("total_discount", 0),
-                }
-            )
-
-        saved += 1
+    if not success:
+        return JsonResponse(result, status=500)
 
-    return JsonResponse({
-        "message": "Pedidos sincronizados",
-        "count": saved
-    })
+    return JsonResponse({"message": "Pedidos sincronizados", **result})
 
 
 def sync_products(request):
@@ -189,65 +153,17 @@ def sync_products(request):
         return JsonResponse({"error": "Tienda no encontrada"}, status=404)
 
     headers = {"X-Shopify-Access-Token": shop.access_token}
-
-    all_products = []
     url = f"https://{shop.shop}/admin/api/2024-01/products.json?limit=250"
 
-    while url:
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            return JsonResponse({
-                "error": "Error de Shopify",
-                "status": response.status_code
-            }, status=500)
-
-        data = response.json()
-        all_products.extend(data["products"])
-
-        link_header = response.headers.get("Link", "")
-        url = None
-        if 'rel="next"' in link_header:
-            for part in link_header.split(","):
-                if 'rel="next"' in part:
-                    url = part.split(";")[0].strip().strip("<>")
-
-    saved_products = 0
-    saved_variants = 0
-    
-    for product_data in all_products:
-        product, created = Product.objects.update_or_create(
-            shopify_id=product_data["id"],
-            defaults={
-                "shop": shop,
-                "title": product_data["title"],
-                "vendor": product_data.get("vendor", ""),
-                "product_type": product_data.get("product_type", ""),
-                "status": product_data["status"],
-                "created_at": parse_datetime(product_data["created_at"]),
-            }
-        )
-        saved_products += 1
-        
-        for variant_data in product_data.get("variants", []):
-            ProductVariant.objects.update_or_create(
-                shopify_id=variant_data["id"],
-                defaults={
-                    "product": product,
-                    "title": variant_data.get("title", "Default"),
-                    "sku": variant_data.get("sku", "") or "",
-                    "barcode": variant_data.get("barcode", "") or "",
-                    "price": variant_data.get("price", 0),
-                    "inventory_quantity": variant_data.get("inventory_quantity", 0),
-                }
-            )
-            saved_variants += 1
+    try:
+        result = ingest_products(shop, fetch_pages(url, headers, "products"))
+    except ShopifyFetchError as e:
+        return JsonResponse({
+            "error": "Error de Shopify",
+            "status": e.status_code
+        }, status=500)
 
-    return JsonResponse({
-        "message": "Productos sincronizados",
-        "products": saved_products,
-        "variants": saved_variants
-    })
+    return JsonResponse({"message": "Productos sincronizados", **result})
 
 
 def sync_customers(request):
@@ -257,48 +173,17 @@ def sync_customers(request):
         return JsonResponse({"error": "Tienda no encontrada"}, status=404)
 
     headers = {"X-Shopify-Access-Token": shop.access_token}
-
-    all_customers = []
     url = f"https://{shop.shop}/admin/api/2024-01/customers.json?limit=250"
 
-    while url:
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            return JsonResponse({
-                "error": "Error de Shopify",
-                "status": response.status_code
-            }, status=500)
+    try:
+        result = ingest_customers(shop, fetch_pages(url, headers, "customers"))
+    except ShopifyFetchError as e:
+        return JsonResponse({
+            "error": "Error de Shopify",
+            "status": e.status_code
+        }, status=500)
 
-        data = response.json()
-        all_customers.extend(data["customers"])
-
-        link_header = response.headers.get("Link", "")
-        url = None
-        if 'rel="next"' in link_header:
-            for part in link_header.split(","):
-                if 'rel="next"' in part:
-                    url = part.split(";")[0].strip().strip("<>")
-
-    saved = 0
-    for customer in all_customers:
-        Customer.objects.update_or_create(
-            shopify_id=customer["id"],
-            defaults={
-                "shop": shop,
-                "email": customer.get("email", "") or "",
-                "first_name": customer.get("first_name", "") or "",
-                "last_name": customer.get("last_name", "") or "",
-                "phone": customer.get("phone", "") or "",
-                "created_at": parse_datetime(customer["created_at"]),
-            }
-        )
-        saved += 1
-
-    return JsonResponse({
-        "message": "Clientes sincronizados",
-        "count": saved
-    })
+    return JsonResponse({"message": "Clientes sincronizados", **result})
 
 
 @csrf_exempt
@@ -321,45 +206,26 @@ def webhook_orders_create(request):
     if not hmac.compare_digest(calculated_hmac, shopify_hmac):
         return HttpResponse("HMAC inválido", status=401)
 
+    # Reintentos de Shopify: se descartan antes de parsear o tocar la BD
+    topic = request.headers.get("X-Shopify-Topic", "orders/create")
+    digest = webhook_dedupe.payload_hash(topic, request.body)
+    webhook_id = request.headers.get("X-Shopify-Webhook-Id") or digest
+    if webhook_dedupe.is_duplicate(webhook_id, digest):
+        return HttpResponse("OK", status=200)
+
     try:
-        data = json.loads(request.body)
+        json.loads(request.body)
     except json.JSONDecodeError:
         return HttpResponse("JSON inválido", status=400)
 
-    shop = Shop.objects.first()
-    if not shop:
-        return HttpResponse("Tienda no encontrada", status=404)
-
-    order, created = Order.objects.update_or_create(
-        shopify_id=data["id"],
-        defaults={
-            "shop": shop,
-            "name": data["name"],
-            "email": data.get("email", ""),
-            "total_price": data["total_price"],
-            "financial_status": data["financial_status"],
-            "fulfillment_status": data.get("fulfillment_status", "") or "",
-            "created_at": parse_datetime(data["created_at"]),
-            "status": "RECEIVED",
-            "sent_to_verial": False,
-        }
+    # Solo encolamos: el worker (process_webhooks) hace la escritura en BD
+    enqueue_webhook(
+        webhook_id,
+        topic,
+        request.headers.get("X-Shopify-Shop-Domain", ""),
+        request.body.decode("utf-8"),
+        digest,
     )
-
-    for item in data.get("line_items", []):
-        OrderLine.objects.update_or_create(
-            order=order,
-            shopify_id=item["id"],
-            defaults={
-                "product_title": item.get("title", ""),
-                "variant_title": item.get("variant_title", "") or "",
-                "sku": item.get("sku", "") or "",
-                "quantity": item.get("quantity", 1),
-                "price": item.get("price", 0),
-                "discount_amount": item.get("total_discount", 0),
-            }
-        )
-
-    print(f"✅ PEDIDO RECIBIDO: {order.name}")
     return HttpResponse("OK", status=200)
 
 def register_webhook(request):
@@ -383,7 +249,7 @@ def register_webhook(request):
         "Content-Type": "application/json"
     }
 
-    response = requests.post(url, json=payload, headers=headers)
+    response = transport.post(url, json=payload, headers=headers)
 
     if response.status_code not in [200, 201]:
         return JsonResponse({
@@ -398,8 +264,19 @@ def register_webhook(request):
     })
 
 
+def _orders_since(start, end=None):
+    """Nº de pedidos e ingresos en [start, end). Filtra por rango para usar el índice de created_at."""
+    orders = Order.objects.filter(created_at__gte=start)
+    if end is not None:
+        orders = orders.filter(created_at__lt=end)
+    totals = orders.aggregate(count=Count('id'), total=Sum('total_price'))
+    return totals['count'], totals['total'] or 0
+
+
 def dashboard(request):
-    today = datetime.now().date()
+    # Inicio del día en hora local como datetime: filtrar con created_at__date
+    # envuelve la columna en una función y la BD no puede usar el índice.
+    today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
     last_7_days = today - timedelta(days=7)
     last_30_days = today - timedelta(days=30)
 
@@ -407,17 +284,9 @@ def dashboard(request):
     total_customers = Customer.objects.count()
     total_products = Product.objects.count()
 
-    orders_today = Order.objects.filter(created_at__date=today).count()
-    revenue_today = Order.objects.filter(created_at__date=today).aggregate(
-        total=Sum('total_price'))['total'] or 0
-
-    orders_7_days = Order.objects.filter(created_at__date__gte=last_7_days).count()
-    revenue_7_days = Order.objects.filter(created_at__date__gte=last_7_days).aggregate(
-        total=Sum('total_price'))['total'] or 0
-
-    orders_30_days = Order.objects.filter(created_at__date__gte=last_30_days).count()
-    revenue_30_days = Order.objects.filter(created_at__date__gte=last_30_days).aggregate(
-        total=Sum('total_price'))['total'] or 0
+    orders_today, revenue_today = _orders_since(today, today + timedelta(days=1))
+    orders_7_days, revenue_7_days = _orders_since(last_7_days)
+    orders_30_days, revenue_30_days = _orders_since(last_30_days)
 
     orders_by_status = Order.objects.values('financial_status').annotate(
         count=Count('id')).order_by('-count')
@@ -425,7 +294,7 @@ def dashboard(request):
     recent_orders = Order.objects.order_by('-created_at')[:5]
 
     orders_per_day = Order.objects.filter(
-        created_at__date__gte=last_7_days
+        created_at__gte=last_7_days
     ).annotate(
         date=TruncDate('created_at')
     ).values('date').annotate(
@@ -453,7 +322,7 @@ def dashboard(request):
 def auto_map_products_view(request):   
     from .product_mapping import auto_map_products_by_barcode, get_mapping_stats
     
-    success, result = auto_map_products_by_barcode()
+    success, result = auto_map_products_by_barcode(dry_run=request.GET.get("dry_run") == "1")
     stats = get_mapping_stats()
 
     return JsonResponse({
@@ -480,7 +349,7 @@ def test_locations_view(request):
     url = f"https://{shop.shop}/admin/api/2024-01/locations.json"
     headers = {"X-Shopify-Access-Token": shop.access_token}
     
-    response = requests.get(url, headers=headers)
+    response = transport.get(url, headers=headers)
     
     return JsonResponse({
         "status_code": response.status_code,
@@ -7,6 +7,8 @@ import os
 import sys
 import django
 import logging
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
 from django.core.management import call_command
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'conector_shopify.settings')
@@ -22,6 +24,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger('sync_runner')
 
+# Segundos que la reconciliación completa espera a que el delta suelte 'sync_stock'
+STOCK_FULL_LEASE_WAIT = 15 * 60
+
+
+def leased(job, name, interval):
+    """
+    Envuelve un job para que, con varias réplicas del runner, solo lo ejecute el
+    nodo que tome su lease en BD y como mucho una vez por intervalo (segundos).
+    """
+    def run():
+        from shopify_app.services.job_lease import run_exclusive
+        try:
+            run_exclusive(name, job, min_interval=interval)
+        except Exception as e:
+            logger.error(f"❌ [{name}] Error gestionando el lease: {e}")
+    run.__name__ = job.__name__
+    return run
+
 
 def job_sync_stock():
     """Ejecuta: python manage.py sync_stock"""
@@ -31,6 +51,108 @@ def job_sync_stock():
     except Exception as e:
         logger.error(f"❌ [STOCK] Error crítico: {e}")
 
+def add_stock_job(scheduler):
+    """
+    Programa la sincronización de stock. En modo "fixed" cada STOCK_INTERVAL_BUSY
+    segundos; en modo "adaptive" el job sondea primero si algo cambió y se
+    reprograma a sí mismo con el intervalo que calcula el planificador.
+    """
+    if settings.STOCK_SCHEDULER_MODE != 'adaptive':
+        scheduler.add_job(
+            leased(job_sync_stock, 'sync_stock', settings.STOCK_INTERVAL_BUSY),
+            IntervalTrigger(seconds=settings.STOCK_INTERVAL_BUSY),
+            id='sync_stock',
+            replace_existing=True
+        )
+        return
+
+    from shopify_app.services.job_lease import run_exclusive
+    from shopify_app.services.stock_scheduler import AdaptiveStockScheduler
+
+    adaptive = AdaptiveStockScheduler()
+
+    def job_sync_stock_adaptive():
+        """Sonda + sincronización si hay cambios; reprograma el siguiente tick"""
+        delay = settings.STOCK_INTERVAL_BUSY
+
+        def tick():
+            nonlocal delay
+            delay = adaptive.tick()
+
+        try:
+            # El lease se pide con el intervalo mínimo: si otro nodo acaba de
+            # sondear, este se salta el tick y vuelve a probar pasado ese tiempo.
+            run_exclusive('sync_stock', tick, min_interval=settings.STOCK_INTERVAL_BUSY)
+        except Exception as e:
+            logger.error(f"❌ [STOCK] Error crítico en el planificador adaptativo: {e}")
+        scheduler.modify_job('sync_stock', next_run_time=datetime.now(timezone.utc) + timedelta(seconds=delay))
+
+    scheduler.add_job(
+        job_sync_stock_adaptive,
+        IntervalTrigger(seconds=settings.STOCK_INTERVAL_MAX),
+        id='sync_stock',
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True
+    )
+
+def job_sync_stock_full():
+    """
+    Ejecuta: python manage.py sync_stock --full, bajo el mismo lease que la
+    sincronización delta ('sync_stock') para que nunca corran a la vez: ambas
+    escriben StockSnapshot, la marca de agua del sondeo y el stock en Shopify.
+    Si hay un delta en curso se espera a que termine.
+    """
+    from shopify_app.services.job_lease import run_exclusive
+
+    def reconcile():
+        logger.info("⏳ [STOCK] Iniciando reconciliación completa...")
+        call_command('sync_stock', full=True)
+
+    try:
+        if not run_exclusive('sync_stock', reconcile, wait=STOCK_FULL_LEASE_WAIT):
+            logger.warning("⚠️ [STOCK] Reconciliación completa omitida: la sincronización delta no soltó el lease")
+    except Exception as e:
+        logger.error(f"❌ [STOCK] Error crítico en reconciliación: {e}")
+
+def job_refresh_inventory_index():
+    """Ejecuta: python manage.py refresh_inventory_index"""
+    logger.info("⏳ [INVENTARIO] Refrescando índice de inventory items...")
+    try:
+        call_command('refresh_inventory_index')
+    except Exception as e:
+        logger.error(f"❌ [INVENTARIO] Error crítico: {e}")
+
+def job_refresh_inventory_index_full():
+    """Ejecuta: python manage.py refresh_inventory_index --full"""
+    logger.info("⏳ [INVENTARIO] Reconstruyendo índice completo de inventory items...")
+    try:
+        call_command('refresh_inventory_index', full=True)
+    except Exception as e:
+        logger.error(f"❌ [INVENTARIO] Error crítico en reconstrucción: {e}")
+
+def job_sync_orders():
+    """Ejecuta: python manage.py sync_orders"""
+    logger.info("⏳ [PEDIDOS] Sincronizando pedidos modificados en Shopify...")
+    try:
+        call_command('sync_orders')
+    except Exception as e:
+        logger.error(f"❌ [PEDIDOS] Error crítico sincronizando pedidos: {e}")
+
+def job_process_webhooks():
+    """Ejecuta: python manage.py process_webhooks"""
+    try:
+        call_command('process_webhooks')
+    except Exception as e:
+        logger.error(f"❌ [WEBHOOKS] Error crítico procesando la bandeja: {e}")
+
+def job_send_orders():
+    """Ejecuta: python manage.py send_orders_to_verial (varios runners comparten la cola)"""
+    logger.info("⏳ [PEDIDOS] Enviando pedidos pendientes a Verial...")
+    try:
+        call_command('send_orders_to_verial')
+    except Exception as e:
+        logger.error(f"❌ [PEDIDOS] Error crítico enviando pedidos: {e}")
+
 def job_sync_products():
     """Ejecuta la sincronización masiva de mapeos"""
     logger.info("⏳ [PRODUCTOS] Mapeando catálogo...")
@@ -38,7 +160,10 @@ def job_sync_products():
         from shopify_app.product_mapping import auto_map_products_by_barcode
         success, result = auto_map_products_by_barcode()
         if success:
-            logger.info(f"✅ [PRODUCTOS] Mapeo completado: {result.get('mapeados_nuevos', 0)} nuevos.")
+            logger.info(
+                f"✅ [PRODUCTOS] Mapeo completado: {result.get('nuevos', 0)} nuevos, "
+                f"{result.get('actualizados', 0)} actualizados, {result.get('eliminados', 0)} eliminados."
+            )
         else:
             logger.error(f"❌ [PRODUCTOS] Error: {result}")
     except Exception as e:
@@ -51,7 +176,16 @@ def job_sync_order_status():
         from shopify_app.order_status_sync import sync_order_status
         success, result = sync_order_status()
         if success:
-            logger.info(f"✅ [PEDIDOS] Actualizados: {result.get('actualizados', 0)}")
+            logger.info(
+                f"✅ [PEDIDOS] Actualizados: {result.get('actualizados', 0)} de {result.get('consultados', 0)} "
+                f"en {result.get('segundos', 0)}s"
+            )
+            fulfillments = result.get('fulfillments')
+            if fulfillments and fulfillments.get('pedidos'):
+                logger.info(
+                    f"✅ [PEDIDOS] Fulfillments Shopify: {fulfillments['creados']} creados, "
+                    f"{fulfillments['errores']} errores"
+                )
         else:
             logger.error(f"❌ [PEDIDOS] Error: {result}")
     except Exception as e:
@@ -59,35 +193,93 @@ def job_sync_order_status():
 
 
 def main():
-    scheduler = BlockingScheduler()
+    # En cada nodo: nunca dos ejecuciones del mismo job a la vez y las ejecuciones
+    # atrasadas se agrupan en una. Entre nodos lo garantiza el lease en BD.
+    scheduler = BlockingScheduler(job_defaults={'coalesce': True, 'max_instances': 1})
+    
+    # Las métricas de los jobs viven en este proceso: se publican en su propio puerto
+    if settings.SYNC_RUNNER_METRICS_PORT:
+        from erp_connector.metrics import start_http_server
+        try:
+            start_http_server(settings.SYNC_RUNNER_METRICS_PORT, settings.SYNC_RUNNER_METRICS_ADDR)
+        except OSError as e:
+            logger.error(f"❌ No se pudo abrir el puerto de métricas {settings.SYNC_RUNNER_METRICS_PORT}: {e}")
+    
+    add_stock_job(scheduler)
     
     scheduler.add_job(
-        job_sync_stock,
-        IntervalTrigger(minutes=2),
-        id='sync_stock',
+        leased(job_sync_stock_full, 'sync_stock_full', settings.STOCK_FULL_RECONCILE_HOURS * 3600),
+        IntervalTrigger(hours=settings.STOCK_FULL_RECONCILE_HOURS),
+        id='sync_stock_full',
         replace_existing=True
     )
     
     scheduler.add_job(
-        job_sync_order_status,
+        leased(job_refresh_inventory_index, 'refresh_inventory_index', 15 * 60),
+        IntervalTrigger(minutes=15),
+        id='refresh_inventory_index',
+        replace_existing=True
+    )
+    
+    scheduler.add_job(
+        leased(job_refresh_inventory_index_full, 'refresh_inventory_index_full', settings.INVENTORY_INDEX_FULL_HOURS * 3600),
+        IntervalTrigger(hours=settings.INVENTORY_INDEX_FULL_HOURS),
+        id='refresh_inventory_index_full',
+        replace_existing=True
+    )
+    
+    # Sin lease: la bandeja de webhooks y la cola de pedidos se reparten entre
+    # nodos reclamando filas en BD, así que conviene que corran en todos.
+    scheduler.add_job(
+        job_process_webhooks,
+        IntervalTrigger(minutes=1),
+        id='process_webhooks',
+        replace_existing=True
+    )
+    
+    scheduler.add_job(
+        leased(job_sync_orders, 'sync_orders', 10 * 60),
+        IntervalTrigger(minutes=10),
+        id='sync_orders',
+        replace_existing=True
+    )
+    
+    if settings.SEND_TO_VERIAL:
+        scheduler.add_job(
+            job_send_orders,
+            IntervalTrigger(minutes=2),
+            id='send_orders',
+            replace_existing=True
+        )
+    
+    scheduler.add_job(
+        leased(job_sync_order_status, 'sync_order_status', 5 * 60),
         IntervalTrigger(minutes=5),
         id='sync_order_status',
         replace_existing=True
     )
     
     scheduler.add_job(
-        job_sync_products,
+        leased(job_sync_products, 'sync_products', 30 * 60),
         IntervalTrigger(minutes=30),
         id='sync_products',
         replace_existing=True
     )
     
     logger.info("🚀 Sync Runner activo y escuchando...")
-    logger.info("   - Stock: 2m | Pedidos: 5m | Productos: 30m")
+    if settings.STOCK_SCHEDULER_MODE == 'adaptive':
+        stock_schedule = f"adaptativo {settings.STOCK_INTERVAL_BUSY}-{settings.STOCK_INTERVAL_MAX}s"
+    else:
+        stock_schedule = f"{settings.STOCK_INTERVAL_BUSY}s"
+    logger.info(
+        f"   - Stock: {stock_schedule} (completo cada {settings.STOCK_FULL_RECONCILE_HOURS}h) | Inventario: 15m (completo cada {settings.INVENTORY_INDEX_FULL_HOURS}h) | Pedidos: 10m | Estados: 5m | Productos: 30m"
+    )
     
     logger.info("🔄 Ejecutando carga inicial de validación...")
-    job_sync_stock()
-    job_sync_order_status()
+    # En modo adaptativo el primer tick de stock ya está programado para ahora
+    if settings.STOCK_SCHEDULER_MODE != 'adaptive':
+        leased(job_sync_stock, 'sync_stock', settings.STOCK_INTERVAL_BUSY)()
+    leased(job_sync_order_status, 'sync_order_status', 5 * 60)()
     
     try:
         scheduler.start()